@@ -1,34 +1,74 @@
-import cv2
 import sys
 import datetime
 import threading
 import json
 import os
 import time
+import importlib
 import struct
 import hashlib
 import atexit
+import bisect
 import ctypes
 import subprocess
 import shutil
+import queue
+import multiprocessing
+import tempfile
+import sqlite3
+import csv
+import heapq
+import itertools
+import wave
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from cryptography.fernet import Fernet
-from PIL import Image, ImageQt
-import pyttsx3
+
+STARTUP_STARTED = time.perf_counter()
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+
+# OpenCV takes longer to import than the rest of the app together; the window paints without it
+cv2 = LazyModule('cv2')
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QFrame,
     QDialog, QInputDialog, QMessageBox, QSystemTrayIcon, QMenu, QListWidget, QListWidgetItem,
     QMenuBar, QAction, QSizePolicy, QActionGroup, QLineEdit, QTableWidget, QTableWidgetItem,
-    QHeaderView, QAbstractItemView, QDateTimeEdit, QColorDialog
+    QHeaderView, QAbstractItemView, QDateTimeEdit, QDateEdit, QColorDialog, QFileDialog
 )
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, pyqtSlot, QPoint, QSize, QRect, QDateTime
-from PyQt5.QtGui import QImage, QPixmap, QFont, QIcon, QColor, QCursor
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal, QThread, pyqtSlot, QPoint, QSize, QRect, QDateTime, QDate, QEvent
+from PyQt5.QtGui import QImage, QPixmap, QFont, QIcon, QColor, QCursor, QPainter, QPalette
 try:
     from PyQt5.QtWinExtras import QtWin
 except ImportError:
     pass
+try:
+    import winsound
+except ImportError:
+    winsound = None
 
 from qfluentwidgets import (
     FluentIcon, PushButton, PrimaryPushButton, InfoBar, InfoBarPosition, 
@@ -40,20 +80,553 @@ from qfluentwidgets import (
 
 # Configuration constants
 CONFIG_FILE = "config.json"
+ANNOUNCEMENTS_DB = "announcements.db"
+DEFAULT_ANNOUNCEMENT_ARCHIVE_DAYS = 0  # Announcements older than this are archived at startup (0 keeps them all)
+ANNOUNCEMENT_ARCHIVE_MAX_DAYS = 3650
+ANNOUNCEMENT_PAGE_SIZE = 50
+ANNOUNCEMENT_WINDOW = 30  # Cards created up front; more are added as the panel is scrolled
+ANNOUNCEMENT_MAX_LENGTH = 2000
+# Repeat rules for scheduled reading, in the order offered in the schedule dialog
+ANNOUNCEMENT_REPEATS = OrderedDict([('none', '不重复'), ('daily', '每天'), ('weekdays', '工作日'), ('weekly', '每周')])
+SCHEDULE_GRACE_SECONDS = 300  # A reading missed by less than this (e.g. during startup) is still played
+SCHEDULE_MAX_SLEEP_MS = 3600 * 1000  # Re-check at least hourly in case the wall clock was changed
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+TIMETABLE_PREWARM_SECONDS = 60  # Camera is opened this long before a lesson so recording starts on time
+TIMETABLE_LOOKAHEAD_DAYS = 366
+ANNOUNCEMENT_FIELDS = ('text', 'timestamp', 'color', 'archived')
+# Column names accepted on import besides ANNOUNCEMENT_FIELDS
+ANNOUNCEMENT_FIELD_ALIASES = {'内容': 'text', '公告': 'text', '时间': 'timestamp', '颜色': 'color', '已归档': 'archived'}
 ENCRYPTION_KEY_FILE = ".key"
 RECORDINGS_DIR = ".recordings"
 BACKUP_DIR = ".recordings_backup"
+SCRATCH_DIR_NAME = ".scratch"  # Decrypted working copies live here, inside the protected recordings directory
 PASSWORD_HASH = "1440717954315df5abbb85dce6f0f82e4c7d9f9990f53cdb4caf523e1001a730"  # SHA256 of "naxidatianxiadiyikeai1027"
 RETENTION_DAYS = 7
+SEGMENT_SECONDS = 600  # Recordings roll over into a new file every 10 minutes
+MIN_FREE_SPACE_MB = 500  # Always keep this much free on the recordings volume
+DEFAULT_BITRATE_KBPS = 4000  # Assumed bitrate until the current segment can be measured
+DISK_CHECK_INTERVAL_MS = 5000
+CONFIG_SAVE_DELAY_MS = 500  # Config changes made within this window are written together
+RECOVERY_DELAY_MS = 3000  # Let the UI settle before recovering orphaned recordings
+BENCHMARK_DELAY_MS = 10000  # Encoder benchmark runs once startup work is out of the way
+HOUSEKEEPING_DELAY_MS = 1000  # Cleanup, directory protection and shortcuts wait until the window is up
+DIALOG_WARMUP_DELAY_MS = 5000  # Common dialogs are built in the background once startup has settled
+WARMUP_DIALOGS = ('add_announcement', 'video_list')
+THUMBNAIL_DIR = ".thumbnails"
+THUMBNAIL_CACHE_MB = 50
+THUMBNAIL_SIZE = (320, 180)
+RECORDING_FPS = 20.0
+ENCODER_BENCHMARK_FRAMES = 30
+ENCODER_HEADROOM = 0.5  # An encoder keeps up if it needs at most this share of the frame interval
+DEFAULT_FRAME_SIZE = (1280, 720)  # Benchmark size until a camera has reported its resolution
+ENCODER_QUEUE_FRAMES = 40  # Frames buffered between capture and encoding (2 s at 20 fps)
+QUALITY_WINDOW_SECONDS = 2.0  # Load is judged over windows of this length
+QUALITY_STEP_DOWN_WINDOWS = 2  # Consecutive overloaded windows before quality is reduced
+QUALITY_STEP_UP_WINDOWS = 5  # Consecutive relaxed windows before quality is restored
+QUALITY_LOG_LIMIT = 200  # Quality changes kept in memory for the session
+DEFAULT_ARCHIVE_AFTER_HOURS = 24  # Recordings older than this are re-encoded smaller (0 disables)
+ARCHIVE_MAX_SIZE = (960, 540)  # Archive copies are scaled to fit within this
+ARCHIVE_CHECK_INTERVAL_MS = 10 * 60 * 1000
+ARCHIVE_PAUSE_POLL = 0.5  # Seconds between checks while the transcoder is paused
+PROXY_MAX_SIZE = (480, 270)  # Review copy recorded next to the archive when enabled
+PROXY_FPS = 5.0
+PROXY_SUFFIX = ".proxy"
+POSTER_INTERVAL_FRAMES = 100  # Refresh the in-memory poster frame every ~5 s at 20 fps
+ACTIVITY_SAMPLE_SIZE = (64, 36)  # Motion is scored on a tiny grayscale copy of the frame
+ACTIVITY_THRESHOLD = 24  # Scores (0-255) at or above this count as an active second
+MOTION_SAMPLE_INTERVAL = 0.2  # Seconds between motion samples while motion recording is armed
+MOTION_PIXEL_DELTA = 15  # Grey levels a sample pixel must change by to count as motion
+MOTION_START_SAMPLES = 2  # Consecutive moving samples needed to open a segment
+DEFAULT_MOTION_SENSITIVITY = 5  # 1 (only large movements) to 10 (slightest change)
+DEFAULT_MOTION_STOP_DELAY = 30  # Seconds without motion before a triggered segment is closed
+DEFAULT_PRE_RECORD_SECONDS = 5  # Footage from before the start of a recording that is kept (0 disables)
+DEFAULT_PRE_RECORD_MEMORY_MB = 32  # Upper bound for the pre-record buffer regardless of its length
+PRE_RECORD_JPEG_QUALITY = 80
+PRE_RECORD_FPS = 5.0  # Idle frames are buffered at this rate; index timestamps cover the gaps
+STATIC_SCENE_THRESHOLD = 2  # Per mille of changed pixels below which a frame repeats the last one
+STATIC_SCENE_MAX_GAP = 1.0  # Seconds; a static scene is still written this often so the clock keeps ticking
+
+TTS_RATE = 150
+TTS_VOLUME = 1.0
+SPEECH_PRIORITY_URGENT = 0  # Interrupts normal speech, which is read again afterwards
+SPEECH_PRIORITY_NORMAL = 1
+SPEECH_PRIORITY_BACKGROUND = 2  # Pre-synthesis into the audio cache, only when nothing is being read
+TTS_CACHE_DIR = ".tts_cache"
+TTS_CACHE_MB = 100
+
+
+def create_tts_engine():
+    """Create the pyttsx3 engine; must be called on the thread that will use it"""
+    import pyttsx3
+    engine = pyttsx3.init()
+    engine.setProperty('rate', TTS_RATE)
+    engine.setProperty('volume', TTS_VOLUME)
+    return engine
+
+
+def lower_current_thread_priority():
+    """Run the calling thread at idle priority so background work never competes with capture"""
+    try:
+        if sys.platform == 'win32':
+            THREAD_PRIORITY_IDLE = -15
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_IDLE)
+        elif hasattr(os, 'setpriority') and hasattr(threading, 'get_native_id'):
+            # Linux applies nice values per thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except Exception as e:
+        print(f"Could not lower thread priority: {e}")
+
+
+def lower_current_process_priority():
+    """Run the whole calling process at idle priority"""
+    try:
+        if sys.platform == 'win32':
+            IDLE_PRIORITY_CLASS = 0x40
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), IDLE_PRIORITY_CLASS)
+        elif hasattr(os, 'nice'):
+            os.nice(19)
+    except Exception as e:
+        print(f"Could not lower process priority: {e}")
+
+
+def file_age(path, now=None):
+    """Seconds since a file was recorded; in-place rewrites keep the mtime, so the older time counts"""
+    stat = os.stat(path)
+    return (now or time.time()) - min(stat.st_ctime, stat.st_mtime)
+
+
+def _is_mpeg4_keyframe(payload):
+    """Detect intra frames in MPEG-4 Part 2 (XVID) payloads; other codecs count as keyframes"""
+    vop = payload.find(b'\x00\x00\x01\xb6')
+    if vop < 0 or vop + 4 >= len(payload):
+        return True
+    return (payload[vop + 4] >> 6) == 0
+
+
+def _read_at(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+
+def repair_avi_index(path):
+    """Rebuild the idx1 index and chunk sizes of an AVI file truncated by a crash.
+
+    Returns True if the file was repaired and False if it was already intact
+    or could not be parsed.
+    """
+    AVIIF_KEYFRAME = 0x10
+    AVIF_HASINDEX = 0x10
+
+    with open(path, 'r+b') as f:
+        file_size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'AVI ':
+            return False
+        riff_size = struct.unpack('<I', header[4:8])[0]
+
+        hdrl_pos = None
+        movi_pos = None
+        has_index = False
+        pos = 12
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            fourcc, size = struct.unpack('<4sI', f.read(8))
+            if fourcc == b'LIST':
+                list_type = f.read(4)
+                if list_type == b'hdrl':
+                    hdrl_pos = pos
+                elif list_type == b'movi':
+                    movi_pos = pos
+                    movi_size = size
+            elif fourcc == b'idx1':
+                has_index = True
+            if pos + 8 + size > file_size:
+                break
+            pos += 8 + size + (size & 1)
+
+        if hdrl_pos is None or movi_pos is None:
+            return False
+        if has_index and riff_size + 8 <= file_size and movi_pos + 8 + movi_size <= file_size:
+            return False
+
+        # Walk the movi list and keep every chunk that was written completely
+        entries = []
+        video_frames = 0
+        movi_data = movi_pos + 8
+        pos = movi_pos + 12
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            chunk_header = f.read(8)
+            fourcc, size = struct.unpack('<4sI', chunk_header)
+            if not (fourcc[:2].isdigit() or fourcc in (b'JUNK', b'LIST') or fourcc[:2] == b'ix'):
+                break
+            if pos + 8 + size > file_size:
+                break
+            if fourcc[:2].isdigit():
+                flags = 0
+                if fourcc[2:3] == b'd':
+                    video_frames += 1
+                    flags = AVIIF_KEYFRAME if _is_mpeg4_keyframe(f.read(min(size, 256))) else 0
+                elif fourcc[2:] == b'wb':
+                    flags = AVIIF_KEYFRAME
+                entries.append(struct.pack('<4sIII', fourcc, flags, pos - movi_data, size))
+            pos += 8 + size + (size & 1)
+
+        if not entries:
+            return False
+
+        end = min(pos, file_size)
+        f.truncate(end)
+        f.seek(movi_pos + 4)
+        f.write(struct.pack('<I', end - movi_data))
+        f.seek(end)
+        f.write(b'idx1' + struct.pack('<I', 16 * len(entries)))
+        f.write(b''.join(entries))
+        total_size = f.tell()
+        f.seek(4)
+        f.write(struct.pack('<I', total_size - 8))
+
+        # Patch frame counts in the main and video stream headers
+        hdrl_end = hdrl_pos + 8 + struct.unpack('<I', _read_at(f, hdrl_pos + 4, 4))[0]
+        pos = hdrl_pos + 12
+        while pos + 8 <= hdrl_end:
+            fourcc, size = struct.unpack('<4sI', _read_at(f, pos, 8))
+            if fourcc == b'avih':
+                flags = struct.unpack('<I', _read_at(f, pos + 20, 4))[0]
+                f.seek(pos + 20)
+                f.write(struct.pack('<II', flags | AVIF_HASINDEX, video_frames))
+            elif fourcc == b'LIST' and _read_at(f, pos + 8, 4) == b'strl':
+                strh_pos = pos + 12
+                if _read_at(f, strh_pos, 4) == b'strh' and _read_at(f, strh_pos + 8, 4) == b'vids':
+                    f.seek(strh_pos + 8 + 32)
+                    f.write(struct.pack('<I', video_frames))
+            pos += 8 + size + (size & 1)
+    return True
+
+
+def _walk_chunks(f, start, end):
+    """Yield (position, fourcc, size) of the RIFF chunks between start and end"""
+    pos = start
+    while pos + 8 <= end:
+        fourcc, size = struct.unpack('<4sI', _read_at(f, pos, 8))
+        yield pos, fourcc, size
+        pos += 8 + size + (size & 1)
+
+
+def pad_avi_timing(path, frame_offsets_ms):
+    """Insert empty "repeat previous frame" chunks so a sparsely written AVI plays in real time.
+
+    frame_offsets_ms holds the capture offset of every video frame in the file.
+    Returns True if the file was rewritten and False if no padding was needed
+    or the file could not be parsed.
+    """
+    AVIIF_KEYFRAME = 0x10
+
+    with open(path, 'rb') as src:
+        file_size = src.seek(0, os.SEEK_END)
+        header = _read_at(src, 0, 12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'AVI ':
+            return False
+        riff_end = 8 + struct.unpack('<I', header[4:8])[0]
+        if riff_end < file_size:
+            # OpenDML extension chunks follow; leave such files untouched
+            return False
+
+        hdrl_pos = movi_pos = None
+        old_flags = {}
+        for pos, fourcc, size in _walk_chunks(src, 12, file_size):
+            if fourcc == b'LIST':
+                list_type = _read_at(src, pos + 8, 4)
+                if list_type == b'hdrl':
+                    hdrl_pos, hdrl_size = pos, size
+                elif list_type == b'movi':
+                    movi_pos, movi_size = pos, size
+            elif fourcc == b'idx1':
+                index = _read_at(src, pos + 8, size)
+                for i in range(0, len(index) - 15, 16):
+                    _, flags, offset, _ = struct.unpack('<4sIII', index[i:i + 16])
+                    old_flags[offset] = flags
+        if hdrl_pos is None or movi_pos is None:
+            return False
+
+        # Frame duration from the video stream header (dwScale / dwRate)
+        strh_positions = []
+        frame_ms = None
+        for pos, fourcc, size in _walk_chunks(src, hdrl_pos + 12, hdrl_pos + 8 + hdrl_size):
+            if fourcc == b'LIST' and _read_at(src, pos + 8, 4) == b'strl':
+                strh_pos = pos + 12
+                if _read_at(src, strh_pos, 4) == b'strh' and _read_at(src, strh_pos + 8, 4) == b'vids':
+                    scale, rate = struct.unpack('<II', _read_at(src, strh_pos + 8 + 20, 8))
+                    if scale and rate:
+                        frame_ms = 1000.0 * scale / rate
+                    strh_positions.append(strh_pos)
+        if frame_ms is None:
+            return False
+
+        movi_end = min(movi_pos + 8 + movi_size, file_size)
+        video_chunks = [(pos, fourcc, size) for pos, fourcc, size in _walk_chunks(src, movi_pos + 12, movi_end)
+                        if fourcc[:2].isdigit() and fourcc[2:3] == b'd']
+        base = frame_offsets_ms[0] if frame_offsets_ms else 0
+        slots = []
+        for i in range(len(video_chunks)):
+            slot = round((frame_offsets_ms[i] - base) / frame_ms) if i < len(frame_offsets_ms) else 0
+            slots.append(slot if not slots else max(slots[-1] + 1, slot))
+        if not slots or slots[-1] + 1 == len(slots):
+            return False
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as dst:
+            dst.write(_read_at(src, 0, movi_pos))
+            dst.write(b'LIST\0\0\0\0movi')
+            movi_data = movi_pos + 8
+            entries = []
+            frame_number = 0
+            for pos, fourcc, size in _walk_chunks(src, movi_pos + 12, movi_end):
+                chunk = _read_at(src, pos, 8 + size + (size & 1))
+                if fourcc[:2].isdigit() and fourcc[2:3] == b'd':
+                    gap = slots[frame_number] - (slots[frame_number - 1] if frame_number else -1) - 1
+                    for _ in range(gap):
+                        entries.append(struct.pack('<4sIII', fourcc, 0, dst.tell() - movi_data, 0))
+                        dst.write(fourcc + b'\0\0\0\0')
+                    # Keep the encoder's keyframe flags; only MPEG-4 can be re-detected
+                    flags = old_flags.get(pos - movi_data)
+                    if flags is None:
+                        flags = AVIIF_KEYFRAME if _is_mpeg4_keyframe(chunk[8:8 + 256]) else 0
+                    frame_number += 1
+                elif fourcc[:2].isdigit():
+                    flags = AVIIF_KEYFRAME
+                else:
+                    dst.write(chunk)
+                    continue
+                entries.append(struct.pack('<4sIII', fourcc, flags, dst.tell() - movi_data, size))
+                dst.write(chunk)
+
+            end = dst.tell()
+            dst.write(b'idx1' + struct.pack('<I', 16 * len(entries)))
+            dst.write(b''.join(entries))
+            total_size = dst.tell()
+            dst.seek(movi_pos + 4)
+            dst.write(struct.pack('<I', end - movi_data))
+            dst.seek(4)
+            dst.write(struct.pack('<I', total_size - 8))
+
+            # Every null chunk counts as a frame in the headers
+            total_frames = slots[-1] + 1
+            for pos, fourcc, size in _walk_chunks(src, hdrl_pos + 12, hdrl_pos + 8 + hdrl_size):
+                if fourcc == b'avih':
+                    dst.seek(pos + 8 + 16)
+                    dst.write(struct.pack('<I', total_frames))
+                elif fourcc == b'LIST' and _read_at(src, pos + 8, 4) == b'odml':
+                    for sub_pos, sub_fourcc, _ in _walk_chunks(src, pos + 12, pos + 8 + size):
+                        if sub_fourcc == b'dmlh':
+                            dst.seek(sub_pos + 8)
+                            dst.write(struct.pack('<I', total_frames))
+            for strh_pos in strh_positions:
+                dst.seek(strh_pos + 8 + 32)
+                dst.write(struct.pack('<I', total_frames))
+    os.replace(tmp_path, path)
+    return True
+
+
+class RecordingProfile:
+    """Codec, container and encoder settings used to write segments"""
+
+    def __init__(self, name, label, fourcc, extension=".avi", bitrate_kbps=DEFAULT_BITRATE_KBPS,
+                 quality=None, keyframe_interval=None, api="CAP_ANY"):
+        self.name = name
+        self.label = label
+        self.fourcc = fourcc
+        self.extension = extension
+        self.bitrate_kbps = bitrate_kbps  # Typical rate, used for disk planning until measured
+        self.quality = quality
+        self.keyframe_interval = keyframe_interval
+        self.api = api  # Name of the cv2 backend constant, resolved when a writer is opened
+
+    def writer_params(self):
+        params = []
+        if self.quality is not None:
+            params += [cv2.VIDEOWRITER_PROP_QUALITY, self.quality]
+        key_interval = getattr(cv2, 'VIDEOWRITER_PROP_KEY_INTERVAL', None)
+        if self.keyframe_interval and key_interval is not None:
+            params += [key_interval, self.keyframe_interval]
+        return params
+
+    def open_writer(self, path, fps, frame_size):
+        fourcc = cv2.VideoWriter_fourcc(*self.fourcc)
+        params = self.writer_params()
+        if params:
+            writer = cv2.VideoWriter(path, getattr(cv2, self.api), fourcc, fps, frame_size, params)
+            if writer.isOpened():
+                return writer
+            writer.release()
+        # Backends that reject the extra parameters still get the codec
+        return cv2.VideoWriter(path, fourcc, fps, frame_size)
+
+
+# Most efficient first. Every profile uses AVI so crash repair and export re-timing apply.
+RECORDING_PROFILES = [
+    RecordingProfile("h264", "H.264", "H264", bitrate_kbps=1500, keyframe_interval=40),
+    RecordingProfile("vp9", "VP9", "VP90", bitrate_kbps=1200, keyframe_interval=40),
+    RecordingProfile("xvid", "MPEG-4 (XVID)", "XVID", bitrate_kbps=DEFAULT_BITRATE_KBPS, keyframe_interval=40),
+    RecordingProfile("mjpg", "MJPEG", "MJPG", bitrate_kbps=12000, quality=80, api="CAP_OPENCV_MJPEG"),
+]
+FALLBACK_PROFILE = "xvid"
+
+
+def get_recording_profile(name):
+    for profile in RECORDING_PROFILES:
+        if profile.name == name:
+            return profile
+    return get_recording_profile(FALLBACK_PROFILE)
+
+
+def benchmark_encoder(profile, frame_size, fps=RECORDING_FPS, frames=ENCODER_BENCHMARK_FRAMES):
+    """Seconds per frame the profile needs at frame_size, or None if unavailable or too slow"""
+    import numpy as np
+
+    width, height = frame_size
+    budget = frames / fps * ENCODER_HEADROOM
+    # Textured background with a moving block, so the encoder has real work to do
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    background = cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+    block = max(8, min(width, height) // 4)
+
+    fd, path = tempfile.mkstemp(suffix=profile.extension)
+    os.close(fd)
+    try:
+        writer = profile.open_writer(path, fps, frame_size)
+        if not writer.isOpened():
+            return None
+        start = time.perf_counter()
+        for i in range(frames):
+            frame = background.copy()
+            x = (i * block // 4) % max(1, width - block)
+            frame[height // 3:height // 3 + block, x:x + block] = (40, 200, 90)
+            writer.write(frame)
+            if time.perf_counter() - start > budget:
+                writer.release()
+                return None
+        writer.release()
+        elapsed = time.perf_counter() - start
+        if elapsed > budget or os.path.getsize(path) == 0:
+            return None
+        return elapsed / frames
+    except cv2.error:
+        return None
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Set in archive worker processes by init_archive_worker
+_archive_paused = None
+_archive_cancelled = None
 
-# Initialize TTS engine
-try:
-    tts_engine = pyttsx3.init()
-    tts_engine.setProperty('rate', 150)
-    tts_engine.setProperty('volume', 1.0)
-except Exception as e:
-    print(f"TTS engine initialization failed: {e}")
-    tts_engine = None
+
+def init_archive_worker(paused, cancelled):
+    """Process pool initializer: share the pause/cancel events and drop to idle priority"""
+    global _archive_paused, _archive_cancelled
+    _archive_paused, _archive_cancelled = paused, cancelled
+    lower_current_process_priority()
+
+
+def _archive_should_stop():
+    # Sit out a pause; True once the job should be abandoned
+    while _archive_paused is not None and _archive_paused.is_set():
+        if _archive_cancelled.is_set():
+            return True
+        time.sleep(ARCHIVE_PAUSE_POLL)
+    return _archive_cancelled is not None and _archive_cancelled.is_set()
+
+
+def transcode_for_archive(path, key, profile_name, max_size=ARCHIVE_MAX_SIZE):
+    """Re-encode an encrypted recording at a smaller size and swap it in atomically.
+
+    Every frame is kept so the segment index stays valid. Returns (old_bytes, new_bytes)
+    once the recording is done with, or None if it should be retried later.
+    """
+    from cryptography.fernet import Fernet
+    cipher = Fernet(key)
+    profile = get_recording_profile(profile_name)
+    name = recording_key(path)
+    index_path = os.path.join(os.path.dirname(path), f"{name}.idx")
+    work_dir = tempfile.mkdtemp(prefix="archive_", dir=scratch_dir(os.path.dirname(path)))
+    source = os.path.join(work_dir, "source.avi")
+    target = os.path.join(work_dir, "archive" + profile.extension)
+    tmp_path = path + '.tmp'
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = cipher.decrypt(f.read())
+        with open(source, 'wb') as f:
+            f.write(data)
+        del data
+
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or RECORDING_FPS
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        size = fit_within(width, height, max_size)
+        size = (max(2, size[0] // 2 * 2), max(2, size[1] // 2 * 2))
+        writer = profile.open_writer(target, fps, size)
+        frames = 0
+        try:
+            if not writer.isOpened():
+                return None
+            while True:
+                if _archive_should_stop():
+                    return None
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if size != (width, height):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+                frames += 1
+        finally:
+            writer.release()
+            cap.release()
+
+        index = SegmentIndex.load(index_path) or SegmentIndex(name)
+        if index.frames and len(index.frames) != frames:
+            print(f"Archive transcode of {path} lost frames ({frames} of {len(index.frames)}), keeping original")
+            return None
+
+        archived = {'profile': profile.name, 'size': list(size), 'original_bytes': stat.st_size}
+        new_bytes = os.path.getsize(target)
+        if frames and new_bytes < os.path.getsize(source):
+            with open(target, 'rb') as f:
+                encrypted = cipher.encrypt(f.read())
+            with open(tmp_path, 'wb') as f:
+                f.write(encrypted)
+                f.flush()
+                os.fsync(f.fileno())
+            if not os.path.exists(path):
+                # Deleted while we were working; do not bring it back
+                return None
+            os.replace(tmp_path, path)
+            # Retention keeps counting from the original recording time
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+        else:
+            archived['kept_original'] = True
+        index.meta['archived'] = archived
+        index.save(index_path)
+        return stat.st_size, os.path.getsize(path)
+    except Exception as e:
+        print(f"Archive transcode error for {path}: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 
 class EncryptionManager:
@@ -62,13 +635,22 @@ class EncryptionManager:
     def __init__(self):
         self.key_file = ENCRYPTION_KEY_FILE
         self.key = self._load_or_create_key()
-        self.cipher = Fernet(self.key)
+        self._cipher = None
+
+    @property
+    def cipher(self):
+        # cryptography is imported when the first file is encrypted or decrypted, not at startup
+        if self._cipher is None:
+            from cryptography.fernet import Fernet
+            self._cipher = Fernet(self.key)
+        return self._cipher
     
     def _load_or_create_key(self):
         if os.path.exists(self.key_file):
             with open(self.key_file, 'rb') as f:
                 return f.read()
         else:
+            from cryptography.fernet import Fernet
             key = Fernet.generate_key()
             with open(self.key_file, 'wb') as f:
                 f.write(key)
@@ -92,6 +674,12 @@ class EncryptionManager:
             print(f"Encryption error: {e}")
             return None
     
+    def encrypt_bytes(self, data):
+        return self.cipher.encrypt(data)
+    
+    def decrypt_bytes(self, data):
+        return self.cipher.decrypt(data)
+    
     def decrypt_file(self, input_path, output_path=None):
         """Decrypt an encrypted video file"""
         try:
@@ -108,6 +696,769 @@ class EncryptionManager:
             return None
 
 
+def fit_within(width, height, box):
+    """Largest size with the aspect ratio of width x height that fits inside box"""
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def recording_key(filename):
+    """Name shared by a recording and its derived files, e.g. video_20240101_101010"""
+    return os.path.basename(filename).split('.', 1)[0]
+
+
+def proxy_filename(filename):
+    """video_x.avi.encrypted -> video_x.proxy.avi.encrypted (directories are kept)"""
+    directory, name = os.path.split(filename)
+    key = recording_key(name)
+    return os.path.join(directory, key + PROXY_SUFFIX + name[len(key):])
+
+
+def is_recording_file(filename):
+    """True for encrypted archive recordings, excluding their review proxies"""
+    return filename.endswith('.encrypted') and PROXY_SUFFIX + '.' not in filename
+
+
+def scratch_dir(recordings_dir=None):
+    """Directory for decrypted working copies; never the system temp directory"""
+    path = os.path.join(recordings_dir or RECORDINGS_DIR, SCRATCH_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def scratch_file(suffix, recordings_dir=None):
+    """Create an empty working file for decrypted footage and return its path"""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=scratch_dir(recordings_dir))
+    os.close(fd)
+    return path
+
+
+def sweep_scratch_dir(before, recordings_dir=None):
+    """Delete working copies last touched before the given time; returns how many were removed"""
+    path = os.path.join(recordings_dir or RECORDINGS_DIR, SCRATCH_DIR_NAME)
+    if not os.path.isdir(path):
+        return 0
+    removed = 0
+    for name in os.listdir(path):
+        entry = os.path.join(path, name)
+        try:
+            if os.path.getmtime(entry) >= before:
+                continue
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            else:
+                os.remove(entry)
+            removed += 1
+        except OSError as e:
+            print(f"Failed to remove leftover working copy {entry}: {e}")
+    return removed
+
+
+class ThumbnailCache:
+    """Encrypted, size-bounded LRU store of poster frames keyed by recording"""
+
+    def __init__(self, encryption_manager, directory=None,
+                 max_bytes=THUMBNAIL_CACHE_MB * 1024 * 1024, memory_items=64):
+        self.encryption_manager = encryption_manager
+        self.directory = directory or THUMBNAIL_DIR
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._pixmaps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.thumb")
+
+    def put(self, key, image):
+        """Store a BGR image; safe to call from any thread"""
+        if image is None:
+            return False
+        height, width = image.shape[:2]
+        size = fit_within(width, height, THUMBNAIL_SIZE)
+        if size != (width, height):
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(key), 'wb') as f:
+                f.write(self.encryption_manager.encrypt_bytes(jpeg.tobytes()))
+        except Exception as e:
+            print(f"Thumbnail write error: {e}")
+            return False
+        with self._lock:
+            self._pixmaps.pop(key, None)
+        self._enforce_limit()
+        return True
+
+    def get_pixmap(self, key):
+        """Return the cached QPixmap for key, or None; GUI thread only"""
+        with self._lock:
+            pixmap = self._pixmaps.get(key)
+            if pixmap is not None:
+                self._pixmaps.move_to_end(key)
+                return pixmap
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = self.encryption_manager.decrypt_bytes(f.read())
+            os.utime(path, None)  # Mark as recently used for the disk LRU
+        except Exception:
+            return None
+
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(data, "JPG"):
+            return None
+        with self._lock:
+            self._pixmaps[key] = pixmap
+            while len(self._pixmaps) > self.memory_items:
+                self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def has(self, key):
+        return os.path.exists(self._path(key))
+
+    def remove(self, key):
+        with self._lock:
+            self._pixmaps.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _enforce_limit(self):
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.directory):
+                    path = os.path.join(self.directory, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+class SegmentIndex:
+    """Compact sidecar for one recording: a JSON header followed by typed arrays"""
+
+    MAGIC = b'CMIX'
+    ARRAY_TYPES = OrderedDict([('activity', 'B'), ('frames', 'I'), ('proxy_frames', 'I')])
+
+    def __init__(self, key, started_at=None):
+        self.key = key
+        self.meta = {'started_at': started_at}
+        self.activity = array('B')  # One motion score (0-255) per recorded second
+        self.frames = array('I')  # Monotonic milliseconds since segment start, one per written frame
+        self.proxy_frames = array('I')  # The same for the review proxy, if one was recorded
+
+    @property
+    def started_at(self):
+        return self.meta.get('started_at')
+
+    @property
+    def ended_at(self):
+        if self.meta.get('ended_at') is not None:
+            return self.meta['ended_at']
+        if self.started_at is None:
+            return None
+        return self.started_at + self.meta.get('duration', len(self.activity))
+
+    def set_activity(self, second, score):
+        """Store the score for one second of the segment, padding skipped seconds with zeros"""
+        if second < 0:
+            return
+        if second >= len(self.activity):
+            self.activity.extend([0] * (second - len(self.activity)))
+            self.activity.append(score)
+        else:
+            self.activity[second] = max(self.activity[second], score)
+
+    def frame_at(self, offset_seconds, proxy=False):
+        """Number of the frame shown offset_seconds into the segment (or into its proxy)"""
+        frames = self.proxy_frames if proxy else self.frames
+        if not frames:
+            return None
+        return max(0, bisect.bisect_right(frames, int(offset_seconds * 1000)) - 1)
+
+    @staticmethod
+    def path_for(key):
+        return os.path.join(RECORDINGS_DIR, f"{key}.idx")
+
+    def save(self, path=None):
+        path = path or self.path_for(self.key)
+        arrays = [getattr(self, name) for name in self.ARRAY_TYPES]
+        header = dict(self.meta, key=self.key, lengths=[len(a) for a in arrays])
+        header_bytes = json.dumps(header).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            for values in arrays:
+                if sys.byteorder != 'little':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                f.write(values.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, header_only=False):
+        """Read an index; returns None if it is missing or corrupt"""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(4) != cls.MAGIC:
+                    return None
+                header_len = struct.unpack('<I', f.read(4))[0]
+                header = json.loads(f.read(header_len).decode('utf-8'))
+                index = cls(header.pop('key'))
+                lengths = header.pop('lengths')
+                index.meta.update(header)
+                if header_only:
+                    return index
+                # Older sidecars carry fewer arrays; the missing ones stay empty
+                for (name, typecode), length in zip(cls.ARRAY_TYPES.items(), lengths):
+                    values = array(typecode)
+                    values.frombytes(f.read(length * values.itemsize))
+                    if sys.byteorder != 'little':
+                        values.byteswap()
+                    setattr(index, name, values)
+                return index
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def active_periods(self, threshold=ACTIVITY_THRESHOLD, merge_gap=3):
+        """(start_second, end_second) runs of activity, merging gaps of merge_gap seconds or less"""
+        periods = []
+        for second, score in enumerate(self.activity):
+            if score < threshold:
+                continue
+            if periods and second - periods[-1][1] <= merge_gap:
+                periods[-1][1] = second + 1
+            else:
+                periods.append([second, second + 1])
+        return [tuple(p) for p in periods]
+
+
+class TimelineIndex:
+    """Interval index over all segments, answering wall-clock lookups in O(log n)"""
+
+    def __init__(self):
+        self.starts = []
+        self.entries = []  # (started_at, ended_at, filename, key), sorted by start
+        self.max_end = []  # Running maximum of ended_at so overlapping segments are still found
+        self.heat = {}  # key -> per-minute activity maxima
+
+    @classmethod
+    def build(cls, directory=None):
+        directory = directory or RECORDINGS_DIR
+        timeline = cls()
+        if not os.path.exists(directory):
+            return timeline
+        for name in os.listdir(directory):
+            if not name.endswith('.idx'):
+                continue
+            index = SegmentIndex.load(os.path.join(directory, name), header_only=True)
+            if index is None or index.started_at is None:
+                continue
+            filename = index.meta.get('filename') or f"{index.key}.avi.encrypted"
+            if os.path.exists(os.path.join(directory, filename)):
+                timeline.add(index.started_at, index.ended_at, filename, index.key,
+                             index.meta.get('activity_minutes'))
+        return timeline
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, started_at, ended_at, filename, key, heat=None):
+        if heat:
+            self.heat[key] = heat
+        position = bisect.bisect_right(self.starts, started_at)
+        self.starts.insert(position, started_at)
+        self.entries.insert(position, (started_at, ended_at, filename, key))
+        self.max_end.insert(position, ended_at)
+        # Segments normally arrive in order, so this loop rarely runs more than once
+        for i in range(position, len(self.entries)):
+            previous = self.max_end[i - 1] if i > 0 else ended_at
+            self.max_end[i] = max(previous, self.entries[i][1])
+
+    def remove(self, key):
+        self.heat.pop(key, None)
+        kept = [e for e in self.entries if e[3] != key]
+        if len(kept) != len(self.entries):
+            self.starts, self.entries, self.max_end = [], [], []
+            for entry in kept:
+                self.add(*entry)
+
+    def lookup(self, timestamp):
+        """Segments covering timestamp as (filename, key, offset_seconds), latest start first"""
+        hits = []
+        i = bisect.bisect_right(self.starts, timestamp) - 1
+        while i >= 0 and self.max_end[i] >= timestamp:
+            started_at, ended_at, filename, key = self.entries[i]
+            if ended_at >= timestamp:
+                hits.append((filename, key, timestamp - started_at))
+            i -= 1
+        return hits
+
+    def span(self):
+        if not self.entries:
+            return None
+        return self.starts[0], self.max_end[-1]
+
+
+class TimelineWidget(QWidget):
+    """Zoomable timeline of recorded segments with level-of-detail aggregation.
+
+    Segments are pre-aggregated into fixed-width bins at several levels; each
+    paint uses the finest level whose bins are at least two pixels wide, so
+    the work per frame is bounded by the widget width rather than the number
+    of segments.
+    """
+
+    time_clicked = pyqtSignal(float)
+
+    LOD_LEVELS = (60, 600, 3600, 6 * 3600, 86400)
+    TICK_STEPS = (60, 300, 900, 3600, 3 * 3600, 6 * 3600, 86400, 7 * 86400)
+    MIN_SPAN = 60
+    MAX_SPAN = 62 * 86400
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(96)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.setCursor(Qt.PointingHandCursor)
+        self.timeline = TimelineIndex()
+        self.levels = {}
+        self.view_start = time.time() - 86400
+        self.view_end = time.time()
+        self.drag_origin = None
+        self.dragged = False
+        self.last_paint_items = 0
+
+    def set_timeline(self, timeline):
+        self.timeline = timeline
+        self._build_levels()
+        span = timeline.span()
+        if span:
+            margin = max(60.0, (span[1] - span[0]) * 0.02)
+            self.set_view(span[0] - margin, span[1] + margin)
+        else:
+            self.update()
+
+    def _build_levels(self):
+        """Aggregate covered seconds and peak activity per bin for every level"""
+        self.levels = {width: {} for width in self.LOD_LEVELS}
+        for started_at, ended_at, _, key in self.timeline.entries:
+            heat = self.timeline.heat.get(key, [])
+            for width, bins in self.levels.items():
+                first = int(started_at // width)
+                last = int(ended_at // width)
+                for b in range(first, last + 1):
+                    lo = max(started_at, b * width)
+                    hi = min(ended_at, (b + 1) * width)
+                    if hi <= lo:
+                        continue
+                    minute_lo = int((lo - started_at) // 60)
+                    minute_hi = int((hi - started_at) // 60) + 1
+                    peak = max(heat[minute_lo:minute_hi], default=0)
+                    entry = bins.get(b)
+                    if entry is None:
+                        bins[b] = [hi - lo, peak]
+                    else:
+                        entry[0] += hi - lo
+                        entry[1] = max(entry[1], peak)
+
+    def set_view(self, start, end):
+        span = min(max(end - start, self.MIN_SPAN), self.MAX_SPAN)
+        center = (start + end) / 2
+        self.view_start = center - span / 2
+        self.view_end = center + span / 2
+        self.update()
+
+    def x_to_time(self, x):
+        return self.view_start + x / max(1, self.width()) * (self.view_end - self.view_start)
+
+    def time_to_x(self, t):
+        return (t - self.view_start) / (self.view_end - self.view_start) * self.width()
+
+    @staticmethod
+    def heat_color(level):
+        ratio = min(1.0, level / 255)
+        cold, hot = QColor("#CCE4F7"), QColor("#D13438")
+        return QColor(
+            int(cold.red() + (hot.red() - cold.red()) * ratio),
+            int(cold.green() + (hot.green() - cold.green()) * ratio),
+            int(cold.blue() + (hot.blue() - cold.blue()) * ratio)
+        )
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(0, 0, width, height, QColor("#FFFFFF"))
+        seconds_per_px = (self.view_end - self.view_start) / max(1, width)
+        bar_top, bar_height = 8, 26
+        heat_top, heat_height = 38, 12
+        painter.fillRect(0, bar_top, width, bar_height, QColor("#F3F2F1"))
+        items = 0
+
+        level = next((w for w in self.LOD_LEVELS if w / seconds_per_px >= 2), None)
+        painter.setPen(Qt.NoPen)
+        if level == self.LOD_LEVELS[0] and seconds_per_px < 1:
+            # Zoomed in far enough to draw individual segments
+            i = max(0, bisect.bisect_left(self.timeline.starts, self.view_start - SEGMENT_SECONDS * 2))
+            while i < len(self.timeline.entries) and self.timeline.entries[i][0] <= self.view_end:
+                started_at, ended_at, _, key = self.timeline.entries[i]
+                x1, x2 = self.time_to_x(started_at), self.time_to_x(ended_at)
+                if x2 >= 0:
+                    painter.fillRect(QRect(int(x1), bar_top, max(1, int(x2 - x1)), bar_height), QColor("#0078D4"))
+                    heat = self.timeline.heat.get(key, [])
+                    for minute, peak in enumerate(heat):
+                        hx1 = self.time_to_x(started_at + minute * 60)
+                        hx2 = self.time_to_x(min(ended_at, started_at + (minute + 1) * 60))
+                        painter.fillRect(QRect(int(hx1), heat_top, max(1, int(hx2 - hx1)), heat_height), self.heat_color(peak))
+                        items += 1
+                    items += 1
+                i += 1
+        else:
+            level = level or self.LOD_LEVELS[-1]
+            bins = self.levels.get(level, {})
+            for b in range(int(self.view_start // level), int(self.view_end // level) + 1):
+                entry = bins.get(b)
+                if entry is None:
+                    continue
+                covered, peak = entry
+                x1, x2 = self.time_to_x(b * level), self.time_to_x((b + 1) * level)
+                rect_w = max(1, int(x2) - int(x1))
+                bar_color = QColor("#0078D4")
+                bar_color.setAlphaF(0.35 + 0.65 * min(1.0, covered / level))
+                painter.fillRect(QRect(int(x1), bar_top, rect_w, bar_height), bar_color)
+                painter.fillRect(QRect(int(x1), heat_top, rect_w, heat_height), self.heat_color(peak))
+                items += 1
+        self.last_paint_items = items
+
+        # Time axis
+        step = next((s for s in self.TICK_STEPS if s / seconds_per_px >= 90), self.TICK_STEPS[-1])
+        fmt = "%m-%d" if step >= 86400 else "%m-%d %H:%M"
+        painter.setPen(QColor("#605E5C"))
+        tick = (int(self.view_start // step) + 1) * step
+        while tick < self.view_end:
+            x = int(self.time_to_x(tick))
+            painter.drawLine(x, heat_top + heat_height + 2, x, heat_top + heat_height + 8)
+            painter.drawText(x + 3, height - 8, datetime.datetime.fromtimestamp(tick).strftime(fmt))
+            tick += step
+        painter.end()
+
+    def wheelEvent(self, event):
+        anchor = self.x_to_time(event.pos().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        ratio = event.pos().x() / max(1, self.width())
+        span = min(max((self.view_end - self.view_start) * factor, self.MIN_SPAN), self.MAX_SPAN)
+        self.view_start = anchor - span * ratio
+        self.view_end = self.view_start + span
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_origin = (event.pos().x(), self.view_start, self.view_end)
+            self.dragged = False
+
+    def mouseMoveEvent(self, event):
+        if self.drag_origin is None:
+            return
+        origin_x, start, end = self.drag_origin
+        dx = event.pos().x() - origin_x
+        if abs(dx) > 3:
+            self.dragged = True
+        shift = dx / max(1, self.width()) * (end - start)
+        self.view_start, self.view_end = start - shift, end - shift
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self.drag_origin is not None and not self.dragged and event.button() == Qt.LeftButton:
+            self.time_clicked.emit(self.x_to_time(event.pos().x()))
+        self.drag_origin = None
+
+
+class MotionTrigger:
+    """Hysteresis that turns per-sample motion scores into segment start/stop events"""
+
+    def __init__(self, sensitivity=DEFAULT_MOTION_SENSITIVITY, stop_delay=DEFAULT_MOTION_STOP_DELAY,
+                 start_samples=MOTION_START_SAMPLES):
+        # Sensitivity 1-10 maps onto 20% down to ~0.4% of the sample's pixels changing
+        self.threshold = 200 / 2 ** (int(sensitivity) - 1)
+        self.stop_delay = stop_delay
+        self.start_samples = start_samples
+        self.active = False
+        self.hits = 0
+        self.last_motion = 0.0
+
+    def update(self, changed, now):
+        """Feed the changed-pixel ratio (per mille); True starts recording, False stops it"""
+        if changed >= self.threshold:
+            self.hits += 1
+            self.last_motion = now
+            if not self.active and self.hits >= self.start_samples:
+                self.active = True
+                return True
+        else:
+            self.hits = 0
+            if self.active and now - self.last_motion >= self.stop_delay:
+                self.active = False
+                return False
+        return None
+
+
+class ActivityMonitor(threading.Thread):
+    """Scores motion from downscaled frames, away from the capture loop"""
+
+    def __init__(self):
+        super().__init__(name="activity-monitor", daemon=True)
+        self.samples = queue.Queue(maxsize=4)
+        self.previous = None
+        self.previous_indexed = None
+        self.previous_indexed_at = 0.0
+        self.indexed_recorder = None
+        self.trigger = None
+        self.on_motion = None
+        self.stopped = False
+
+    def submit(self, small_frame, recorder, for_index=True, sampled_at=None):
+        """Hand over a downscaled BGR frame; dropped if the worker is behind"""
+        sampled_at = time.monotonic() if sampled_at is None else sampled_at
+        try:
+            self.samples.put_nowait((small_frame, recorder, for_index, sampled_at))
+        except queue.Full:
+            pass
+
+    def set_trigger(self, trigger):
+        """Install (or with None remove) the motion trigger fed by every sample"""
+        self.trigger = trigger
+        self.previous = None
+
+    def wait_idle(self):
+        self.samples.join()
+
+    def stop(self):
+        if not self.stopped:
+            self.stopped = True
+            self.samples.put((None, None, False, 0.0))
+
+    @staticmethod
+    def score(previous, current):
+        diff = cv2.absdiff(previous, current)
+        return min(255, int(cv2.mean(diff)[0] * 8))
+
+    @staticmethod
+    def changed_ratio(previous, current):
+        """Per mille of pixels that changed by more than sensor noise"""
+        diff = cv2.absdiff(previous, current)
+        return cv2.countNonZero(cv2.threshold(diff, MOTION_PIXEL_DELTA, 255, cv2.THRESH_BINARY)[1]) * 1000 / diff.size
+
+    def run(self):
+        while True:
+            small_frame, recorder, for_index, sampled_at = self.samples.get()
+            try:
+                if small_frame is None:
+                    return
+                gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+                gray = cv2.GaussianBlur(gray, (3, 3), 0)
+                trigger = self.trigger
+                if trigger is not None and self.previous is not None:
+                    event = trigger.update(self.changed_ratio(self.previous, gray), sampled_at)
+                    if event is not None and self.on_motion is not None:
+                        self.on_motion(event)
+                self.previous = gray
+                # Scores are placed by capture time, so dropped samples leave a gap rather
+                # than shifting every later second
+                if for_index:
+                    if recorder is not self.indexed_recorder:
+                        # Never compare against a frame from another segment or camera session
+                        self.indexed_recorder = recorder
+                        self.previous_indexed = None
+                    if self.previous_indexed is not None and recorder is not None:
+                        second = int(self.previous_indexed_at - recorder.mono_start)
+                        recorder.index.set_activity(second, self.score(self.previous_indexed, gray))
+                    self.previous_indexed = gray
+                    self.previous_indexed_at = sampled_at
+            except Exception as e:
+                print(f"Activity monitor error: {e}")
+            finally:
+                self.samples.task_done()
+
+
+def render_sparkline(scores, width=120, height=24):
+    """Bar sparkline of activity scores, bucketed to one bar per pixel column"""
+    pixmap = QPixmap(width, height)
+    pixmap.fill(QColor("#F3F2F1"))
+    if not scores:
+        return pixmap
+    painter = QPainter(pixmap)
+    painter.setPen(Qt.NoPen)
+    bucket = max(1, -(-len(scores) // width))
+    for x in range(min(width, -(-len(scores) // bucket))):
+        level = max(scores[x * bucket:(x + 1) * bucket])
+        bar = max(1, int(level / 255 * height)) if level else 0
+        painter.setBrush(QColor("#D13438") if level >= ACTIVITY_THRESHOLD else QColor("#0078D4"))
+        painter.drawRect(x, height - bar, 1, bar)
+    painter.end()
+    return pixmap
+
+
+def format_offset(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class PlaybackDialog(QDialog):
+    """Minimal player; the recording is decrypted to a temporary file for the session"""
+
+    def __init__(self, parent, encryption_manager, filename, start_seconds=0, index=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"回放 - {filename}")
+        self.index = index if index is not None and index.frames else None
+        # Review from the small proxy when one was recorded; full resolution is for export
+        self.use_proxy = (self.index is not None and len(self.index.proxy_frames) > 0
+                          and os.path.exists(os.path.join(RECORDINGS_DIR, proxy_filename(filename))))
+        self.frame_offsets = None
+        if self.index is not None:
+            self.frame_offsets = self.index.proxy_frames if self.use_proxy else self.index.frames
+        self.cap = None
+        self.temp_path = None
+        self.playing = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+        self.video_widget = VideoDisplayWidget(16/9)
+        layout.addWidget(self.video_widget, 1)
+
+        controls = QHBoxLayout()
+        self.play_btn = PushButton(FluentIcon.PAUSE, "")
+        self.play_btn.setFixedSize(40, 32)
+        self.play_btn.clicked.connect(self.toggle_play)
+        controls.addWidget(self.play_btn)
+        self.position_slider = Slider(Qt.Horizontal)
+        self.position_slider.sliderReleased.connect(self.seek_to_slider)
+        controls.addWidget(self.position_slider, 1)
+        self.position_label = CaptionLabel("00:00:00")
+        controls.addWidget(self.position_label)
+        layout.addLayout(controls)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.next_frame)
+
+        self.open(encryption_manager, filename, start_seconds)
+
+    def open(self, encryption_manager, filename, start_seconds):
+        if self.use_proxy:
+            filename = proxy_filename(filename)
+        self.temp_path = scratch_file(os.path.splitext(filename.replace('.encrypted', ''))[1])
+        if not encryption_manager.decrypt_file(os.path.join(RECORDINGS_DIR, filename), self.temp_path):
+            self.video_widget.set_placeholder("视频解密失败")
+            return
+        self.cap = cv2.VideoCapture(self.temp_path)
+        if not self.cap.isOpened():
+            self.video_widget.set_placeholder("无法播放该视频")
+            return
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 20.0
+        if self.index is not None:
+            duration = self.frame_offsets[-1] / 1000
+        else:
+            duration = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+        self.position_slider.setRange(0, max(0, int(duration)))
+        self.frame_interval = int(1000 / fps)
+        self.seek(start_seconds)
+        self.timer.start(self.frame_interval)
+        self.playing = True
+
+    def seek(self, seconds):
+        if self.cap is None:
+            return
+        if self.index is not None:
+            # Frame timestamps are exact even if the clock changed during recording
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.index.frame_at(max(0, seconds), self.use_proxy))
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, max(0, seconds) * 1000)
+        self.next_frame()
+
+    def current_offset(self):
+        if self.index is not None:
+            frame_number = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+            frame_number = min(max(0, frame_number), len(self.frame_offsets) - 1)
+            return self.frame_offsets[frame_number] / 1000
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+    def seek_to_slider(self):
+        self.seek(self.position_slider.value())
+
+    def toggle_play(self):
+        if self.cap is None:
+            return
+        self.playing = not self.playing
+        if self.playing:
+            self.timer.start()
+        else:
+            self.timer.stop()
+        self.play_btn.setIcon(FluentIcon.PAUSE if self.playing else FluentIcon.PLAY_SOLID)
+
+    def next_frame(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            self.timer.stop()
+            return
+        seconds = self.current_offset()
+        if self.index is not None and self.index.started_at is not None:
+            wall = datetime.datetime.fromtimestamp(self.index.started_at + seconds)
+            self.position_label.setText(wall.strftime("%Y-%m-%d %H:%M:%S"))
+        else:
+            self.position_label.setText(format_offset(seconds))
+        if not self.position_slider.isSliderDown():
+            self.position_slider.setValue(int(seconds))
+        if self.index is not None and self.playing:
+            # Static scenes are stored sparsely; hold each frame until the next one was captured
+            frame_number = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if frame_number < len(self.frame_offsets):
+                self.timer.start(max(1, self.frame_offsets[frame_number] - int(seconds * 1000)))
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = frame_rgb.shape
+        self.video_widget.set_frame(QImage(frame_rgb.data, w, h, ch * w, QImage.Format_RGB888).copy())
+
+    def done(self, result):
+        self.timer.stop()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self.temp_path and os.path.exists(self.temp_path):
+            try:
+                os.remove(self.temp_path)
+            except OSError as e:
+                print(f"Failed to remove playback file: {e}")
+        super().done(result)
+
+
+class ThumbnailPopup(QLabel):
+    """Frameless preview shown while hovering a recording"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.ToolTip | Qt.FramelessWindowHint)
+        self.setStyleSheet("background-color: #000000; border: 1px solid #E1DFDD; padding: 2px;")
+
+    def show_pixmap(self, pixmap, global_pos):
+        self.setPixmap(pixmap)
+        self.adjustSize()
+        self.move(global_pos + QPoint(16, 16))
+        self.show()
+
+
 class VideoListDialog(QDialog):
     """Dialog to display and manage video files"""
     
@@ -117,8 +1468,13 @@ class VideoListDialog(QDialog):
         self.parent_app = parent
         self.setWindowTitle("视频列表")
         self.setMinimumSize(800, 500)
+        # Rows are kept between openings and only the ones that changed are rebuilt
+        self.row_files = []
+        self.row_state = {}  # filename -> (mtime, size, protected) as currently shown
+        self.indexes = {}
+        self.placeholder_shown = False
+        # Rows are filled by load_videos when the dialog is shown, so building it stays cheap
         self.setup_ui()
-        self.load_videos()
     
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -130,16 +1486,36 @@ class VideoListDialog(QDialog):
         title.setStyleSheet("font-size: 18px; font-weight: bold; color: #0078D4;")
         layout.addWidget(title)
         
+        # Jump to a wall-clock time across all segments
+        locate_layout = QHBoxLayout()
+        locate_layout.addWidget(BodyLabel("定位到时间:"))
+        self.locate_edit = QDateTimeEdit(QDateTime.currentDateTime(), self)
+        self.locate_edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.locate_edit.setCalendarPopup(True)
+        locate_layout.addWidget(self.locate_edit)
+        locate_btn = PushButton(FluentIcon.SEARCH, "定位")
+        locate_btn.clicked.connect(self.locate_time)
+        locate_layout.addWidget(locate_btn)
+        locate_layout.addStretch()
+        layout.addLayout(locate_layout)
+        
+        self.timeline_widget = TimelineWidget(self)
+        self.timeline_widget.setToolTip("滚轮缩放，拖动平移，单击回放该时刻")
+        self.timeline_widget.time_clicked.connect(self.play_at_time)
+        layout.addWidget(self.timeline_widget)
+        
         # Video table
         self.video_table = QTableWidget()
-        self.video_table.setColumnCount(4)
-        self.video_table.setHorizontalHeaderLabels(["文件名", "大小", "修改时间", "操作"])
+        self.video_table.setColumnCount(5)
+        self.video_table.setHorizontalHeaderLabels(["文件名", "大小", "修改时间", "活动", "操作"])
         self.video_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.video_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.video_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.video_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.video_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
         self.video_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.video_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        self.video_table.setIconSize(QSize(120, 24))
         self.video_table.setStyleSheet("""
             QTableWidget {
                 background-color: #FFFFFF;
@@ -163,6 +1539,11 @@ class VideoListDialog(QDialog):
                 color: #323130;
             }
         """)
+        self.video_table.setMouseTracking(True)
+        self.video_table.cellEntered.connect(self.show_thumbnail_preview)
+        self.video_table.cellDoubleClicked.connect(self.on_cell_double_clicked)
+        self.video_table.viewport().installEventFilter(self)
+        self.thumbnail_popup = ThumbnailPopup(self)
         layout.addWidget(self.video_table)
         
         # Button row
@@ -180,71 +1561,198 @@ class VideoListDialog(QDialog):
         layout.addLayout(button_layout)
     
     def load_videos(self):
-        """Load video files from recordings directory"""
-        self.video_table.setRowCount(0)
-        
-        if not os.path.exists(RECORDINGS_DIR):
-            return
-        
-        video_files = [f for f in os.listdir(RECORDINGS_DIR) if f.endswith('.encrypted')]
-        video_files.sort(key=lambda x: os.path.getmtime(os.path.join(RECORDINGS_DIR, x)), reverse=True)
-        
-        for filename in video_files:
-            filepath = os.path.join(RECORDINGS_DIR, filename)
-            file_size = os.path.getsize(filepath)
-            file_mtime = datetime.datetime.fromtimestamp(os.path.getmtime(filepath))
-            
-            row = self.video_table.rowCount()
-            self.video_table.insertRow(row)
-            
-            # Filename
-            name_item = QTableWidgetItem(filename)
-            self.video_table.setItem(row, 0, name_item)
-            
-            # Size (convert to MB)
-            size_mb = file_size / (1024 * 1024)
-            size_item = QTableWidgetItem(f"{size_mb:.2f} MB")
-            self.video_table.setItem(row, 1, size_item)
-            
-            # Modified time
-            time_item = QTableWidgetItem(file_mtime.strftime("%Y-%m-%d %H:%M:%S"))
-            self.video_table.setItem(row, 2, time_item)
-            
-            # Action buttons
-            action_widget = QWidget()
-            action_layout = QHBoxLayout(action_widget)
-            action_layout.setContentsMargins(5, 2, 5, 2)
-            action_layout.setSpacing(5)
-            
-            export_btn = PushButton(FluentIcon.DOWNLOAD, "导出")
-            export_btn.setFixedSize(80, 32)
-            export_btn.clicked.connect(lambda checked, f=filename: self.export_video(f))
-            action_layout.addWidget(export_btn)
-            
-            delete_btn = PushButton(FluentIcon.DELETE, "删除")
-            delete_btn.setFixedSize(80, 32)
-            delete_btn.clicked.connect(lambda checked, f=filename: self.delete_video(f))
-            action_layout.addWidget(delete_btn)
-            
-            self.video_table.setCellWidget(row, 3, action_widget)
-        
-        if self.video_table.rowCount() == 0:
+        """Bring the table in line with the recordings directory, rebuilding only rows that changed"""
+        if self.parent_app is not None:
+            self.timeline_widget.set_timeline(self.parent_app.get_timeline_index())
+
+        entries = []
+        if os.path.exists(RECORDINGS_DIR):
+            for filename in os.listdir(RECORDINGS_DIR):
+                if not is_recording_file(filename):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(RECORDINGS_DIR, filename))
+                except OSError:
+                    continue
+                entries.append((filename, (stat.st_mtime, stat.st_size, self.is_protected(filename))))
+        entries.sort(key=lambda entry: entry[1][0], reverse=True)
+        wanted = dict(entries)
+
+        if self.placeholder_shown:
+            self.video_table.setRowCount(0)
+            self.placeholder_shown = False
+        for row in range(len(self.row_files) - 1, -1, -1):
+            if self.row_files[row] not in wanted:
+                self._remove_row(row)
+        if self.row_files != [f for f, _ in entries if f in self.row_state]:
+            # Files only reorder if their times were changed by hand; start over
+            for row in range(len(self.row_files) - 1, -1, -1):
+                self._remove_row(row)
+
+        for row, (filename, state) in enumerate(entries):
+            if row >= len(self.row_files) or self.row_files[row] != filename:
+                self.video_table.insertRow(row)
+                self.row_files.insert(row, filename)
+                self._fill_row(row, filename, state)
+            elif self.row_state[filename] != state:
+                self._fill_row(row, filename, state)
+
+        if not self.row_files:
             self.video_table.insertRow(0)
             no_data_item = QTableWidgetItem("暂无视频文件")
             no_data_item.setForeground(QColor("#605E5C"))
             self.video_table.setItem(0, 0, no_data_item)
-            self.video_table.setSpan(0, 0, 1, 4)
+            self.video_table.setSpan(0, 0, 1, 5)
+            self.placeholder_shown = True
+
+    def _remove_row(self, row):
+        filename = self.row_files.pop(row)
+        self.row_state.pop(filename, None)
+        self.indexes.pop(filename, None)
+        self.video_table.removeRow(row)
+
+    def _fill_row(self, row, filename, state):
+        mtime, file_size, protected = state
+        self.row_state[filename] = state
+
+        # Filename
+        self.video_table.setItem(row, 0, QTableWidgetItem(filename))
+
+        # Size (convert to MB)
+        size_mb = file_size / (1024 * 1024)
+        self.video_table.setItem(row, 1, QTableWidgetItem(f"{size_mb:.2f} MB"))
+
+        # Modified time
+        file_mtime = datetime.datetime.fromtimestamp(mtime)
+        self.video_table.setItem(row, 2, QTableWidgetItem(file_mtime.strftime("%Y-%m-%d %H:%M:%S")))
+
+        # Activity sparkline from the per-second index
+        activity_item = QTableWidgetItem()
+        index = SegmentIndex.load(SegmentIndex.path_for(recording_key(filename)))
+        self.indexes.pop(filename, None)
+        if index is not None and index.activity:
+            self.indexes[filename] = index
+            activity_item.setData(Qt.DecorationRole, render_sparkline(index.activity))
+            activity_item.setToolTip("双击跳转到活跃时段")
+        self.video_table.setItem(row, 3, activity_item)
+
+        # Action buttons
+        action_widget = QWidget()
+        action_layout = QHBoxLayout(action_widget)
+        action_layout.setContentsMargins(5, 2, 5, 2)
+        action_layout.setSpacing(5)
+
+        export_btn = PushButton(FluentIcon.DOWNLOAD, "导出")
+        export_btn.setFixedSize(80, 32)
+        export_btn.clicked.connect(lambda checked, f=filename: self.export_video(f))
+        action_layout.addWidget(export_btn)
+
+        delete_btn = PushButton(FluentIcon.DELETE, "删除")
+        delete_btn.setFixedSize(80, 32)
+        delete_btn.clicked.connect(lambda checked, f=filename: self.delete_video(f))
+        action_layout.addWidget(delete_btn)
+
+        protect_btn = PushButton(FluentIcon.UNPIN if protected else FluentIcon.PIN, "取消保护" if protected else "保护")
+        protect_btn.setFixedSize(100, 32)
+        protect_btn.setToolTip("受保护的视频不会在磁盘空间不足时被自动清理")
+        protect_btn.clicked.connect(lambda checked, f=filename: self.toggle_protection(f))
+        action_layout.addWidget(protect_btn)
+
+        self.video_table.setCellWidget(row, 4, action_widget)
+    
+    def show_thumbnail_preview(self, row, column):
+        """Show the poster frame of the hovered recording"""
+        item = self.video_table.item(row, 0)
+        pixmap = None
+        if item is not None and self.parent_app is not None:
+            pixmap = self.parent_app.thumbnail_cache.get_pixmap(recording_key(item.text()))
+            if pixmap is None:
+                self.parent_app.request_proxy_thumbnail(item.text())
+        if pixmap is None:
+            self.thumbnail_popup.hide()
+            return
+        self.thumbnail_popup.show_pixmap(pixmap, QCursor.pos())
+    
+    def on_cell_double_clicked(self, row, column):
+        item = self.video_table.item(row, 0)
+        if item is None or not item.text().endswith('.encrypted'):
+            return
+        filename = item.text()
+        index = self.indexes.get(filename)
+        if column != 3 or index is None:
+            self.play_video(filename)
+            return
+        
+        periods = index.active_periods()
+        menu = QMenu(self)
+        if not periods:
+            menu.addAction("无明显活动").setEnabled(False)
+        for start, end in periods:
+            action = menu.addAction(f"{format_offset(start)} - {format_offset(end)}")
+            action.triggered.connect(lambda checked, f=filename, t=start: self.play_video(f, t))
+        menu.exec_(QCursor.pos())
+    
+    def locate_time(self):
+        self.play_at_time(self.locate_edit.dateTime().toPyDateTime().timestamp())
+    
+    def play_at_time(self, timestamp):
+        """Open the recording that covers the given wall-clock time"""
+        if self.parent_app is None:
+            return
+        hits = self.parent_app.get_timeline_index().lookup(timestamp)
+        if not hits:
+            InfoBar.warning(
+                title="提示",
+                content="该时间没有录像",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+        filename, key, offset = hits[0]
+        self.play_video(filename, offset)
+    
+    def play_video(self, filename, start_seconds=0):
+        """Open the in-app player at start_seconds into the recording"""
+        index = SegmentIndex.load(SegmentIndex.path_for(recording_key(filename)))
+        dialog = PlaybackDialog(self, self.encryption_manager, filename, start_seconds, index)
+        dialog.resize(1000, 640)
+        dialog.exec_()
+    
+    def eventFilter(self, obj, event):
+        if obj is self.video_table.viewport() and event.type() == QEvent.Leave:
+            self.thumbnail_popup.hide()
+        return super().eventFilter(obj, event)
+    
+    def is_protected(self, filename):
+        return self.parent_app is not None and filename in self.parent_app.protected_recordings
+    
+    def toggle_protection(self, filename):
+        """Exclude a video from (or return it to) emergency disk space eviction"""
+        if self.parent_app is None:
+            return
+        protected = self.parent_app.protected_recordings
+        if filename in protected:
+            protected.remove(filename)
+        else:
+            protected.append(filename)
+        self.parent_app.save_config()
+        self.load_videos()
     
     def export_video(self, filename):
         """Export a video file"""
         try:
-            encrypted_path = os.path.join(RECORDINGS_DIR, filename)
             desktop = os.path.join(os.path.expanduser("~"), "Desktop")
             output_filename = filename.replace('.encrypted', '')
             output_path = os.path.join(desktop, output_filename)
             
             # Decrypt the video
-            decrypted = self.encryption_manager.decrypt_file(encrypted_path, output_path)
+            if self.parent_app is not None:
+                decrypted = self.parent_app.export_recording(filename, output_path)
+            else:
+                decrypted = self.encryption_manager.decrypt_file(os.path.join(RECORDINGS_DIR, filename), output_path)
             
             if decrypted:
                 InfoBar.success(
@@ -329,8 +1837,10 @@ class VideoListDialog(QDialog):
         
         # Delete the file
         try:
-            filepath = os.path.join(RECORDINGS_DIR, filename)
-            os.remove(filepath)
+            if self.parent_app is not None:
+                self.parent_app.remove_recording(filename)
+            else:
+                os.remove(os.path.join(RECORDINGS_DIR, filename))
             InfoBar.success(
                 title="成功",
                 content="视频已删除",
@@ -342,96 +1852,1389 @@ class VideoListDialog(QDialog):
             )
             self.load_videos()
         except Exception as e:
-            InfoBar.error(
-                title="错误",
-                content=f"删除失败: {str(e)}",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
+            InfoBar.error(
+                title="错误",
+                content=f"删除失败: {str(e)}",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+
+class RecordingPickerDialog(QDialog):
+    """Reusable list of recordings to pick from; reopening only adds and removes changed entries"""
+
+    def __init__(self, parent, title, action_text):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        layout = QVBoxLayout(self)
+
+        self.list_widget = QListWidget()
+        self.list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        layout.addWidget(self.list_widget)
+
+        btn_layout = QHBoxLayout()
+        action_btn = PushButton(action_text)
+        action_btn.clicked.connect(self.confirm)
+        cancel_btn = PushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(action_btn)
+        btn_layout.addWidget(cancel_btn)
+        layout.addLayout(btn_layout)
+
+    def set_files(self, files):
+        """Show files in this order, keeping the items (and selection) of those already listed"""
+        wanted = set(files)
+        for row in range(self.list_widget.count() - 1, -1, -1):
+            if self.list_widget.item(row).text() not in wanted:
+                self.list_widget.takeItem(row)
+        for row, filename in enumerate(files):
+            item = self.list_widget.item(row)
+            if item is None or item.text() != filename:
+                existing = self.list_widget.findItems(filename, Qt.MatchExactly)
+                if existing:
+                    self.list_widget.takeItem(self.list_widget.row(existing[0]))
+                self.list_widget.insertItem(row, filename)
+
+    def selected_files(self):
+        return [item.text() for item in self.list_widget.selectedItems()]
+
+    def confirm(self):
+        if not self.list_widget.selectedItems():
+            InfoBar.warning(
+                title="提示",
+                content="请先选择视频",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+        self.accept()
+
+    def exec_(self):
+        self.list_widget.clearSelection()
+        return super().exec_()
+
+
+class PreEventBuffer:
+    """Ring of the most recent frames, held as JPEG, flushed into the next segment"""
+
+    def __init__(self, seconds=DEFAULT_PRE_RECORD_SECONDS, max_bytes=DEFAULT_PRE_RECORD_MEMORY_MB * 1024 * 1024):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames = deque()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def encode(frame):
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, PRE_RECORD_JPEG_QUALITY])
+        return jpeg if ok else None
+
+    def append(self, jpeg, captured_at=None):
+        if jpeg is None:
+            return
+        captured_at = time.monotonic() if captured_at is None else captured_at
+        with self.lock:
+            self.frames.append((captured_at, jpeg))
+            self.total_bytes += jpeg.nbytes
+            self._trim(captured_at)
+
+    def _trim(self, now):
+        while self.frames and (self.total_bytes > self.max_bytes or now - self.frames[0][0] > self.seconds):
+            self.total_bytes -= self.frames.popleft()[1].nbytes
+
+    def drain(self):
+        """Remove and return the buffered (monotonic time, JPEG) pairs, oldest first"""
+        with self.lock:
+            self._trim(time.monotonic())
+            frames = list(self.frames)
+            self.frames.clear()
+            self.total_bytes = 0
+        return frames
+
+    def clear(self):
+        self.drain()
+
+    def __len__(self):
+        return len(self.frames)
+
+
+class SegmentRecorder:
+    """Owns the VideoWriter of a single recording segment"""
+
+    def __init__(self, path, fourcc, fps, frame_size, profile=None):
+        self.path = path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.started_at = time.time()
+        self.mono_start = time.monotonic()
+        self.frames_written = 0
+        self.frames_skipped = 0
+        # Per mille threshold for skipping near-identical frames; None writes every frame
+        self.static_threshold = None
+        self.static_reference = None
+        self.static_written_at = 0.0
+        self.proxy_path = None
+        self.proxy_writer = None
+        self.proxy_due_ms = 0
+        self.proxy_paused = False
+        self.poster = None
+        self.poster_size = fit_within(frame_size[0], frame_size[1], THUMBNAIL_SIZE)
+        self.index = SegmentIndex(recording_key(path), started_at=self.started_at)
+        if profile is not None:
+            self.index.meta['profile'] = profile.name
+            self.writer = profile.open_writer(path, fps, frame_size)
+        else:
+            self.writer = cv2.VideoWriter(path, fourcc, fps, frame_size)
+
+    def is_opened(self):
+        return self.writer is not None and self.writer.isOpened()
+
+    def enable_proxy(self):
+        """Also write a small, low frame rate copy for browsing and review"""
+        self.proxy_path = proxy_filename(self.path)
+        size = fit_within(self.frame_size[0], self.frame_size[1], PROXY_MAX_SIZE)
+        self.proxy_size = (max(2, size[0] // 2 * 2), max(2, size[1] // 2 * 2))
+        profile = get_recording_profile(FALLBACK_PROFILE)
+        self.proxy_writer = profile.open_writer(self.proxy_path, PROXY_FPS, self.proxy_size)
+        if not self.proxy_writer.isOpened():
+            print(f"Failed to open review proxy {self.proxy_path}")
+            self.proxy_writer = None
+            self.proxy_path = None
+
+    def write(self, frame, captured_at=None):
+        width, height = self.frame_size
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+        captured_at = time.monotonic() if captured_at is None else captured_at
+        offset_ms = max(0, round((captured_at - self.mono_start) * 1000))
+        self.index.frames.append(offset_ms)
+        if self.proxy_writer is not None and not self.proxy_paused and offset_ms >= self.proxy_due_ms:
+            # Same captured frame, downscaled; the proxy keeps its own timestamps.
+            # A few ms of slack keeps jitter from skipping a whole proxy frame.
+            self.proxy_due_ms = offset_ms + int(1000 / PROXY_FPS) - 10
+            self.proxy_writer.write(cv2.resize(frame, self.proxy_size, interpolation=cv2.INTER_AREA))
+            self.index.proxy_frames.append(offset_ms)
+        if self.frames_written % POSTER_INTERVAL_FRAMES == 0:
+            # Keep a small copy in memory so the thumbnail never requires decoding the file
+            self.poster = cv2.resize(frame, self.poster_size, interpolation=cv2.INTER_AREA)
+        self.frames_written += 1
+
+    def is_static(self, frame, now):
+        """True if frame barely differs from the last one written and can be skipped"""
+        if self.static_threshold is None:
+            return False
+        small = cv2.resize(frame, ACTIVITY_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if (self.static_reference is not None
+                and now - self.static_written_at < STATIC_SCENE_MAX_GAP
+                and ActivityMonitor.changed_ratio(self.static_reference, gray) < self.static_threshold):
+            self.frames_skipped += 1
+            return True
+        self.static_reference = gray
+        self.static_written_at = now
+        return False
+
+    def backdate(self, frames):
+        """Move the segment start back to the oldest buffered frame; a no-op once frames are written"""
+        if not frames or self.frames_written:
+            return
+        lead = max(0.0, self.mono_start - frames[0][0])
+        self.mono_start -= lead
+        self.started_at -= lead
+        self.index.meta['started_at'] = self.started_at
+        self.index.activity.extend([0] * int(lead))
+
+    def write_preroll(self, frames):
+        """Write buffered (monotonic time, JPEG) frames ahead of the live ones"""
+        if not frames:
+            return
+        self.backdate(frames)
+        for captured_at, jpeg in frames:
+            frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+            if frame is not None:
+                self.write(frame, captured_at)
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.proxy_writer is not None:
+            self.proxy_writer.release()
+            self.proxy_writer = None
+
+    def elapsed(self):
+        return time.monotonic() - self.mono_start
+
+    def rebase_clock(self):
+        """Re-anchor the segment after the system clock was changed mid-recording.
+
+        Frame offsets are monotonic, so only the wall-clock start has to move.
+        """
+        self.started_at = time.time() - self.elapsed()
+        self.index.meta['started_at'] = self.started_at
+        self.index.meta['clock_adjusted'] = True
+
+    def finish_index(self):
+        duration = self.index.frames[-1] / 1000 if self.index.frames else self.elapsed()
+        activity = self.index.activity
+        self.index.meta.update(
+            ended_at=self.started_at + duration,
+            duration=duration,
+            filename=os.path.basename(self.path) + '.encrypted',
+            frames_skipped=self.frames_skipped,
+            # Per-minute maxima let the timeline draw heat from headers alone
+            activity_minutes=[max(activity[i:i + 60]) for i in range(0, len(activity), 60)]
+        )
+        return self.index
+
+    def bytes_on_disk(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+
+class ConfigStore:
+    """Writes the config file on a background thread; queued snapshots coalesce, the file is replaced atomically"""
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = None
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+        self._thread.start()
+
+    def write_async(self, config):
+        """Queue a snapshot; one still waiting to be written is superseded"""
+        data = json.dumps(config, indent=2, ensure_ascii=False)
+        with self._cond:
+            self._pending = data
+            self._cond.notify_all()
+
+    def write(self, config):
+        """Write a snapshot and wait until it is on disk"""
+        self.write_async(config)
+        self.wait()
+
+    def wait(self):
+        with self._cond:
+            while self._pending is not None or self._writing:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                data, self._pending = self._pending, None
+                self._writing = True
+            try:
+                self._replace(data)
+            except OSError as e:
+                print(f"Error saving config: {e}")
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _replace(self, data):
+        # A crash leaves either the old file or the new one, never a torn mix
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class AnnouncementStore:
+    """SQLite history of announcements; only the active (unarchived) ones are loaded at startup"""
+
+    def __init__(self, path=None):
+        self.path = path or ANNOUNCEMENTS_DB
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS announcements (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    color TEXT,
+                    archived INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS announcements_by_time ON announcements (archived, timestamp)"
+            )
+            columns = {row['name'] for row in self.db.execute("PRAGMA table_info(announcements)")}
+            if 'due' not in columns:
+                self.db.execute("ALTER TABLE announcements ADD COLUMN due TEXT")
+            if 'repeat' not in columns:
+                self.db.execute("ALTER TABLE announcements ADD COLUMN repeat TEXT NOT NULL DEFAULT 'none'")
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            'id': row['id'],
+            'text': row['text'],
+            'timestamp': row['timestamp'],
+            'color': row['color'],
+            'archived': bool(row['archived']),
+            'due': row['due'],
+            'repeat': row['repeat'],
+        }
+
+    def add(self, text, timestamp, color):
+        return self.add_many([{'text': text, 'timestamp': timestamp, 'color': color}])[0]
+
+    def add_many(self, items):
+        """Insert announcements in a single transaction; returns them with their ids"""
+        added = []
+        with self.db:
+            for item in items:
+                archived = bool(item.get('archived', False))
+                cursor = self.db.execute(
+                    "INSERT INTO announcements (text, timestamp, color, archived) VALUES (?, ?, ?, ?)",
+                    (item['text'], item['timestamp'], item.get('color'), int(archived))
+                )
+                added.append(dict(item, id=cursor.lastrowid, archived=archived))
+        return added
+
+    def all(self):
+        """Every announcement, archived ones included, oldest first"""
+        rows = self.db.execute("SELECT * FROM announcements ORDER BY timestamp, id").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def set_color(self, announcement_id, color):
+        with self.db:
+            self.db.execute("UPDATE announcements SET color = ? WHERE id = ?", (color, announcement_id))
+
+    def set_schedule(self, announcement_id, due, repeat='none'):
+        """Set when an announcement is next read aloud; due None clears the schedule"""
+        with self.db:
+            self.db.execute(
+                "UPDATE announcements SET due = ?, repeat = ? WHERE id = ?",
+                (due, repeat if due else 'none', announcement_id)
+            )
+
+    def scheduled(self):
+        """Active announcements that have a reading scheduled"""
+        rows = self.db.execute(
+            "SELECT * FROM announcements WHERE archived = 0 AND due IS NOT NULL ORDER BY due"
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete(self, announcement_id):
+        with self.db:
+            self.db.execute("DELETE FROM announcements WHERE id = ?", (announcement_id,))
+
+    def set_archived(self, ids, archived=True):
+        with self.db:
+            self.db.executemany(
+                "UPDATE announcements SET archived = ? WHERE id = ?",
+                [(int(archived), i) for i in ids]
+            )
+
+    def archive_before(self, timestamp):
+        """Archive active announcements posted before timestamp; returns how many
+
+        Announcements with a repeating or still pending reading are kept.
+        """
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE announcements SET archived = 1 WHERE archived = 0 AND timestamp < ? "
+                "AND repeat = 'none' AND (due IS NULL OR due < ?)", (timestamp, timestamp)
+            )
+        return cursor.rowcount
+
+    @staticmethod
+    def _where(text=None, date_from=None, date_to=None, archived=False):
+        clauses, params = [], []
+        if archived is not None:
+            clauses.append("archived = ?")
+            params.append(int(archived))
+        if text:
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("text LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if date_from is not None:
+            clauses.append("timestamp >= ?")
+            params.append(date_from.isoformat())
+        if date_to is not None:
+            # Timestamps are "YYYY-MM-DD HH:MM:SS", so the whole end day is before the next one
+            clauses.append("timestamp < ?")
+            params.append((date_to + datetime.timedelta(days=1)).isoformat())
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def active(self):
+        """Unarchived announcements, oldest first, as shown in the panel"""
+        rows = self.db.execute(
+            "SELECT * FROM announcements WHERE archived = 0 ORDER BY timestamp, id"
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def search(self, text=None, date_from=None, date_to=None, archived=False,
+               offset=0, limit=ANNOUNCEMENT_PAGE_SIZE):
+        """One page of matching announcements, newest first; archived=None searches everything"""
+        where, params = self._where(text, date_from, date_to, archived)
+        rows = self.db.execute(
+            f"SELECT * FROM announcements{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, text=None, date_from=None, date_to=None, archived=False):
+        where, params = self._where(text, date_from, date_to, archived)
+        return self.db.execute(f"SELECT COUNT(*) FROM announcements{where}", params).fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def _parse_announcement_time(value):
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y/%m/%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def read_announcements_file(path):
+    """Parse a CSV or JSON announcement file into (valid items, error messages).
+
+    Every row is checked before anything is imported; missing timestamps default to now
+    and missing colours to the panel default (None).
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('announcements')
+        if not isinstance(data, list):
+            return [], ["JSON 文件应为公告列表，或包含 announcements 列表的对象"]
+        rows = [(i + 1, row) for i, row in enumerate(data)]
+        label = "第 {} 条"
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            rows = [(reader.line_num, row) for row in reader]
+        label = "第 {} 行"
+
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    items, errors = [], []
+    for number, row in rows:
+        if not isinstance(row, dict):
+            errors.append(f"{label.format(number)}: 格式无效")
+            continue
+        row = {ANNOUNCEMENT_FIELD_ALIASES.get(str(k).strip(), str(k).strip()): v for k, v in row.items() if k is not None}
+        text = str(row.get('text') or '').strip()
+        if not text:
+            errors.append(f"{label.format(number)}: 内容为空")
+            continue
+        if len(text) > ANNOUNCEMENT_MAX_LENGTH:
+            errors.append(f"{label.format(number)}: 内容超过 {ANNOUNCEMENT_MAX_LENGTH} 字")
+            continue
+        raw_time = str(row.get('timestamp') or '').strip()
+        if raw_time:
+            parsed = _parse_announcement_time(raw_time)
+            if parsed is None:
+                errors.append(f"{label.format(number)}: 无法识别的时间 \"{raw_time}\"")
+                continue
+            timestamp = parsed.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            timestamp = now
+        color = str(row.get('color') or '').strip() or None
+        if color is not None and not QColor.isValidColor(color):
+            errors.append(f"{label.format(number)}: 无效的颜色 \"{color}\"")
+            continue
+        archived = row.get('archived', False)
+        if isinstance(archived, str):
+            archived = archived.strip().lower() in ('1', 'true', 'yes', '是')
+        items.append({
+            'text': text,
+            'timestamp': timestamp,
+            'color': QColor(color).name() if color else None,
+            'archived': bool(archived),
+        })
+    return items, errors
+
+
+def write_announcements_file(path, announcements):
+    """Export announcements as JSON or, for any other extension, CSV that Excel opens correctly"""
+    records = [{field: ann.get(field) for field in ANNOUNCEMENT_FIELDS} for ann in announcements]
+    tmp_path = path + '.tmp'
+    if path.lower().endswith('.json'):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'announcements': records}, f, indent=2, ensure_ascii=False)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=ANNOUNCEMENT_FIELDS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(dict(record, color=record['color'] or '', archived=int(bool(record['archived']))))
+    os.replace(tmp_path, path)
+
+
+def next_occurrence(due, repeat, after):
+    """First time after `after` that a reading due at `due` recurs, or None for one-off readings"""
+    if repeat not in ('daily', 'weekdays', 'weekly'):
+        return None
+    step = 7 if repeat == 'weekly' else 1
+    if due <= after:
+        # Jump close to `after` instead of stepping through every missed day
+        due += datetime.timedelta(days=(after - due).days // step * step)
+    while due <= after or (repeat == 'weekdays' and due.weekday() >= 5):
+        due += datetime.timedelta(days=step)
+    return due
+
+
+class AnnouncementScheduler(QObject):
+    """Emits announcements when their reading is due, from a heap and a single-shot timer"""
+
+    announcement_due = pyqtSignal(object)  # announcement id
+
+    def __init__(self, parent=None, clock=datetime.datetime.now):
+        super().__init__(parent)
+        self.clock = clock
+        self._heap = []  # (due, id); entries that disagree with _due are stale
+        self._due = {}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._fire)
+
+    def schedule(self, announcement_id, due):
+        self._due[announcement_id] = due
+        heapq.heappush(self._heap, (due, announcement_id))
+        self.rearm()
+
+    def unschedule(self, announcement_id):
+        if self._due.pop(announcement_id, None) is not None:
+            self.rearm()
+
+    def clear(self):
+        self._heap = []
+        self._due = {}
+        self.timer.stop()
+
+    def next_due(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def rearm(self):
+        """Point the timer at the earliest reading; also called after the system clock changes"""
+        top = self.next_due()
+        if top is None:
+            self.timer.stop()
+            return
+        delay_ms = (top[0] - self.clock()).total_seconds() * 1000
+        self.timer.start(int(min(max(delay_ms, 0), SCHEDULE_MAX_SLEEP_MS)))
+
+    def _fire(self):
+        now = self.clock()
+        while True:
+            top = self.next_due()
+            if top is None or top[0] > now:
+                break
+            heapq.heappop(self._heap)
+            del self._due[top[1]]
+            self.announcement_due.emit(top[1])
+        self.rearm()
+
+
+class Timetable:
+    """Weekly class periods with dated exceptions; tells when lessons are being recorded"""
+
+    def __init__(self, weekly=None, exceptions=None):
+        self.weekly = weekly or {}  # weekday (0 = Monday) -> [(start, end)] as datetime.time
+        self.exceptions = exceptions or []  # (first day, last day, periods); no periods means no lessons
+
+    @staticmethod
+    def _parse_periods(tokens):
+        periods = []
+        for token in tokens:
+            start_text, _, end_text = token.partition('-')
+            try:
+                start = datetime.datetime.strptime(start_text, "%H:%M").time()
+                end = datetime.datetime.strptime(end_text, "%H:%M").time()
+            except ValueError:
+                start = end = None
+            if start is None or end <= start:
+                raise ValueError(f"无效的时间段 \"{token}\"")
+            periods.append((start, end))
+        return sorted(periods)
+
+    @classmethod
+    def parse(cls, text):
+        """Parse the editable text form into (timetable, error messages)
+
+        "周一 08:00-08:45 09:00-09:45" adds weekly periods; "2024-10-01~2024-10-07 停课" and
+        "2024-09-29 08:00-08:45" replace the weekly periods on those dates.
+        """
+        weekly, exceptions, errors = {}, [], []
+        for number, line in enumerate(text.splitlines(), 1):
+            tokens = line.split()
+            if not tokens or tokens[0].startswith('#'):
+                continue
+            try:
+                if tokens[0] in WEEKDAY_NAMES:
+                    weekly.setdefault(WEEKDAY_NAMES.index(tokens[0]), []).extend(cls._parse_periods(tokens[1:]))
+                    continue
+                first_text, _, last_text = tokens[0].partition('~')
+                try:
+                    first = datetime.datetime.strptime(first_text, "%Y-%m-%d").date()
+                    last = datetime.datetime.strptime(last_text, "%Y-%m-%d").date() if last_text else first
+                except ValueError:
+                    raise ValueError(f"无法识别的星期或日期 \"{tokens[0]}\"")
+                if last < first:
+                    raise ValueError("结束日期早于开始日期")
+                periods = [] if tokens[1:] == ['停课'] else cls._parse_periods(tokens[1:])
+                if not periods and tokens[1:] != ['停课']:
+                    raise ValueError("请填写时间段或\"停课\"")
+                exceptions.append((first, last, periods))
+            except ValueError as e:
+                errors.append(f"第 {number} 行: {e}")
+        for periods in weekly.values():
+            periods.sort()
+        return cls(weekly, exceptions), errors
+
+    def to_text(self):
+        lines = []
+        for weekday in sorted(self.weekly):
+            periods = ' '.join(f"{s:%H:%M}-{e:%H:%M}" for s, e in self.weekly[weekday])
+            lines.append(f"{WEEKDAY_NAMES[weekday]} {periods}")
+        for first, last, periods in self.exceptions:
+            days = first.isoformat() if first == last else f"{first.isoformat()}~{last.isoformat()}"
+            lines.append(f"{days} {' '.join(f'{s:%H:%M}-{e:%H:%M}' for s, e in periods) or '停课'}")
+        return '\n'.join(lines)
+
+    def to_config(self):
+        return self.to_text().splitlines()
+
+    @classmethod
+    def from_config(cls, lines):
+        timetable, errors = cls.parse('\n'.join(str(line) for line in lines))
+        for error in errors:
+            print(f"Ignoring timetable entry: {error}")
+        return timetable
+
+    def periods_on(self, day):
+        """(start, end) datetimes of the lessons on a date; back-to-back periods are merged"""
+        periods = self.weekly.get(day.weekday(), [])
+        for first, last, replacement in self.exceptions:
+            if first <= day <= last:
+                periods = replacement  # Later exceptions win
+        merged = []
+        for start, end in periods:
+            start, end = datetime.datetime.combine(day, start), datetime.datetime.combine(day, end)
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [tuple(period) for period in merged]
+
+    def state_at(self, now, lead=datetime.timedelta(seconds=TIMETABLE_PREWARM_SECONDS)):
+        """'record' during a lesson, 'warm' just before one, otherwise 'idle'"""
+        state = 'idle'
+        for start, end in self.periods_on(now.date()):
+            if start <= now < end:
+                return 'record'
+            if start - lead <= now < start:
+                state = 'warm'
+        return state
+
+    def next_transition(self, now, lead=datetime.timedelta(seconds=TIMETABLE_PREWARM_SECONDS)):
+        """Earliest time after now at which state_at may change, or None if no lessons are coming"""
+        for offset in range(TIMETABLE_LOOKAHEAD_DAYS):
+            for start, end in self.periods_on(now.date() + datetime.timedelta(days=offset)):
+                for moment in (start - lead, start, end):
+                    if moment > now:
+                        return moment
+        return None
+
+
+class FrameEncoder(threading.Thread):
+    """Writes captured frames to their segment so encoding never stalls the capture loop"""
+
+    def __init__(self, max_frames=ENCODER_QUEUE_FRAMES):
+        super().__init__(name="frame-encoder", daemon=True)
+        self.frames = queue.Queue(maxsize=max_frames)
+        # Pre-record backlogs; written before the next queued item so they precede live frames
+        self.prerolls = deque()
+        self.dropped = 0
+        self.stopped = False
+
+    def submit(self, recorder, frame, captured_at):
+        """Queue a frame; it is dropped (and counted) if the encoder is too far behind"""
+        try:
+            self.frames.put_nowait((recorder, frame, captured_at))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def submit_preroll(self, recorder, frames):
+        """Queue buffered (monotonic time, JPEG) frames for a recorder that has not been published yet"""
+        if frames:
+            self.prerolls.append((recorder, frames))
+
+    def depth(self):
+        return self.frames.qsize() / self.frames.maxsize
+
+    def flush(self):
+        """Block until every frame queued so far has been written"""
+        if not self.is_alive():
+            return
+        done = threading.Event()
+        self.frames.put((None, done, None))
+        done.wait()
+
+    def stop(self):
+        if not self.stopped:
+            self.stopped = True
+            self.frames.put((None, None, None))
+
+    def _write_prerolls(self):
+        while self.prerolls:
+            recorder, frames = self.prerolls.popleft()
+            try:
+                recorder.write_preroll(frames)
+            except Exception as e:
+                print(f"Encoder error: {e}")
+
+    def run(self):
+        while True:
+            recorder, frame, captured_at = self.frames.get()
+            self._write_prerolls()
+            if recorder is None:
+                if frame is None:
+                    return
+                frame.set()
+                continue
+            try:
+                recorder.write(frame, captured_at)
+            except Exception as e:
+                print(f"Encoder error: {e}")
+
+
+class QualityController:
+    """Steps capture quality down under sustained overload and back up once there is headroom"""
+
+    LEVELS = (
+        "全质量",
+        "预览帧率减半",
+        "预览帧率 1/4，暂停预览副本",
+        "录制帧率减半",
+        "录制分辨率减半",
+    )
+
+    def __init__(self, period=1.0 / RECORDING_FPS, window=QUALITY_WINDOW_SECONDS):
+        self.period = period
+        self.window = window
+        self.level = 0
+        self.bad_windows = 0
+        self.good_windows = 0
+        self.dropped_seen = 0
+        self._reset_window(None)
+
+    def _reset_window(self, now):
+        self.window_start = now
+        self.samples = 0
+        self.busy_total = 0.0
+        self.depth_max = 0.0
+
+    def observe(self, busy, depth):
+        """Record one capture iteration: seconds spent working on it and encoder queue fill (0-1)"""
+        self.samples += 1
+        self.busy_total += busy
+        self.depth_max = max(self.depth_max, depth)
+
+    def evaluate(self, now, dropped_total=0):
+        """Close the window if it is over; returns (level, reason) when the level changes"""
+        if self.window_start is None:
+            self.window_start = now
+            return None
+        if now - self.window_start < self.window or not self.samples:
+            return None
+
+        load = self.busy_total / self.samples / self.period
+        depth = self.depth_max
+        dropped = max(0, dropped_total - self.dropped_seen)
+        self.dropped_seen = dropped_total
+        self._reset_window(now)
+
+        if load > 0.8 or depth > 0.5 or dropped:
+            self.bad_windows += 1
+            self.good_windows = 0
+        elif load < 0.4 and depth < 0.1:
+            self.good_windows += 1
+            self.bad_windows = 0
+        else:
+            self.bad_windows = self.good_windows = 0
+
+        reason = f"帧处理占用 {load:.0%}，编码队列 {depth:.0%}，丢帧 {dropped}"
+        if self.bad_windows >= QUALITY_STEP_DOWN_WINDOWS and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+            self.bad_windows = 0
+            return self.level, reason
+        if self.good_windows >= QUALITY_STEP_UP_WINDOWS and self.level > 0:
+            self.level -= 1
+            self.good_windows = 0
+            return self.level, reason
+        return None
+
+
+class StartupTimings:
+    """Time spent in each startup phase, from module import to the first painted window"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = OrderedDict()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = now - self.last
+        self.last = now
+
+    def summary(self):
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases.items())
+        return f"Startup took {(self.last - self.started) * 1000:.0f} ms ({phases})"
+
+
+class CameraControl:
+    """Camera property changes waiting for the capture thread; the latest value per property wins"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def request(self, prop, value):
+        with self._lock:
+            # Re-inserting keeps properties in the order they were last touched
+            self._pending.pop(prop, None)
+            self._pending[prop] = value
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+class CaptureSettings:
+    """Immutable snapshot of what the capture thread needs per frame; the GUI swaps in a new one"""
+
+    FIELDS = ('writer', 'show_timestamp', 'time_position', 'timestamp_scale',
+              'record_indicator_scale', 'motion_detection', 'pre_event_buffer')
+
+    def __init__(self, writer=None, show_timestamp=True, time_position="top-right", timestamp_scale=1.0,
+                 record_indicator_scale=1.0, motion_detection=False, pre_event_buffer=None):
+        values = dict(
+            writer=writer,
+            show_timestamp=bool(show_timestamp),
+            time_position=time_position,
+            timestamp_scale=float(timestamp_scale),
+            record_indicator_scale=float(record_indicator_scale),
+            motion_detection=bool(motion_detection),
+            pre_event_buffer=pre_event_buffer,
+        )
+        # A recording is exactly "has a writer", so the two can never disagree
+        values['recording'] = writer is not None
+
+        scale = values['timestamp_scale']
+        values['font_scale'] = 0.7 * scale
+        values['font_thickness'] = max(1, int(round(2 * scale)))
+        values['padding'] = max(6, int(round(10 * scale)))
+        values['box_padding'] = max(4, int(round(5 * scale)))
+
+        scale = values['record_indicator_scale']
+        radius = max(6, int(round(10 * scale)))
+        circle = (max(radius + 2, int(round(20 * scale))),) * 2
+        values['rec_radius'] = radius
+        values['rec_circle'] = circle
+        values['rec_text_origin'] = (circle[0] + radius + max(6, int(round(10 * scale))),
+                                     circle[1] + max(6, int(round(6 * scale))))
+        values['rec_font_scale'] = 0.7 * scale
+        values['rec_thickness'] = max(1, int(round(2 * scale)))
+        self.__dict__.update(values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CaptureSettings is immutable; use replace()")
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        values.update(changes)
+        return CaptureSettings(**values)
+
+
+class SpeechCache:
+    """Size-bounded LRU directory of synthesized announcements, keyed by text, voice and rate"""
+
+    def __init__(self, directory=None, max_bytes=TTS_CACHE_MB * 1024 * 1024):
+        self.directory = directory or TTS_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, voice, rate):
+        return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def partial_path(self, key):
+        return os.path.join(self.directory, f"{key}.partial")
+
+    def lookup(self, key):
+        """Path of the cached audio for key, marking it recently used, or None"""
+        path = self.path(key)
+        try:
+            if os.path.getsize(path) == 0:
+                return None
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def commit(self, key):
+        """Move a finished partial file into place and trim the cache"""
+        try:
+            if os.path.getsize(self.partial_path(key)) == 0:
+                return False
+            os.replace(self.partial_path(key), self.path(key))
+        except OSError:
+            return False
+        self._enforce_limit()
+        return True
+
+    def discard(self, key):
+        try:
+            os.remove(self.partial_path(key))
+        except OSError:
+            pass
+
+    def _enforce_limit(self):
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.directory):
+                    if not name.endswith('.wav'):
+                        continue
+                    path = os.path.join(self.directory, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+def wav_duration(path):
+    with wave.open(path, 'rb') as f:
+        return f.getnframes() / float(f.getframerate() or 1)
+
+
+class SpeechWorker(QThread):
+    """Owns the TTS engine and reads queued texts in priority order off the GUI thread"""
+    speaking_started = pyqtSignal(str)
+    speaking_finished = pyqtSignal(str, bool)  # text, read to the end
+    speaking_failed = pyqtSignal(str, str)  # text, error message
+    queue_changed = pyqtSignal(int)
+
+    def __init__(self, engine_factory=create_tts_engine, cache=None):
+        super().__init__()
+        self.engine_factory = engine_factory
+        self.engine = None
+        self.cache = cache
+        self.voice = None
+        self.available = None  # Unknown until the engine has been created
+        self._cond = threading.Condition()
+        self._queue = []  # Heap of (priority, sequence, text, action)
+        self._sequence = itertools.count()
+        self._current = None
+        self._interrupt = None  # 'skip', 'stop' or 'preempt' while the current item is cut short
+        self._running = True
+
+    def _push(self, priority, text, action):
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._sequence), text, action))
+            if self._current is not None and priority < self._current[0] and self._interrupt is None:
+                self._interrupt = 'preempt'
+            self._cond.notify()
+
+    def say(self, text, priority=SPEECH_PRIORITY_NORMAL):
+        """Queue text; an urgent item cuts off a normal one that is being read"""
+        self._push(priority, text, 'speak')
+        self.queue_changed.emit(self.pending())
+
+    def prepare(self, text):
+        """Synthesize text into the cache when nothing else is queued, so reading it later starts at once"""
+        if self.cache is not None:
+            self._push(SPEECH_PRIORITY_BACKGROUND, text, 'synthesize')
+
+    def skip(self):
+        """Stop the current text and carry on with the queue"""
+        with self._cond:
+            if self._current is not None and self._current[3] == 'speak':
+                self._interrupt = 'skip'
+
+    def stop(self):
+        """Stop the current text and drop everything queued to be read"""
+        with self._cond:
+            self._queue = [item for item in self._queue if item[3] != 'speak']
+            heapq.heapify(self._queue)
+            if self._current is not None and self._current[3] == 'speak':
+                self._interrupt = 'stop'
+        self.queue_changed.emit(0)
+
+    @property
+    def speaking(self):
+        current = self._current
+        return current is not None and current[3] == 'speak'
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for item in self._queue if item[3] == 'speak')
+
+    def shutdown(self):
+        with self._cond:
+            self._queue.clear()
+            if self._current is not None:
+                self._interrupt = 'stop'
+            self._running = False
+            self._cond.notify()
+
+    def _on_word(self, **kwargs):
+        # Engine callbacks run inside runAndWait on this thread, the only safe place to call stop()
+        if self._interrupt is not None:
+            self.engine.stop()
+
+    def _start_engine(self):
+        try:
+            self.engine = self.engine_factory()
+            self.engine.connect('started-utterance', self._on_word)
+            self.engine.connect('started-word', self._on_word)
+            self.voice = self.engine.getProperty('voice')
+            self.available = True
+        except Exception as e:
+            print(f"TTS engine initialization failed: {e}")
+            self.engine = None
+            self.available = False
+
+    def _cache_key(self, text):
+        return SpeechCache.key(text, self.voice, TTS_RATE)
+
+    def _synthesize(self, text):
+        key = self._cache_key(text)
+        if self.cache.lookup(key) is not None:
+            return True
+        try:
+            os.makedirs(self.cache.directory, exist_ok=True)
+            self.engine.save_to_file(text, self.cache.partial_path(key))
+            self.engine.runAndWait()
+        except Exception as e:
+            print(f"TTS synthesis error: {e}")
+            self.cache.discard(key)
+            return False
+        if self._interrupt is not None:
+            self.cache.discard(key)
+            return False
+        return self.cache.commit(key)
+
+    def _play_file(self, path):
+        """Play cached audio, polling for interrupts; None if this platform has no player"""
+        if winsound is None:
+            return None
+        try:
+            duration = wav_duration(path)
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+        except Exception as e:
+            print(f"Audio playback error: {e}")
+            return None
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            if self._interrupt is not None:
+                winsound.PlaySound(None, winsound.SND_PURGE)
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _speak(self, text):
+        if self.cache is not None:
+            path = self.cache.lookup(self._cache_key(text))
+            if path is not None:
+                played = self._play_file(path)
+                if played is not None:
+                    return played
+        self.engine.say(text)
+        self.engine.runAndWait()
+        return True
+
+    def run(self):
+        self._start_engine()
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    break
+                item = heapq.heappop(self._queue)
+                self._current = item
+                self._interrupt = None
+            _, _, text, action = item
+            if action == 'speak':
+                self.queue_changed.emit(self.pending())
+
+            completed = False
+            if self.engine is not None:
+                if action == 'speak':
+                    self.speaking_started.emit(text)
+                try:
+                    completed = self._speak(text) if action == 'speak' else self._synthesize(text)
+                except Exception as e:
+                    print(f"TTS error: {e}")
+                    if action == 'speak':
+                        self.speaking_failed.emit(text, str(e))
+
+            with self._cond:
+                interrupt = self._interrupt
+                self._current = None
+                self._interrupt = None
+                if interrupt == 'preempt' and self._running:
+                    heapq.heappush(self._queue, item)
+            if action == 'speak':
+                self.speaking_finished.emit(text, completed and interrupt is None)
 
 
 class VideoThread(QThread):
     frame_ready = pyqtSignal(QImage)
     status_changed = pyqtSignal(str, str)
+    quality_changed = pyqtSignal(int, str)
+    camera_property_changed = pyqtSignal(int, float)
     
     def __init__(self):
         super().__init__()
         self.running = False
-        self.recording = False
-        self.show_timestamp = True
         self.cap = None
-        self.video_writer = None
+        # Replaced as a whole by the GUI thread; read once per frame here
+        self.settings = CaptureSettings()
+        self.writer_lock = threading.Lock()
+        self.activity_monitor = None
+        self.encoder = None
+        self.quality = QualityController()
+        self._frame_count = 0
+        self._next_activity_sample = 0.0
+        self._next_motion_sample = 0.0
+        self._next_preroll_sample = 0.0
+        # Property changes are applied here between reads, never from the GUI thread
+        self.camera_control = CameraControl()
         self.exposure = 0
-        self.time_position = "top-right"
-        self.timestamp_scale = 1.0
-        self.record_indicator_scale = 1.0
-        
+
+    @property
+    def recording(self):
+        return self.settings.recording
+
+    @property
+    def video_writer(self):
+        return self.settings.writer
+
+    @property
+    def time_position(self):
+        return self.settings.time_position
+
+    @property
+    def timestamp_scale(self):
+        return self.settings.timestamp_scale
+
+    @property
+    def record_indicator_scale(self):
+        return self.settings.record_indicator_scale
+
+    def update_settings(self, **changes):
+        """Publish a new settings snapshot; GUI thread only"""
+        self.settings = self.settings.replace(**changes)
+
+    def swap_writer(self, new_writer):
+        """Replace the active writer between frames and return the previous one"""
+        with self.writer_lock:
+            old_writer = self.settings.writer
+            self.settings = self.settings.replace(writer=new_writer)
+        return old_writer
+
+    def start_writer(self, recorder):
+        """Attach the first segment of a recording, replaying the pre-event buffer into it"""
+        buffer = self.settings.pre_event_buffer
+        with self.writer_lock:
+            if buffer is not None:
+                frames = buffer.drain()
+                # Only the clock moves here; decoding and writing the backlog is the
+                # encoder's job, queued before any live frame can reach it
+                recorder.backdate(frames)
+                if self.encoder is not None:
+                    self.encoder.submit_preroll(recorder, frames)
+                else:
+                    recorder.write_preroll(frames)
+            old_writer = self.settings.writer
+            self.settings = self.settings.replace(writer=recorder)
+        return old_writer
+
+    def draw_timestamp(self, frame, settings=None):
+        settings = settings or self.settings
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        font_scale = settings.font_scale
+        font_thickness = settings.font_thickness
+        text_color = (255, 255, 255)
+        bg_color = (0, 0, 0)
+
+        text_size = cv2.getTextSize(current_time, font, font_scale, font_thickness)[0]
+        text_width, text_height = text_size
+        padding = settings.padding
+
+        if settings.time_position == "top-left":
+            x, y = padding, text_height + padding
+        elif settings.time_position == "top-right":
+            x, y = frame.shape[1] - text_width - padding, text_height + padding
+        elif settings.time_position == "bottom-left":
+            x, y = padding, frame.shape[0] - padding
+        elif settings.time_position == "bottom-right":
+            x, y = frame.shape[1] - text_width - padding, frame.shape[0] - padding
+        else:
+            x, y = frame.shape[1] - text_width - padding, text_height + padding
+
+        box_padding = settings.box_padding
+        cv2.rectangle(
+            frame,
+            (x - box_padding, y - text_height - box_padding),
+            (x + text_width + box_padding, y + box_padding),
+            bg_color,
+            -1
+        )
+        cv2.putText(frame, current_time, (x, y), font, font_scale, text_color, font_thickness)
+
+    def _apply_camera_commands(self):
+        for prop, value in self.camera_control.take().items():
+            try:
+                self.cap.set(prop, value)
+                actual = float(self.cap.get(prop))
+            except Exception as e:
+                print(f"Camera property {prop} error: {e}")
+                continue
+            if prop == cv2.CAP_PROP_EXPOSURE:
+                self.exposure = actual
+            self.camera_property_changed.emit(prop, actual)
+
+    def _write(self, recorder, frame, captured_at):
+        # Caller holds writer_lock; frames go through the encoder thread when there is one
+        if self.encoder is not None:
+            self.encoder.submit(recorder, frame, captured_at)
+        else:
+            recorder.write(frame, captured_at)
+
     def run(self):
         self.running = True
+        period = 1.0 / RECORDING_FPS
         while self.running and self.cap and self.cap.isOpened():
+            loop_start = time.monotonic()
+            self._apply_camera_commands()
             ret, frame = self.cap.read()
+            captured_at = time.monotonic()
             if ret and frame is not None:
-                # Add timestamp only if we're recording and should show it
-                if self.recording and self.show_timestamp:
-                    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    font_scale = 0.7 * float(self.timestamp_scale)
-                    font_thickness = max(1, int(round(2 * float(self.timestamp_scale))))
-                    text_color = (255, 255, 255)
-                    bg_color = (0, 0, 0)
-
-                    text_size = cv2.getTextSize(current_time, font, font_scale, font_thickness)[0]
-                    text_width, text_height = text_size
-                    padding = max(6, int(round(10 * float(self.timestamp_scale))))
-
-                    if self.time_position == "top-left":
-                        x, y = padding, text_height + padding
-                    elif self.time_position == "top-right":
-                        x, y = frame.shape[1] - text_width - padding, text_height + padding
-                    elif self.time_position == "bottom-left":
-                        x, y = padding, frame.shape[0] - padding
-                    elif self.time_position == "bottom-right":
-                        x, y = frame.shape[1] - text_width - padding, frame.shape[0] - padding
+                self._frame_count += 1
+                level = self.quality.level
+                # One consistent view of the settings for the whole frame
+                settings = self.settings
+                recorder = settings.writer
+                # Sample a tiny copy once per second for the activity index, and more
+                # often while the motion trigger is armed
+                if self.activity_monitor is not None and (settings.recording or settings.motion_detection):
+                    now = captured_at
+                    for_index = settings.recording and now >= self._next_activity_sample
+                    if for_index:
+                        self._next_activity_sample = now + 1.0
+                    if for_index or (settings.motion_detection and now >= self._next_motion_sample):
+                        self._next_motion_sample = now + MOTION_SAMPLE_INTERVAL
+                        small = cv2.resize(frame, ACTIVITY_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+                        self.activity_monitor.submit(small, recorder, for_index, captured_at)
+
+                # Decide on the clean frame, before any overlay changes it. Frames left out
+                # under overload are covered by the index timestamps like static ones.
+                skip = False
+                if settings.recording:
+                    recorder.proxy_paused = level >= 2
+                    if level >= 3 and self._frame_count % 2 == 1:
+                        recorder.frames_skipped += 1
+                        skip = True
                     else:
-                        x, y = frame.shape[1] - text_width - padding, text_height + padding
-
-                    box_padding = max(4, int(round(5 * float(self.timestamp_scale))))
-                    cv2.rectangle(
-                        frame,
-                        (x - box_padding, y - text_height - box_padding),
-                        (x + text_width + box_padding, y + box_padding),
-                        bg_color,
-                        -1
-                    )
-                    cv2.putText(frame, current_time, (x, y), font, font_scale, text_color, font_thickness)
-
-                if self.recording and self.video_writer is not None:
-                    self.video_writer.write(frame)
-
-                    scale = float(self.record_indicator_scale)
-                    radius = max(6, int(round(10 * scale)))
-                    circle_x = max(radius + 2, int(round(20 * scale)))
-                    circle_y = max(radius + 2, int(round(20 * scale)))
-                    text_x = circle_x + radius + max(6, int(round(10 * scale)))
-                    text_y = circle_y + max(6, int(round(6 * scale)))
-                    rec_font_scale = 0.7 * scale
-                    rec_thickness = max(1, int(round(2 * scale)))
-
-                    # Use ASCII indicator to avoid garbled characters
-                    cv2.circle(frame, (circle_x, circle_y), radius, (0, 0, 255), -1)
-                    cv2.putText(frame, "REC", (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, rec_font_scale, (0, 0, 255), rec_thickness)
-                
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = frame_rgb.shape
-                bytes_per_line = ch * w
-                qt_image = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                
-                self.frame_ready.emit(qt_image)
-                
-            self.msleep(50)
+                        skip = recorder.is_static(frame, captured_at)
+
+                # Add timestamp only if we're recording and should show it
+                if settings.recording and settings.show_timestamp:
+                    self.draw_timestamp(frame, settings)
+
+                if settings.recording:
+                    with self.writer_lock:
+                        # The writer may have been swapped since the snapshot was taken
+                        if self.settings.writer is recorder and not skip:
+                            self._write(recorder, frame, captured_at)
+                elif settings.pre_event_buffer is not None and captured_at >= self._next_preroll_sample:
+                    # A little slack keeps capture jitter from skipping a whole sample
+                    self._next_preroll_sample = captured_at + 1.0 / PRE_RECORD_FPS - 0.01
+                    # Buffer a stamped copy so the preview stays overlay-free
+                    buffered = frame.copy()
+                    if settings.show_timestamp:
+                        self.draw_timestamp(buffered, settings)
+                    jpeg = settings.pre_event_buffer.encode(buffered)
+                    with self.writer_lock:
+                        writer = self.settings.writer
+                        if writer is None:
+                            settings.pre_event_buffer.append(jpeg, captured_at)
+                        else:
+                            # A recording started while this frame was encoded
+                            self._write(writer, buffered, captured_at)
+
+                # The preview is thinned out first when the machine cannot keep up
+                preview_every = (1, 2, 4, 4, 4)[level]
+                if self._frame_count % preview_every == 0:
+                    # Convert into a new buffer so the encoder's copy is never drawn on
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    if settings.recording:
+                        # Use ASCII indicator to avoid garbled characters
+                        cv2.circle(frame_rgb, settings.rec_circle, settings.rec_radius, (255, 0, 0), -1)
+                        cv2.putText(frame_rgb, "REC", settings.rec_text_origin, cv2.FONT_HERSHEY_SIMPLEX,
+                                    settings.rec_font_scale, (255, 0, 0), settings.rec_thickness)
+
+                    h, w, ch = frame_rgb.shape
+                    bytes_per_line = ch * w
+                    qt_image = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
+
+                    self.frame_ready.emit(qt_image)
+
+                # Time spent on this frame, excluding the wait for the camera
+                now = time.monotonic()
+                self.quality.observe(now - captured_at, self.encoder.depth() if self.encoder is not None else 0.0)
+                change = self.quality.evaluate(now, self.encoder.dropped if self.encoder is not None else 0)
+                if change is not None:
+                    self.quality_changed.emit(*change)
+
+            remaining = period - (time.monotonic() - loop_start)
+            self.msleep(max(1, int(remaining * 1000)))
     
     def stop(self):
         self.running = False
@@ -717,6 +3520,151 @@ class FloatingRecorderWidget(QWidget):
         self.close()
 
 
+class AnnouncementCard(CardWidget):
+    """One announcement in the panel; kept alive across updates and only refreshed when it changes"""
+
+    colorRequested = pyqtSignal(object)
+    scheduleRequested = pyqtSignal(object)
+    deleteRequested = pyqtSignal(object)
+
+    def __init__(self, key, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.shown = None  # (caption, text, color) currently displayed
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(12, 12, 12, 12)
+        layout.setSpacing(6)
+
+        header = QHBoxLayout()
+        header.setContentsMargins(0, 0, 0, 0)
+        header.setSpacing(6)
+
+        # Plain labels styled by the panel's shared stylesheet, not one sheet per widget
+        self.time_label = QLabel()
+        self.time_label.setObjectName("announcementTime")
+        header.addWidget(self.time_label)
+        header.addStretch()
+
+        color_btn = PushButton(FluentIcon.PALETTE, "")
+        color_btn.setFixedSize(28, 28)
+        color_btn.setIconSize(QSize(14, 14))
+        color_btn.setToolTip("修改颜色")
+        color_btn.clicked.connect(lambda: self.colorRequested.emit(self.key))
+        header.addWidget(color_btn)
+
+        schedule_btn = PushButton(FluentIcon.STOP_WATCH, "")
+        schedule_btn.setFixedSize(28, 28)
+        schedule_btn.setIconSize(QSize(14, 14))
+        schedule_btn.setToolTip("定时朗读")
+        schedule_btn.clicked.connect(lambda: self.scheduleRequested.emit(self.key))
+        header.addWidget(schedule_btn)
+
+        delete_btn = PushButton(FluentIcon.DELETE, "")
+        delete_btn.setFixedSize(28, 28)
+        delete_btn.setIconSize(QSize(14, 14))
+        delete_btn.setToolTip("删除")
+        delete_btn.clicked.connect(lambda: self.deleteRequested.emit(self.key))
+        header.addWidget(delete_btn)
+        layout.addLayout(header)
+
+        self.text_label = QLabel()
+        self.text_label.setObjectName("announcementText")
+        self.text_label.setWordWrap(True)
+        layout.addWidget(self.text_label)
+
+    def set_announcement(self, caption, text, color):
+        if self.shown == (caption, text, color):
+            return
+        self.time_label.setText(caption)
+        self.text_label.setText(text)
+        palette = self.text_label.palette()
+        palette.setColor(QPalette.WindowText, QColor(color))
+        self.text_label.setPalette(palette)
+        self.shown = (caption, text, color)
+
+
+class AnnouncementDialog(QDialog):
+    """Dialog for writing a new announcement; built once and cleared each time it is opened"""
+
+    def __init__(self, parent, border_color):
+        super().__init__(parent)
+        self.border_color = border_color
+        self.selected_color = QColor()
+        self.setWindowTitle("添加公告")
+        self.setMinimumSize(420, 260)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        label = BodyLabel("请输入公告内容:")
+        layout.addWidget(label)
+
+        self.text_edit = TextEdit()
+        self.text_edit.setPlaceholderText("请输入公告内容...")
+        layout.addWidget(self.text_edit)
+
+        color_row = QHBoxLayout()
+        color_row.setSpacing(10)
+        color_row.addWidget(BodyLabel("文字颜色:"))
+
+        self.color_preview = QFrame()
+        self.color_preview.setFixedSize(22, 22)
+        color_row.addWidget(self.color_preview)
+
+        pick_btn = PushButton(FluentIcon.PALETTE, "选择")
+        pick_btn.clicked.connect(self.pick_color)
+        color_row.addWidget(pick_btn)
+        color_row.addStretch()
+        layout.addLayout(color_row)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+
+        cancel_btn = PushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(cancel_btn)
+
+        ok_btn = PrimaryPushButton("添加")
+        ok_btn.clicked.connect(self.confirm)
+        btn_layout.addWidget(ok_btn)
+        layout.addLayout(btn_layout)
+
+    def reset(self, color):
+        self.text_edit.clear()
+        self.set_color(QColor(color))
+        self.text_edit.setFocus()
+
+    def set_color(self, color):
+        self.selected_color = color
+        self.color_preview.setStyleSheet(
+            f"background-color: {color.name()}; border: 1px solid {self.border_color}; border-radius: 4px;"
+        )
+
+    def pick_color(self):
+        c = QColorDialog.getColor(self.selected_color, self, "选择公告文字颜色")
+        if c.isValid():
+            self.set_color(c)
+
+    def text(self):
+        return self.text_edit.toPlainText().strip()
+
+    def confirm(self):
+        if not self.text():
+            InfoBar.warning(
+                title="提示",
+                content="公告内容不能为空",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+            return
+        self.accept()
+
+
 class VideoDisplayWidget(QWidget):
     """Keep the video preview constrained to a fixed aspect ratio"""
     def __init__(self, ratio=16/9, parent=None):
@@ -770,8 +3718,15 @@ class VideoDisplayWidget(QWidget):
     
 
 class MonitoringApp(QMainWindow):
-    def __init__(self):
+    motion_changed = pyqtSignal(bool)
+    encoder_benchmark_done = pyqtSignal(dict)
+    archive_done = pyqtSignal(str, object)
+    segment_finalized = pyqtSignal(object, bool)  # SegmentIndex or None, show the saved message
+    expired_files_found = pyqtSignal(list)  # file names in RECORDINGS_DIR past retention
+
+    def __init__(self, startup_timings=None):
         super().__init__()
+        self.startup_timings = startup_timings or StartupTimings()
         
         self.colors = {
             'primary': '#0078D4',
@@ -794,6 +3749,8 @@ class MonitoringApp(QMainWindow):
         self.video_writer = None
         self.running = False
         self.exposure = 0
+        self.exposure_actual = None
+        self.exposure_value_label = None
         self.time_position = "top-right"
         self.timestamp_scale = 1.0
         self.record_indicator_scale = 1.0
@@ -801,10 +3758,40 @@ class MonitoringApp(QMainWindow):
         self.default_announcement_color = self.colors['text_primary']
         self.shortcuts_initialized = False
         self.shortcut_check_timer = None
-        self.announcements = []
+        self.announcements = []  # Active announcements shown in the panel, each with its store id
+        self.announcement_store = AnnouncementStore()
         self.config_file = CONFIG_FILE
+        self.config_store = ConfigStore(self.config_file)
+        self.config_save_timer = QTimer(self)
+        self.config_save_timer.setSingleShot(True)
+        self.config_save_timer.setInterval(CONFIG_SAVE_DELAY_MS)
+        self.config_save_timer.timeout.connect(self._write_config)
         self.video_thread = None
         self.encryption_manager = EncryptionManager()
+        self.thumbnail_cache = ThumbnailCache(self.encryption_manager)
+        self.pending_thumbnails = set()
+        self.closing_segments = set()  # Recorders handed to _close_segment that are not encrypted yet
+        self.activity_monitor = ActivityMonitor()
+        # Emitted from the monitor thread, delivered on the GUI thread
+        self.activity_monitor.on_motion = self.motion_changed.emit
+        self.motion_changed.connect(self.on_motion_changed)
+        self.activity_monitor.start()
+        self.frame_encoder = FrameEncoder()
+        self.frame_encoder.start()
+        self.speech_worker = SpeechWorker(cache=SpeechCache())
+        self.speech_worker.speaking_started.connect(self.on_speaking_started)
+        self.speech_worker.speaking_finished.connect(self.on_speaking_finished)
+        self.speech_worker.speaking_failed.connect(self.on_speaking_failed)
+        self.speech_worker.start()
+        self.announcement_scheduler = AnnouncementScheduler(self)
+        self.announcement_scheduler.announcement_due.connect(self.on_announcement_due)
+        self.tts_ann_btn = None
+        self.tts_skip_btn = None
+        self.tts_stop_btn = None
+        self.quality_level = 0
+        self.quality_log = deque(maxlen=QUALITY_LOG_LIMIT)
+        self.reduced_resolution = False
+        self.timeline_index = None
         self.current_video_path = None
         self.start_camera_action = None
         self.stop_camera_action = None
@@ -812,15 +3799,79 @@ class MonitoringApp(QMainWindow):
         self.tray_record_action = None
         self.video_widget = None
         self.announcement_container_layout = None
+        self.announcement_cards = {}  # key -> AnnouncementCard
+        self.announcement_window = ANNOUNCEMENT_WINDOW
+        self.no_announcement_label = None
         self.floating_widget = None
+        self.protected_recordings = []
+        self.low_bitrate_mode = False
+        self.recording_mode = "continuous"
+        self.motion_sensitivity = DEFAULT_MOTION_SENSITIVITY
+        self.motion_stop_delay = DEFAULT_MOTION_STOP_DELAY
+        self.motion_armed = False
+        self.pre_record_seconds = DEFAULT_PRE_RECORD_SECONDS
+        self.pre_record_memory_mb = DEFAULT_PRE_RECORD_MEMORY_MB
+        self.pre_event_buffer = None
+        self.skip_static_frames = False
+        self.recording_profile = "auto"
+        self.record_proxy = False
+        self.auto_profile = None
+        self.encoder_benchmark = {}
+        self.encoder_benchmark_key = None
+        self.frame_size = DEFAULT_FRAME_SIZE
+        self.segment_timer = None
+        self.disk_monitor_timer = None
+        self.bytes_per_second = DEFAULT_BITRATE_KBPS * 1000 / 8
+        self.background_pool = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="background",
+            initializer=lower_current_thread_priority
+        )
+        self.background_tasks = []
+        self.session_started = time.time()
+        self.archive_after_hours = DEFAULT_ARCHIVE_AFTER_HOURS
+        self.announcement_archive_days = DEFAULT_ANNOUNCEMENT_ARCHIVE_DAYS
+        self.archive_pool = None
+        self.archive_paused = None
+        self.archive_cancelled = None
+        self.archive_job = None
+        self.archive_failed = set()
+        self.dialogs = {}  # Heavy dialogs, built on first use and reused
+        self.timetable = Timetable()
+        self.timetable_enabled = False
+        self.timetable_camera = False  # Camera was opened by the timetable and is closed by it
+        self.timetable_recording = False
+        self.timetable_timer = QTimer(self)
+        self.timetable_timer.setSingleShot(True)
+        self.timetable_timer.timeout.connect(self.apply_timetable)
+        
+        self.startup_timings.mark("init")
         
         self.load_config()
+        self.load_announcements()
+        self.refresh_schedules()
+        if self.announcements:
+            self.speech_worker.prepare(self.announcements[-1]['text'])
+        self._update_pre_event_buffer()
+        self.startup_timings.mark("config")
         self.setup_ui()
+        self.startup_timings.mark("ui")
         self.setup_timer()
         self.setup_tray()
-        self.cleanup_old_videos()
-        self.protect_directories()
-        self.setup_shortcut_monitor()
+        self.startup_timings.mark("tray")
+        QTimer.singleShot(HOUSEKEEPING_DELAY_MS, self.start_housekeeping)
+        QTimer.singleShot(DIALOG_WARMUP_DELAY_MS, lambda: self.warm_up_dialogs(list(WARMUP_DIALOGS)))
+        self.encoder_benchmark_done.connect(self.on_encoder_benchmark_done)
+        QTimer.singleShot(RECOVERY_DELAY_MS, self.recover_orphaned_recordings)
+        QTimer.singleShot(BENCHMARK_DELAY_MS, self.schedule_encoder_benchmark)
+        self.archive_done.connect(self.on_archive_done)
+        self.segment_finalized.connect(self.on_segment_finalized)
+        self.expired_files_found.connect(self.remove_expired_files)
+        self.archive_timer = QTimer(self)
+        self.archive_timer.timeout.connect(self.schedule_archive_transcode)
+        self.archive_timer.start(ARCHIVE_CHECK_INTERVAL_MS)
+        # Opening the camera for a lesson in progress loads OpenCV; let the window paint first
+        QTimer.singleShot(0, self.apply_timetable)
         
         atexit.register(self.on_exit)
     
@@ -888,6 +3939,40 @@ class MonitoringApp(QMainWindow):
         self.start_recording_action.triggered.connect(self.toggle_recording)
         self.start_recording_action.setEnabled(False)
         recording_menu.addAction(self.start_recording_action)
+
+        recording_menu.addSeparator()
+        mode_menu = recording_menu.addMenu("录制模式")
+        mode_group = QActionGroup(self)
+        mode_group.setExclusive(True)
+        for label, value in (("连续录制", "continuous"), ("动作触发录制", "motion")):
+            action = QAction(label, self, checkable=True)
+            action.setChecked(value == self.recording_mode)
+            action.triggered.connect(lambda checked, v=value: self.set_recording_mode(v))
+            mode_group.addAction(action)
+            mode_menu.addAction(action)
+        recording_menu.addAction("动作灵敏度", self.change_motion_sensitivity)
+        recording_menu.addAction("无动作停止延时", self.change_motion_stop_delay)
+        self.profile_menu = recording_menu.addMenu("编码配置")
+        self.profile_menu.aboutToShow.connect(self.populate_profile_menu)
+        self.skip_static_action = QAction("静止画面不重复录制", self, checkable=True)
+        self.skip_static_action.setChecked(self.skip_static_frames)
+        self.skip_static_action.toggled.connect(self.set_skip_static_frames)
+        recording_menu.addAction(self.skip_static_action)
+        self.record_proxy_action = QAction("同时录制低清预览副本", self, checkable=True)
+        self.record_proxy_action.setChecked(self.record_proxy)
+        self.record_proxy_action.toggled.connect(self.set_record_proxy)
+        recording_menu.addAction(self.record_proxy_action)
+        recording_menu.addSeparator()
+        recording_menu.addAction("预录时长", self.change_pre_record_seconds)
+        recording_menu.addAction("预录内存上限", self.change_pre_record_memory)
+        recording_menu.addSeparator()
+        recording_menu.addAction("旧录像归档转码", self.change_archive_after_hours)
+        recording_menu.addSeparator()
+        self.timetable_action = QAction("按课表自动录制", self, checkable=True)
+        self.timetable_action.setChecked(self.timetable_enabled)
+        self.timetable_action.toggled.connect(self.set_timetable_enabled)
+        recording_menu.addAction(self.timetable_action)
+        recording_menu.addAction("编辑课表", self.edit_timetable)
         
         # Settings menu
         settings_menu = menubar.addMenu("设置")
@@ -928,6 +4013,13 @@ class MonitoringApp(QMainWindow):
         video_menu.addAction("导出视频", self.export_video)
         video_menu.addAction("删除视频", self.delete_video)
         
+        # Announcement menu
+        announcement_menu = menubar.addMenu("公告")
+        announcement_menu.addAction("导入公告", self.import_announcements)
+        announcement_menu.addAction("导出公告", self.export_announcements)
+        announcement_menu.addAction("公告历史", self.show_announcement_history)
+        announcement_menu.addAction("公告自动归档", self.change_announcement_archive_days)
+        
         # System menu
         system_menu = menubar.addMenu("系统")
         system_menu.addAction("设置系统时间", self.show_set_system_time_dialog)
@@ -983,11 +4075,31 @@ class MonitoringApp(QMainWindow):
         color_ann_btn.clicked.connect(self.change_default_announcement_color)
         ann_header.addWidget(color_ann_btn)
         
-        tts_ann_btn = PushButton(FluentIcon.MICROPHONE, "")
-        self._setup_icon_only_button(tts_ann_btn)
-        tts_ann_btn.setToolTip("朗读公告")
-        tts_ann_btn.clicked.connect(self.tts_read_announcement)
-        ann_header.addWidget(tts_ann_btn)
+        self.tts_ann_btn = PushButton(FluentIcon.MICROPHONE, "")
+        self._setup_icon_only_button(self.tts_ann_btn)
+        self.tts_ann_btn.setToolTip("朗读公告")
+        self.tts_ann_btn.clicked.connect(self.tts_read_announcement)
+        ann_header.addWidget(self.tts_ann_btn)
+
+        self.tts_skip_btn = PushButton(FluentIcon.SKIP_FORWARD, "")
+        self._setup_icon_only_button(self.tts_skip_btn)
+        self.tts_skip_btn.setToolTip("跳过当前朗读")
+        self.tts_skip_btn.clicked.connect(self.speech_worker.skip)
+        self.tts_skip_btn.hide()
+        ann_header.addWidget(self.tts_skip_btn)
+
+        self.tts_stop_btn = PushButton(FluentIcon.MUTE, "")
+        self._setup_icon_only_button(self.tts_stop_btn)
+        self.tts_stop_btn.setToolTip("停止朗读")
+        self.tts_stop_btn.clicked.connect(self.speech_worker.stop)
+        self.tts_stop_btn.hide()
+        ann_header.addWidget(self.tts_stop_btn)
+        
+        history_ann_btn = PushButton(FluentIcon.HISTORY, "")
+        self._setup_icon_only_button(history_ann_btn)
+        history_ann_btn.setToolTip("公告历史")
+        history_ann_btn.clicked.connect(self.show_announcement_history)
+        ann_header.addWidget(history_ann_btn)
         
         clear_ann_btn = PushButton(FluentIcon.DELETE, "")
         self._setup_icon_only_button(clear_ann_btn)
@@ -1003,12 +4115,34 @@ class MonitoringApp(QMainWindow):
         self.announcement_scroll.setStyleSheet("QScrollArea { border: none; background: transparent; }")
         
         self.announcement_container = QWidget()
+        # One stylesheet for every card instead of one per card
+        self.announcement_container.setStyleSheet(f"""
+            AnnouncementCard {{
+                background-color: {self.colors['surface']};
+                border: 1px solid {self.colors['border']};
+                border-radius: 8px;
+                padding: 10px;
+            }}
+            AnnouncementCard PushButton {{
+                padding: 0px;
+            }}
+            QLabel#announcementTime {{
+                color: {self.colors['text_secondary']};
+                font-size: 10px;
+            }}
+            QLabel#announcementText {{
+                font-size: 12px;
+            }}
+        """)
         self.announcement_container_layout = QVBoxLayout(self.announcement_container)
         self.announcement_container_layout.setSpacing(10)
         self.announcement_container_layout.setContentsMargins(0, 0, 0, 0)
         self.announcement_container_layout.addStretch()
         
         self.announcement_scroll.setWidget(self.announcement_container)
+        scroll_bar = self.announcement_scroll.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._extend_announcement_window)
+        scroll_bar.rangeChanged.connect(lambda _, __: self._extend_announcement_window(scroll_bar.value()))
         announcement_layout.addWidget(self.announcement_scroll)
         
         left_column.addWidget(announcement_card, 1)
@@ -1080,63 +4214,371 @@ class MonitoringApp(QMainWindow):
         if ok:
             self.set_camera_index(value)
 
-    def set_camera_index(self, idx: int):
-        idx = int(idx)
-        if idx == self.camera_index:
+    def set_camera_index(self, idx: int):
+        idx = int(idx)
+        if idx == self.camera_index:
+            return
+
+        self.camera_index = idx
+        self.save_config()
+
+        if self.cap is not None:
+            self.stop_camera()
+            self.start_camera()
+
+        InfoBar.success(
+            title="成功",
+            content=f"已选择摄像头: {idx}",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=2000,
+            parent=self
+        )
+
+    def change_timestamp_scale(self):
+        percent, ok = QInputDialog.getInt(
+            self,
+            "时间大小",
+            "请输入时间大小百分比 (50 - 200):",
+            int(round(self.timestamp_scale * 100)),
+            50,
+            200,
+            5
+        )
+        if not ok:
+            return
+
+        self.timestamp_scale = percent / 100.0
+        if self.video_thread:
+            self.video_thread.update_settings(timestamp_scale=self.timestamp_scale)
+        self.save_config()
+
+    def change_record_indicator_scale(self):
+        percent, ok = QInputDialog.getInt(
+            self,
+            "录制标识大小",
+            "请输入录制标识大小百分比 (50 - 200):",
+            int(round(self.record_indicator_scale * 100)),
+            50,
+            200,
+            5
+        )
+        if not ok:
+            return
+
+        self.record_indicator_scale = percent / 100.0
+        if self.video_thread:
+            self.video_thread.update_settings(record_indicator_scale=self.record_indicator_scale)
+        self.save_config()
+
+    def set_recording_mode(self, mode):
+        if mode == self.recording_mode:
+            return
+        self.recording_mode = mode
+        self.save_config()
+        if self.recording or self.motion_armed:
+            InfoBar.info(
+                title="提示",
+                content="录制模式将在下次开始录制时生效",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+    def change_motion_sensitivity(self):
+        value, ok = QInputDialog.getInt(
+            self,
+            "动作灵敏度",
+            "请输入动作灵敏度 (1 - 10，越大越灵敏):",
+            int(self.motion_sensitivity),
+            1,
+            10,
+            1
+        )
+        if not ok:
+            return
+
+        self.motion_sensitivity = value
+        if self.motion_armed:
+            self.activity_monitor.trigger.threshold = MotionTrigger(sensitivity=value).threshold
+        self.save_config()
+
+    def change_motion_stop_delay(self):
+        value, ok = QInputDialog.getInt(
+            self,
+            "无动作停止延时",
+            "画面静止多少秒后停止录制 (5 - 600):",
+            int(self.motion_stop_delay),
+            5,
+            600,
+            5
+        )
+        if not ok:
+            return
+
+        self.motion_stop_delay = value
+        if self.motion_armed:
+            self.activity_monitor.trigger.stop_delay = value
+        self.save_config()
+
+    def populate_profile_menu(self):
+        self.profile_menu.clear()
+        self.profile_menu.addAction("重新测试编码性能", lambda: self.schedule_encoder_benchmark(force=True))
+        self.profile_menu.addSeparator()
+        group = QActionGroup(self)
+        group.setExclusive(True)
+
+        auto_label = "自动选择"
+        if self.auto_profile:
+            auto_label += f" (当前: {get_recording_profile(self.auto_profile).label})"
+        choices = [("auto", auto_label)]
+        for profile in RECORDING_PROFILES:
+            label = profile.label
+            if profile.name in self.encoder_benchmark:
+                seconds = self.encoder_benchmark[profile.name]
+                label += f" - {seconds * 1000:.0f} ms/帧" if seconds is not None else " - 不可用或性能不足"
+            choices.append((profile.name, label))
+
+        for name, label in choices:
+            action = QAction(label, self, checkable=True)
+            action.setChecked(name == self.recording_profile)
+            action.triggered.connect(lambda checked, n=name: self.set_recording_profile(n))
+            group.addAction(action)
+            self.profile_menu.addAction(action)
+
+    def set_recording_profile(self, name):
+        if name == self.recording_profile:
+            return
+        self.recording_profile = name
+        self.bytes_per_second = self.active_profile().bitrate_kbps * 1000 / 8
+        self.save_config()
+        if self.recording:
+            InfoBar.info(
+                title="提示",
+                content="编码配置将在下一个分段生效",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+    def active_profile(self):
+        """Profile for the next segment: the user's choice or the benchmark winner"""
+        if self.recording_profile != "auto":
+            return get_recording_profile(self.recording_profile)
+        return get_recording_profile(self.auto_profile or FALLBACK_PROFILE)
+
+    def _benchmark_key(self):
+        # Results stay valid until the encoder build, the capture size or the CPU changes
+        return f"{cv2.__version__}|{self.frame_size[0]}x{self.frame_size[1]}|{os.cpu_count()}"
+
+    def schedule_encoder_benchmark(self, force=False):
+        if not force and self.encoder_benchmark_key == self._benchmark_key():
+            return
+        self.submit_background_task(self.run_encoder_benchmark, self.frame_size)
+
+    def run_encoder_benchmark(self, frame_size):
+        """Time the profiles, most efficient first, until one keeps up (background pool)"""
+        results = {}
+        for profile in RECORDING_PROFILES:
+            seconds = benchmark_encoder(profile, frame_size)
+            results[profile.name] = seconds
+            if seconds is not None:
+                break
+        summary = ", ".join(f"{name}={'-' if t is None else f'{t * 1000:.1f}ms'}" for name, t in results.items())
+        print(f"Encoder benchmark at {frame_size[0]}x{frame_size[1]}: {summary}")
+        self.encoder_benchmark_done.emit(results)
+        return results
+
+    @pyqtSlot(dict)
+    def on_encoder_benchmark_done(self, results):
+        self.encoder_benchmark = results
+        self.encoder_benchmark_key = self._benchmark_key()
+        self.auto_profile = next((name for name, t in results.items() if t is not None), None)
+        if self.recording_profile == "auto" and not self.recording:
+            self.bytes_per_second = self.active_profile().bitrate_kbps * 1000 / 8
+        self.save_config()
+
+    def set_skip_static_frames(self, enabled):
+        self.skip_static_frames = bool(enabled)
+        if self.video_writer is not None:
+            self.video_writer.static_threshold = STATIC_SCENE_THRESHOLD if self.skip_static_frames else None
+        self.save_config()
+
+    def set_record_proxy(self, enabled):
+        self.record_proxy = bool(enabled)
+        self.save_config()
+
+    def set_timetable_enabled(self, enabled):
+        self.timetable_enabled = bool(enabled)
+        self.save_config()
+        self.apply_timetable()
+
+    def edit_timetable(self):
+        """Edit weekly lesson periods and dated exceptions as text"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("编辑课表")
+        dialog.setMinimumSize(480, 420)
+
+        layout = QVBoxLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        tip = BodyLabel(
+            "每行一条，上课期间自动录制，课前一分钟预先打开摄像头。\n"
+            "每周课程: 周一 08:00-08:45 08:55-09:40\n"
+            "停课: 2024-10-01~2024-10-07 停课\n"
+            "调课（当天按此安排）: 2024-09-29 08:00-08:45"
+        )
+        tip.setWordWrap(True)
+        layout.addWidget(tip)
+
+        text_edit = TextEdit()
+        text_edit.setPlainText(self.timetable.to_text())
+        layout.addWidget(text_edit, 1)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        cancel_btn = PushButton("取消")
+        cancel_btn.clicked.connect(dialog.reject)
+        btn_layout.addWidget(cancel_btn)
+
+        ok_btn = PrimaryPushButton("保存")
+
+        def save_timetable():
+            timetable, errors = Timetable.parse(text_edit.toPlainText())
+            if errors:
+                QMessageBox.warning(dialog, "课表有误", "\n".join(errors[:10]))
+                return
+            self.timetable = timetable
+            self.save_config()
+            self.apply_timetable()
+            dialog.accept()
+
+        ok_btn.clicked.connect(save_timetable)
+        btn_layout.addWidget(ok_btn)
+        layout.addLayout(btn_layout)
+        dialog.exec_()
+
+    def apply_timetable(self):
+        """Bring camera and recording in line with the timetable, then sleep until the next change"""
+        self.timetable_timer.stop()
+        if not self.timetable_enabled:
+            # Whatever the timetable started is left to the user from here on
+            self.timetable_camera = False
+            self.timetable_recording = False
+            return
+        now = datetime.datetime.now()
+        state = self.timetable.state_at(now)
+
+        if state != 'idle' and self.cap is None:
+            self.start_camera()
+            self.timetable_camera = self.cap is not None
+        if state == 'record' and self.cap is not None and not (self.recording or self.motion_armed):
+            if self.recording_mode == "motion":
+                self.arm_motion_recording()
+                self.timetable_recording = True
+            else:
+                self.timetable_recording = self.start_recording()
+        elif state != 'record' and self.timetable_recording:
+            self.timetable_recording = False
+            if self.recording or self.motion_armed:
+                self.stop_recording(notify=False)
+        if state == 'idle' and self.timetable_camera:
+            self.timetable_camera = False
+            if self.cap is not None and not (self.recording or self.motion_armed):
+                self.stop_camera()
+
+        next_change = self.timetable.next_transition(now)
+        if next_change is not None:
+            delay_ms = (next_change - datetime.datetime.now()).total_seconds() * 1000
+            self.timetable_timer.start(int(min(max(delay_ms, 0), SCHEDULE_MAX_SLEEP_MS)))
+
+    def _update_pre_event_buffer(self):
+        """Create, resize or drop the pre-record buffer to match the settings"""
+        if self.pre_record_seconds <= 0:
+            self.pre_event_buffer = None
+        elif self.pre_event_buffer is None:
+            self.pre_event_buffer = PreEventBuffer(self.pre_record_seconds, self.pre_record_memory_mb * 1024 * 1024)
+        else:
+            self.pre_event_buffer.seconds = self.pre_record_seconds
+            self.pre_event_buffer.max_bytes = self.pre_record_memory_mb * 1024 * 1024
+        if self.video_thread:
+            self.video_thread.update_settings(pre_event_buffer=self.pre_event_buffer)
+
+    def change_pre_record_seconds(self):
+        value, ok = QInputDialog.getInt(
+            self,
+            "预录时长",
+            "开始录制时保留之前多少秒的画面 (0 - 30，0 为关闭):",
+            int(self.pre_record_seconds),
+            0,
+            30,
+            1
+        )
+        if not ok:
             return
 
-        self.camera_index = idx
+        self.pre_record_seconds = value
+        self._update_pre_event_buffer()
         self.save_config()
 
-        if self.cap is not None:
-            self.stop_camera()
-            self.start_camera()
-
-        InfoBar.success(
-            title="成功",
-            content=f"已选择摄像头: {idx}",
-            orient=Qt.Horizontal,
-            isClosable=True,
-            position=InfoBarPosition.TOP,
-            duration=2000,
-            parent=self
+    def change_pre_record_memory(self):
+        value, ok = QInputDialog.getInt(
+            self,
+            "预录内存上限",
+            "预录缓存最多占用多少 MB 内存 (8 - 512):",
+            int(self.pre_record_memory_mb),
+            8,
+            512,
+            8
         )
+        if not ok:
+            return
 
-    def change_timestamp_scale(self):
-        percent, ok = QInputDialog.getInt(
+        self.pre_record_memory_mb = value
+        self._update_pre_event_buffer()
+        self.save_config()
+
+    def change_archive_after_hours(self):
+        value, ok = QInputDialog.getInt(
             self,
-            "时间大小",
-            "请输入时间大小百分比 (50 - 200):",
-            int(round(self.timestamp_scale * 100)),
-            50,
-            200,
-            5
+            "旧录像归档转码",
+            "录像超过多少小时后在空闲时转为低码率归档 (0 为关闭):",
+            int(self.archive_after_hours),
+            0,
+            RETENTION_DAYS * 24,
+            1
         )
         if not ok:
             return
 
-        self.timestamp_scale = percent / 100.0
-        if self.video_thread:
-            self.video_thread.timestamp_scale = self.timestamp_scale
+        self.archive_after_hours = value
+        self.archive_failed.clear()
         self.save_config()
+        self.schedule_archive_transcode()
 
-    def change_record_indicator_scale(self):
-        percent, ok = QInputDialog.getInt(
+    def change_announcement_archive_days(self):
+        value, ok = QInputDialog.getInt(
             self,
-            "录制标识大小",
-            "请输入录制标识大小百分比 (50 - 200):",
-            int(round(self.record_indicator_scale * 100)),
-            50,
-            200,
-            5
+            "公告自动归档",
+            "公告发布超过多少天后自动归档 (0 为关闭):",
+            int(self.announcement_archive_days),
+            0,
+            ANNOUNCEMENT_ARCHIVE_MAX_DAYS,
+            1
         )
         if not ok:
             return
 
-        self.record_indicator_scale = percent / 100.0
-        if self.video_thread:
-            self.video_thread.record_indicator_scale = self.record_indicator_scale
+        self.announcement_archive_days = value
         self.save_config()
+        self.load_announcements()
+        self.update_announcement_display()
 
     def change_default_announcement_color(self):
         color = QColorDialog.getColor(QColor(self.default_announcement_color), self, "选择公告默认颜色")
@@ -1148,6 +4590,11 @@ class MonitoringApp(QMainWindow):
         self.update_announcement_display()
 
     def show_set_system_time_dialog(self):
+        dialog = self.cached_dialog('set_system_time')
+        dialog.time_edit.setDateTime(QDateTime.currentDateTime())
+        dialog.exec_()
+
+    def _build_system_time_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("设置系统时间")
         dialog.setFixedSize(420, 200)
@@ -1182,7 +4629,8 @@ class MonitoringApp(QMainWindow):
         btn_layout.addWidget(ok_btn)
 
         layout.addLayout(btn_layout)
-        dialog.exec_()
+        dialog.time_edit = dt_edit
+        return dialog
 
     def set_system_time(self, dt: datetime.datetime) -> bool:
         """Set system time. Returns True on success."""
@@ -1232,6 +4680,10 @@ class MonitoringApp(QMainWindow):
                 if result.returncode != 0:
                     raise RuntimeError((result.stderr or result.stdout or "权限不足或命令失败").strip())
 
+            if self.video_writer is not None:
+                self.video_writer.rebase_clock()
+            self.announcement_scheduler.rearm()
+            self.apply_timetable()
             InfoBar.success(
                 title="成功",
                 content=f"系统时间已设置为: {dt_str}",
@@ -1257,27 +4709,59 @@ class MonitoringApp(QMainWindow):
 
     def show_exposure_dialog(self):
         """Show exposure adjustment dialog"""
-        value, ok = QInputDialog.getInt(
-            self, "曝光调节", f"当前曝光值: {self.exposure}\n请输入新的曝光值 (-10 到 10):",
-            int(self.exposure), -10, 10, 1
+        original = self.exposure
+        dialog = QDialog(self)
+        dialog.setWindowTitle("曝光调节")
+        dialog.setFixedSize(420, 180)
+
+        layout = QVBoxLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        self.exposure_value_label = BodyLabel(self._exposure_text())
+        layout.addWidget(self.exposure_value_label)
+
+        # Changes preview live; only the final value is written to the config
+        slider = Slider(Qt.Horizontal, dialog)
+        slider.setRange(-10, 10)
+        slider.setValue(int(self.exposure))
+        slider.valueChanged.connect(lambda v: self.update_exposure(v, persist=False))
+        slider.valueChanged.connect(lambda v: self.exposure_value_label.setText(self._exposure_text()))
+        layout.addWidget(slider)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        cancel_btn = PushButton("取消")
+        cancel_btn.clicked.connect(dialog.reject)
+        btn_layout.addWidget(cancel_btn)
+        ok_btn = PrimaryPushButton("应用")
+        ok_btn.clicked.connect(dialog.accept)
+        btn_layout.addWidget(ok_btn)
+        layout.addLayout(btn_layout)
+
+        ok = dialog.exec_() == QDialog.Accepted
+        self.exposure_value_label = None
+        if not ok:
+            self.update_exposure(original, persist=False)
+            return
+
+        value = slider.value()
+        self.update_exposure(value)
+        InfoBar.success(
+            title="成功",
+            content=f"曝光已设置为: {value}",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=2000,
+            parent=self
         )
-        if ok:
-            self.update_exposure(value)
-            InfoBar.success(
-                title="成功",
-                content=f"曝光已设置为: {value}",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=2000,
-                parent=self
-            )
     
     def set_time_position(self, position):
         """Set time position from menu"""
         self.time_position = position
         if self.video_thread:
-            self.video_thread.time_position = self.time_position
+            self.video_thread.update_settings(time_position=self.time_position)
         self.save_config()
         InfoBar.success(
             title="成功",
@@ -1379,8 +4863,8 @@ class MonitoringApp(QMainWindow):
             return
 
         try:
-            # Run once on startup
-            self.ensure_launch_shortcuts()
+            # Run once on startup; PowerShell is slow to start, so never on the GUI thread
+            self.submit_background_task(self.ensure_launch_shortcuts)
 
             if not self.shortcuts_initialized:
                 self.shortcuts_initialized = True
@@ -1388,7 +4872,9 @@ class MonitoringApp(QMainWindow):
 
             # Then re-check every 10 minutes
             self.shortcut_check_timer = QTimer(self)
-            self.shortcut_check_timer.timeout.connect(self.ensure_launch_shortcuts)
+            self.shortcut_check_timer.timeout.connect(
+                lambda: self.submit_background_task(self.ensure_launch_shortcuts)
+            )
             self.shortcut_check_timer.start(10 * 60 * 1000)
         except Exception as e:
             print(f"Shortcut monitor init failed: {e}")
@@ -1463,89 +4949,17 @@ class MonitoringApp(QMainWindow):
     
     def add_announcement(self):
         """Add new announcement"""
-        dialog = QDialog(self)
-        dialog.setWindowTitle("添加公告")
-        dialog.setMinimumSize(420, 260)
-
-        layout = QVBoxLayout(dialog)
-        layout.setSpacing(12)
-        layout.setContentsMargins(20, 20, 20, 20)
-
-        label = BodyLabel("请输入公告内容:")
-        layout.addWidget(label)
-
-        text_edit = TextEdit()
-        text_edit.setPlaceholderText("请输入公告内容...")
-        layout.addWidget(text_edit)
-
-        color_row = QHBoxLayout()
-        color_row.setSpacing(10)
-        color_row.addWidget(BodyLabel("文字颜色:"))
-
-        selected = {'color': QColor(self.default_announcement_color)}
-        color_preview = QFrame()
-        color_preview.setFixedSize(22, 22)
-        color_preview.setStyleSheet(
-            f"background-color: {selected['color'].name()}; border: 1px solid {self.colors['border']}; border-radius: 4px;"
-        )
-        color_row.addWidget(color_preview)
-
-        pick_btn = PushButton(FluentIcon.PALETTE, "选择")
-
-        def pick_color():
-            c = QColorDialog.getColor(selected['color'], dialog, "选择公告文字颜色")
-            if c.isValid():
-                selected['color'] = c
-                color_preview.setStyleSheet(
-                    f"background-color: {c.name()}; border: 1px solid {self.colors['border']}; border-radius: 4px;"
-                )
-
-        pick_btn.clicked.connect(pick_color)
-        color_row.addWidget(pick_btn)
-        color_row.addStretch()
-        layout.addLayout(color_row)
-
-        btn_layout = QHBoxLayout()
-        btn_layout.addStretch()
-
-        cancel_btn = PushButton("取消")
-        cancel_btn.clicked.connect(dialog.reject)
-        btn_layout.addWidget(cancel_btn)
-
-        ok_btn = PrimaryPushButton("添加")
-
-        def do_add():
-            text = text_edit.toPlainText().strip()
-            if not text:
-                InfoBar.warning(
-                    title="提示",
-                    content="公告内容不能为空",
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=2000,
-                    parent=dialog
-                )
-                return
-            dialog.accept()
-
-        ok_btn.clicked.connect(do_add)
-        btn_layout.addWidget(ok_btn)
-        layout.addLayout(btn_layout)
-
+        dialog = self.cached_dialog('add_announcement')
+        dialog.reset(self.default_announcement_color)
         if dialog.exec_() != QDialog.Accepted:
             return
 
         try:
-            text = text_edit.toPlainText().strip()
+            text = dialog.text()
             timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.announcements.append({
-                'text': text,
-                'timestamp': timestamp,
-                'color': selected['color'].name()
-            })
+            self.announcements.append(self.announcement_store.add(text, timestamp, dialog.selected_color.name()))
             self.update_announcement_display()
-            self.save_config()
+            self.speech_worker.prepare(text)
             InfoBar.success(
                 title="成功",
                 content="公告添加成功",
@@ -1632,7 +5046,7 @@ class MonitoringApp(QMainWindow):
             )
             return
         
-        if tts_engine is None:
+        if self.speech_worker.available is False:
             InfoBar.error(
                 title="错误",
                 content="TTS引擎未初始化",
@@ -1648,110 +5062,448 @@ class MonitoringApp(QMainWindow):
         if not self.verify_password_with_dialog():
             return
         
-        # Get latest announcement
+        # Read the latest announcement on the speech worker; a manual press cuts off
+        # scheduled reading, which is read again afterwards
         latest = self.announcements[-1]
-        text = latest['text']
-        
-        try:
-            tts_engine.say(text)
-            tts_engine.runAndWait()
-        except Exception as e:
-            print(f"TTS error: {e}")
-            InfoBar.error(
-                title="错误",
-                content=f"朗读失败: {str(e)}",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
+        self.speech_worker.say(latest['text'], SPEECH_PRIORITY_URGENT)
+
+    @pyqtSlot(str)
+    def on_speaking_started(self, text):
+        if self.tts_ann_btn is not None:
+            self.tts_ann_btn.setToolTip(f"正在朗读: {text[:30]}")
+            self.tts_skip_btn.show()
+            self.tts_stop_btn.show()
+
+    @pyqtSlot(str, bool)
+    def on_speaking_finished(self, text, completed):
+        if self.tts_ann_btn is not None and not self.speech_worker.speaking and not self.speech_worker.pending():
+            self.tts_ann_btn.setToolTip("朗读公告")
+            self.tts_skip_btn.hide()
+            self.tts_stop_btn.hide()
     
+    @pyqtSlot(str, str)
+    def on_speaking_failed(self, text, error):
+        InfoBar.error(
+            title="错误",
+            content=f"朗读失败: {error}",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
+
     def clear_announcements(self):
-        """Clear all announcements"""
+        """Clear all announcements from the panel; they stay in the archive"""
         reply = QMessageBox.question(
-            self, "确认", "确定要清空所有公告吗？",
+            self, "确认", "确定要清空所有公告吗？\n已清空的公告可在公告历史中查找和恢复。",
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
+            self.announcement_store.set_archived([a['id'] for a in self.announcements if 'id' in a])
             self.announcements = []
+            self.announcement_scheduler.clear()
             self.update_announcement_display()
-            self.save_config()
     
+    def import_announcements(self):
+        """Import announcements from a CSV or JSON file in a single transaction"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "导入公告", os.path.expanduser("~"), "公告文件 (*.csv *.json);;所有文件 (*)"
+        )
+        if not path:
+            return
+        try:
+            items, errors = read_announcements_file(path)
+        except (OSError, ValueError, csv.Error) as e:
+            QMessageBox.warning(self, "导入失败", f"无法读取文件:\n{e}")
+            return
+
+        if errors:
+            shown = "\n".join(errors[:10])
+            if len(errors) > 10:
+                shown += f"\n…另有 {len(errors) - 10} 处错误"
+            if not items:
+                QMessageBox.warning(self, "导入失败", f"文件中没有有效的公告:\n{shown}")
+                return
+            reply = QMessageBox.question(
+                self, "部分内容无效",
+                f"{len(errors)} 条记录无效，将被跳过:\n{shown}\n\n是否导入其余 {len(items)} 条公告？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+        elif not items:
+            QMessageBox.information(self, "提示", "文件中没有公告")
+            return
+
+        try:
+            self.announcement_store.add_many(items)
+        except sqlite3.Error as e:
+            print(f"Error importing announcements: {e}")
+            QMessageBox.warning(self, "导入失败", f"写入公告数据库失败:\n{e}")
+            return
+        self.announcements = self.announcement_store.active()
+        self.refresh_schedules()
+        self.update_announcement_display()
+        if self.announcements:
+            self.speech_worker.prepare(self.announcements[-1]['text'])
+
+        InfoBar.success(
+            title="导入成功",
+            content=f"已导入 {len(items)} 条公告",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
+
+    def export_announcements(self):
+        """Export every announcement, archived ones included, to CSV or JSON"""
+        default_name = f"announcements_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出公告", os.path.join(os.path.expanduser("~"), default_name),
+            "CSV 文件 (*.csv);;JSON 文件 (*.json)"
+        )
+        if not path:
+            return
+        announcements = self.announcement_store.all()
+        try:
+            write_announcements_file(path, announcements)
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", f"无法写入文件:\n{e}")
+            return
+
+        InfoBar.success(
+            title="导出成功",
+            content=f"已导出 {len(announcements)} 条公告到 {os.path.basename(path)}",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
+
+    @staticmethod
+    def _announcement_key(ann):
+        # Stored announcements are keyed by id; unsaved ones by their content
+        return ann['id'] if 'id' in ann else (ann.get('timestamp', ''), ann.get('text', ''))
+
+    @staticmethod
+    def _announcement_caption(ann):
+        caption = ann.get('timestamp', '')
+        if ann.get('due'):
+            repeat = ann.get('repeat', 'none')
+            due = ann['due'][11:16] if repeat != 'none' else ann['due'][:16]
+            label = ANNOUNCEMENT_REPEATS.get(repeat, '') if repeat != 'none' else ''
+            caption += f"  ·  {label}{due} 朗读"
+        return caption
+
+    def _announcement_index(self, key):
+        for index, ann in enumerate(self.announcements):
+            if self._announcement_key(ann) == key:
+                return index
+        return -1
+
     def update_announcement_display(self):
-        """Update announcement display with cards"""
-        # Clear existing widgets (except stretch)
-        while self.announcement_container_layout.count() > 1:
-            item = self.announcement_container_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        if not self.announcements:
-            no_ann_label = BodyLabel("暂无公告")
-            no_ann_label.setAlignment(Qt.AlignCenter)
-            no_ann_label.setStyleSheet(f"color: {self.colors['text_secondary']}; padding: 20px;")
-            self.announcement_container_layout.insertWidget(0, no_ann_label)
-        else:
-            for idx, ann in enumerate(self.announcements):
-                ann_card = CardWidget()
-                ann_card.setStyleSheet(f"""
-                    CardWidget {{
-                        background-color: {self.colors['surface']};
-                        border: 1px solid {self.colors['border']};
-                        border-radius: 8px;
-                        padding: 10px;
-                    }}
-                """)
-                ann_layout = QVBoxLayout(ann_card)
-                ann_layout.setContentsMargins(12, 12, 12, 12)
-                ann_layout.setSpacing(6)
-
-                header = QHBoxLayout()
-                header.setContentsMargins(0, 0, 0, 0)
-                header.setSpacing(6)
-
-                time_label = CaptionLabel(ann.get('timestamp', ''))
-                time_label.setStyleSheet(f"color: {self.colors['text_secondary']}; font-size: 10px;")
-                header.addWidget(time_label)
-                header.addStretch()
-
-                color_btn = PushButton(FluentIcon.PALETTE, "")
-                self._setup_icon_only_button(color_btn, size=28, icon_size=QSize(14, 14))
-                color_btn.setToolTip("修改颜色")
-                color_btn.clicked.connect(lambda checked, i=idx: self.change_announcement_color(i))
-                header.addWidget(color_btn)
-
-                delete_btn = PushButton(FluentIcon.DELETE, "")
-                self._setup_icon_only_button(delete_btn, size=28, icon_size=QSize(14, 14))
-                delete_btn.setToolTip("删除")
-                delete_btn.clicked.connect(lambda checked, i=idx: self.delete_announcement(i))
-                header.addWidget(delete_btn)
-
-                ann_layout.addLayout(header)
-
-                color = ann.get('color', self.default_announcement_color)
-                text_label = BodyLabel(ann.get('text', ''))
-                text_label.setWordWrap(True)
-                text_label.setStyleSheet(f"color: {color}; font-size: 12px;")
-                ann_layout.addWidget(text_label)
-
-                self.announcement_container_layout.insertWidget(
-                    self.announcement_container_layout.count() - 1, ann_card
-                )
+        """Bring the announcement cards in line with self.announcements, touching only what changed"""
+        layout = self.announcement_container_layout
+        visible = self.announcements[:self.announcement_window]
+        keys = [self._announcement_key(ann) for ann in visible]
+
+        for key in set(self.announcement_cards) - set(keys):
+            card = self.announcement_cards.pop(key)
+            layout.removeWidget(card)
+            card.deleteLater()
+
+        if self.no_announcement_label is None:
+            self.no_announcement_label = BodyLabel("暂无公告")
+            self.no_announcement_label.setAlignment(Qt.AlignCenter)
+            self.no_announcement_label.setStyleSheet(f"color: {self.colors['text_secondary']}; padding: 20px;")
+        if not visible:
+            if layout.indexOf(self.no_announcement_label) < 0:
+                layout.insertWidget(0, self.no_announcement_label)
+            self.no_announcement_label.show()
+            return
+        if layout.indexOf(self.no_announcement_label) >= 0:
+            layout.removeWidget(self.no_announcement_label)
+            self.no_announcement_label.hide()
+
+        for position, (key, ann) in enumerate(zip(keys, visible)):
+            card = self.announcement_cards.get(key)
+            if card is None:
+                card = AnnouncementCard(key)
+                card.colorRequested.connect(lambda k: self.change_announcement_color(self._announcement_index(k)))
+                card.scheduleRequested.connect(lambda k: self.schedule_announcement(self._announcement_index(k)))
+                card.deleteRequested.connect(lambda k: self.delete_announcement(self._announcement_index(k)))
+                self.announcement_cards[key] = card
+            card.set_announcement(self._announcement_caption(ann), ann.get('text', ''),
+                                  ann.get('color') or self.default_announcement_color)
+            if layout.indexOf(card) != position:
+                if layout.indexOf(card) >= 0:
+                    layout.removeWidget(card)
+                layout.insertWidget(position, card)
+
+        if len(self.announcements) > len(visible):
+            # Cards that fit without scrolling never trigger the scroll bar, so check once laid out
+            QTimer.singleShot(0, lambda: self._extend_announcement_window(
+                self.announcement_scroll.verticalScrollBar().value()))
+
+    def _extend_announcement_window(self, value):
+        """Create further cards once the panel is scrolled near the end of those that exist"""
+        scroll_bar = self.announcement_scroll.verticalScrollBar()
+        if value >= scroll_bar.maximum() - 200 and self.announcement_window < len(self.announcements):
+            self.announcement_window += ANNOUNCEMENT_WINDOW
+            self.update_announcement_display()
+
+    def show_announcement_history(self):
+        """Search all announcements, including archived ones, one page at a time"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("公告历史")
+        dialog.setMinimumSize(640, 520)
+
+        layout = QVBoxLayout(dialog)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        filter_row = QHBoxLayout()
+        search_edit = LineEdit()
+        search_edit.setPlaceholderText("搜索公告内容...")
+        filter_row.addWidget(search_edit, 1)
+        date_from = QDateEdit(QDate.currentDate().addMonths(-1), dialog)
+        date_from.setCalendarPopup(True)
+        date_from.setDisplayFormat("yyyy-MM-dd")
+        date_to = QDateEdit(QDate.currentDate(), dialog)
+        date_to.setCalendarPopup(True)
+        date_to.setDisplayFormat("yyyy-MM-dd")
+        filter_row.addWidget(date_from)
+        filter_row.addWidget(BodyLabel("至"))
+        filter_row.addWidget(date_to)
+        scope_box = ComboBox()
+        scopes = [("全部", None), ("当前公告", False), ("已归档", True)]
+        scope_box.addItems([label for label, _ in scopes])
+        filter_row.addWidget(scope_box)
+        layout.addLayout(filter_row)
+
+        list_widget = QListWidget()
+        list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        layout.addWidget(list_widget, 1)
+
+        page_row = QHBoxLayout()
+        prev_btn = PushButton("上一页")
+        page_label = BodyLabel("")
+        next_btn = PushButton("下一页")
+        page_row.addWidget(prev_btn)
+        page_row.addWidget(page_label)
+        page_row.addWidget(next_btn)
+        page_row.addStretch()
+        archive_btn = PushButton("归档所选")
+        restore_btn = PushButton("恢复所选")
+        page_row.addWidget(archive_btn)
+        page_row.addWidget(restore_btn)
+        layout.addLayout(page_row)
+
+        state = {'page': 0}
+
+        def criteria():
+            return dict(
+                text=search_edit.text().strip() or None,
+                date_from=date_from.date().toPyDate(),
+                date_to=date_to.date().toPyDate(),
+                archived=scopes[scope_box.currentIndex()][1]
+            )
+
+        def load_page():
+            query = criteria()
+            total = self.announcement_store.count(**query)
+            pages = max(1, (total + ANNOUNCEMENT_PAGE_SIZE - 1) // ANNOUNCEMENT_PAGE_SIZE)
+            state['page'] = min(state['page'], pages - 1)
+            rows = self.announcement_store.search(offset=state['page'] * ANNOUNCEMENT_PAGE_SIZE, **query)
+            list_widget.clear()
+            for ann in rows:
+                prefix = "[已归档] " if ann['archived'] else ""
+                item = QListWidgetItem(f"{ann['timestamp']}  {prefix}{ann['text']}")
+                item.setData(Qt.UserRole, ann['id'])
+                list_widget.addItem(item)
+            page_label.setText(f"第 {state['page'] + 1} / {pages} 页，共 {total} 条")
+            prev_btn.setEnabled(state['page'] > 0)
+            next_btn.setEnabled(state['page'] < pages - 1)
+
+        def refilter():
+            state['page'] = 0
+            load_page()
+
+        def turn(step):
+            state['page'] += step
+            load_page()
+
+        def set_archived(archived):
+            ids = [item.data(Qt.UserRole) for item in list_widget.selectedItems()]
+            if not ids:
+                return
+            self.announcement_store.set_archived(ids, archived)
+            self.announcements = self.announcement_store.active()
+            self.refresh_schedules()
+            self.update_announcement_display()
+            load_page()
+
+        # Typing re-queries after a short pause rather than on every key
+        search_timer = QTimer(dialog)
+        search_timer.setSingleShot(True)
+        search_timer.setInterval(300)
+        search_timer.timeout.connect(refilter)
+        search_edit.textChanged.connect(lambda _: search_timer.start())
+        date_from.dateChanged.connect(lambda _: refilter())
+        date_to.dateChanged.connect(lambda _: refilter())
+        scope_box.currentIndexChanged.connect(lambda _: refilter())
+        prev_btn.clicked.connect(lambda: turn(-1))
+        next_btn.clicked.connect(lambda: turn(1))
+        archive_btn.clicked.connect(lambda: set_archived(True))
+        restore_btn.clicked.connect(lambda: set_archived(False))
+
+        load_page()
+        dialog.exec_()
+
+    def change_announcement_color(self, index: int):
+        if index < 0 or index >= len(self.announcements):
+            return
+
+        current = QColor(self.announcements[index].get('color', self.default_announcement_color))
+        color = QColorDialog.getColor(current, self, "选择公告颜色")
+        if not color.isValid():
+            return
+
+        self.announcements[index]['color'] = color.name()
+        if 'id' in self.announcements[index]:
+            self.announcement_store.set_color(self.announcements[index]['id'], color.name())
+        self.update_announcement_display()
+
+    def schedule_announcement(self, index: int):
+        """Choose when an announcement is read aloud automatically (password protected)"""
+        if index < 0 or index >= len(self.announcements) or 'id' not in self.announcements[index]:
+            return
+        if not self.verify_password_with_dialog():
+            return
+        ann = self.announcements[index]
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("定时朗读")
+        dialog.setFixedSize(420, 220)
+
+        layout = QVBoxLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        tip = BodyLabel("到点后自动朗读这条公告，无需输入密码。")
+        tip.setWordWrap(True)
+        layout.addWidget(tip)
+
+        start = QDateTime.currentDateTime().addSecs(60)
+        if ann.get('due'):
+            start = QDateTime.fromString(ann['due'], "yyyy-MM-dd HH:mm:ss")
+        dt_edit = QDateTimeEdit(start, dialog)
+        dt_edit.setDisplayFormat("yyyy-MM-dd HH:mm")
+        dt_edit.setCalendarPopup(True)
+        layout.addWidget(dt_edit)
+
+        repeat_box = ComboBox()
+        repeat_box.addItems(list(ANNOUNCEMENT_REPEATS.values()))
+        repeat_box.setCurrentIndex(list(ANNOUNCEMENT_REPEATS).index(ann.get('repeat') or 'none'))
+        layout.addWidget(repeat_box)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        cancel_btn = PushButton("取消")
+        cancel_btn.clicked.connect(dialog.reject)
+        btn_layout.addWidget(cancel_btn)
+
+        clear_btn = PushButton("取消定时")
+        clear_btn.setEnabled(bool(ann.get('due')))
+        btn_layout.addWidget(clear_btn)
+
+        ok_btn = PrimaryPushButton("确定")
+        btn_layout.addWidget(ok_btn)
+        layout.addLayout(btn_layout)
+
+        def apply_schedule():
+            due = dt_edit.dateTime().toPyDateTime().replace(second=0, microsecond=0)
+            repeat = list(ANNOUNCEMENT_REPEATS)[repeat_box.currentIndex()]
+            now = datetime.datetime.now()
+            if due <= now:
+                due = next_occurrence(due, repeat, now)
+                if due is None:
+                    InfoBar.warning(
+                        title="提示",
+                        content="请选择一个将来的时间",
+                        orient=Qt.Horizontal,
+                        isClosable=True,
+                        position=InfoBarPosition.TOP,
+                        duration=3000,
+                        parent=dialog
+                    )
+                    return
+            self.set_announcement_schedule(ann, due, repeat)
+            dialog.accept()
 
-    def change_announcement_color(self, index: int):
-        if index < 0 or index >= len(self.announcements):
-            return
+        def clear_schedule():
+            self.set_announcement_schedule(ann, None)
+            dialog.accept()
 
-        current = QColor(self.announcements[index].get('color', self.default_announcement_color))
-        color = QColorDialog.getColor(current, self, "选择公告颜色")
-        if not color.isValid():
-            return
+        ok_btn.clicked.connect(apply_schedule)
+        clear_btn.clicked.connect(clear_schedule)
+        dialog.exec_()
 
-        self.announcements[index]['color'] = color.name()
-        self.save_config()
+    def set_announcement_schedule(self, ann, due, repeat='none'):
+        """Persist an announcement's next reading and (re)schedule it; due None clears it"""
+        self._store_schedule(ann, due, repeat)
         self.update_announcement_display()
 
+    def _store_schedule(self, ann, due, repeat):
+        due_text = due.strftime("%Y-%m-%d %H:%M:%S") if due else None
+        self.announcement_store.set_schedule(ann['id'], due_text, repeat)
+        ann['due'] = due_text
+        ann['repeat'] = repeat if due else 'none'
+        if due:
+            self.announcement_scheduler.schedule(ann['id'], due)
+            self.speech_worker.prepare(ann['text'])
+        else:
+            self.announcement_scheduler.unschedule(ann['id'])
+
+    def refresh_schedules(self):
+        """Rebuild the reading schedule from the active announcements, skipping readings missed while closed"""
+        self.announcement_scheduler.clear()
+        now = datetime.datetime.now()
+        grace = datetime.timedelta(seconds=SCHEDULE_GRACE_SECONDS)
+        for ann in self.announcements:
+            if not ann.get('due') or 'id' not in ann:
+                continue
+            try:
+                due = datetime.datetime.strptime(ann['due'], "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                due = None
+            if due is None or due < now - grace:
+                due = next_occurrence(due, ann.get('repeat'), now) if due else None
+                self._store_schedule(ann, due, ann.get('repeat', 'none'))
+            else:
+                self.announcement_scheduler.schedule(ann['id'], due)
+                self.speech_worker.prepare(ann['text'])
+
+    @pyqtSlot(object)
+    def on_announcement_due(self, announcement_id):
+        """Read a scheduled announcement and schedule its next repeat"""
+        index = self._announcement_index(announcement_id)
+        if index < 0:
+            return
+        ann = self.announcements[index]
+        self.speech_worker.say(ann['text'])
+        repeat = ann.get('repeat', 'none')
+        next_due = None
+        if ann.get('due'):
+            due = datetime.datetime.strptime(ann['due'], "%Y-%m-%d %H:%M:%S")
+            # The timer may fire a little early; never schedule the same occurrence twice
+            next_due = next_occurrence(due, repeat, max(due, datetime.datetime.now()))
+        self.set_announcement_schedule(ann, next_due, repeat)
+
     def delete_announcement(self, index: int):
         if index < 0 or index >= len(self.announcements):
             return
@@ -1766,16 +5518,49 @@ class MonitoringApp(QMainWindow):
             return
 
         try:
-            self.announcements.pop(index)
+            ann = self.announcements.pop(index)
+            if 'id' in ann:
+                self.announcement_store.delete(ann['id'])
+                self.announcement_scheduler.unschedule(ann['id'])
             self.update_announcement_display()
-            self.save_config()
-        except Exception:
-            pass
+        except Exception as e:
+            print(f"Error deleting announcement: {e}")
+
+    def cached_dialog(self, name):
+        """Build a dialog on first use and hand back the same one afterwards"""
+        dialog = self.dialogs.get(name)
+        if dialog is None:
+            builders = {
+                'add_announcement': lambda: AnnouncementDialog(self, self.colors['border']),
+                'video_list': lambda: VideoListDialog(self, self.encryption_manager),
+                'export': lambda: RecordingPickerDialog(self, "导出视频", "导出到桌面"),
+                'delete': lambda: RecordingPickerDialog(self, "删除视频", "删除选中"),
+                'set_system_time': self._build_system_time_dialog,
+            }
+            dialog = self.dialogs[name] = builders[name]()
+        return dialog
+
+    def warm_up_dialogs(self, names):
+        """Build the most used dialogs ahead of time, one per pass of the event loop"""
+        if not names:
+            return
+        if QApplication.activeModalWidget() is not None:
+            # The user is busy in a dialog; try again later
+            QTimer.singleShot(DIALOG_WARMUP_DELAY_MS, lambda: self.warm_up_dialogs(names))
+            return
+        name = names.pop(0)
+        try:
+            self.cached_dialog(name)
+        except Exception as e:
+            print(f"Dialog warm-up failed for {name}: {e}")
+        if names:
+            QTimer.singleShot(0, lambda: self.warm_up_dialogs(names))
 
     def show_video_list(self):
         """Show video list dialog"""
         try:
-            dialog = VideoListDialog(self, self.encryption_manager)
+            dialog = self.cached_dialog('video_list')
+            dialog.load_videos()
             dialog.exec_()
         except Exception as e:
             InfoBar.error(
@@ -1803,7 +5588,7 @@ class MonitoringApp(QMainWindow):
                 )
                 return
             
-            video_files = [f for f in os.listdir(RECORDINGS_DIR) if f.endswith('.encrypted')]
+            video_files = [f for f in os.listdir(RECORDINGS_DIR) if is_recording_file(f)]
             if not video_files:
                 InfoBar.warning(
                     title="提示",
@@ -1817,71 +5602,37 @@ class MonitoringApp(QMainWindow):
                 return
             
             # Select video to export
-            export_dialog = QDialog(self)
-            export_dialog.setWindowTitle("导出视频")
-            layout = QVBoxLayout(export_dialog)
-            
-            list_widget = QListWidget()
-            for video in video_files:
-                list_widget.addItem(video)
-            layout.addWidget(list_widget)
-            
-            btn_layout = QHBoxLayout()
-            export_btn = PushButton("导出到桌面")
-            cancel_btn = PushButton("取消")
-            
-            def do_export():
-                items = list_widget.selectedItems()
-                if not items:
-                    InfoBar.warning(
-                        title="提示",
-                        content="请先选择视频",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                    return
-                
-                for item in items:
-                    encrypted_path = os.path.join(RECORDINGS_DIR, item.text())
-                    desktop = os.path.expanduser("~/Desktop")
-                    output_path = os.path.join(desktop, item.text().replace('.encrypted', '.avi'))
-                    
-                    try:
-                        decrypted = self.encryption_manager.decrypt_file(encrypted_path, output_path)
-                        if decrypted:
-                            InfoBar.success(
-                                title="成功",
-                                content=f"视频已导出到: {output_path}",
-                                orient=Qt.Horizontal,
-                                isClosable=True,
-                                position=InfoBarPosition.TOP,
-                                duration=3000,
-                                parent=self
-                            )
-                    except Exception as e:
-                        InfoBar.error(
-                            title="错误",
-                            content=f"导出失败: {str(e)}",
+            export_dialog = self.cached_dialog('export')
+            export_dialog.set_files(sorted(video_files, reverse=True))
+            if export_dialog.exec_() != QDialog.Accepted:
+                return
+
+            for filename in export_dialog.selected_files():
+                desktop = os.path.expanduser("~/Desktop")
+                output_path = os.path.join(desktop, filename.replace('.encrypted', '.avi'))
+
+                try:
+                    decrypted = self.export_recording(filename, output_path)
+                    if decrypted:
+                        InfoBar.success(
+                            title="成功",
+                            content=f"视频已导出到: {output_path}",
                             orient=Qt.Horizontal,
                             isClosable=True,
                             position=InfoBarPosition.TOP,
                             duration=3000,
                             parent=self
                         )
-                
-                export_dialog.accept()
-            
-            export_btn.clicked.connect(do_export)
-            cancel_btn.clicked.connect(export_dialog.reject)
-            
-            btn_layout.addWidget(export_btn)
-            btn_layout.addWidget(cancel_btn)
-            layout.addLayout(btn_layout)
-            
-            export_dialog.exec_()
+                except Exception as e:
+                    InfoBar.error(
+                        title="错误",
+                        content=f"导出失败: {str(e)}",
+                        orient=Qt.Horizontal,
+                        isClosable=True,
+                        position=InfoBarPosition.TOP,
+                        duration=3000,
+                        parent=self
+                    )
         except Exception as e:
             InfoBar.error(
                 title="错误",
@@ -1911,7 +5662,7 @@ class MonitoringApp(QMainWindow):
                     )
                     return
                 
-                video_files = [f for f in os.listdir(RECORDINGS_DIR) if f.endswith('.encrypted')]
+                video_files = [f for f in os.listdir(RECORDINGS_DIR) if is_recording_file(f)]
                 if not video_files:
                     InfoBar.warning(
                         title="提示",
@@ -1925,45 +5676,25 @@ class MonitoringApp(QMainWindow):
                     return
                 
                 # Show deletion dialog
-                delete_dialog = QDialog(self)
-                delete_dialog.setWindowTitle("删除视频")
-                layout = QVBoxLayout(delete_dialog)
-                
-                list_widget = QListWidget()
-                for video in video_files:
-                    list_widget.addItem(video)
-                layout.addWidget(list_widget)
-                
-                btn_layout = QHBoxLayout()
-                delete_btn = PushButton("删除选中")
-                cancel_btn = PushButton("取消")
-                
-                def do_delete():
-                    for item in list_widget.selectedItems():
-                        video_path = os.path.join(RECORDINGS_DIR, item.text())
-                        try:
-                            os.remove(video_path)
-                        except Exception as e:
-                            print(f"Delete error: {e}")
-                    delete_dialog.accept()
-                    InfoBar.success(
-                        title="成功",
-                        content="视频已删除",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                
-                delete_btn.clicked.connect(do_delete)
-                cancel_btn.clicked.connect(delete_dialog.reject)
-                
-                btn_layout.addWidget(delete_btn)
-                btn_layout.addWidget(cancel_btn)
-                layout.addLayout(btn_layout)
-                
-                delete_dialog.exec_()
+                delete_dialog = self.cached_dialog('delete')
+                delete_dialog.set_files(sorted(video_files, reverse=True))
+                if delete_dialog.exec_() != QDialog.Accepted:
+                    return
+
+                for filename in delete_dialog.selected_files():
+                    try:
+                        self.remove_recording(filename)
+                    except Exception as e:
+                        print(f"Delete error: {e}")
+                InfoBar.success(
+                    title="成功",
+                    content="视频已删除",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self
+                )
             else:
                 InfoBar.error(
                     title="错误",
@@ -2022,21 +5753,48 @@ class MonitoringApp(QMainWindow):
                     parent=self
                 )
     
+    def start_housekeeping(self):
+        """Startup chores that do not affect the first frame, run once the event loop is going"""
+        self.submit_background_task(self.cleanup_old_videos)
+        self.submit_background_task(self.protect_directories)
+        self.setup_shortcut_monitor()
+
+    def on_first_paint(self):
+        self.startup_timings.mark("first_paint")
+        print(self.startup_timings.summary())
+
     def cleanup_old_videos(self):
-        """Delete videos older than RETENTION_DAYS"""
+        """Find files older than RETENTION_DAYS; runs on the background pool, deletion happens on the GUI thread"""
         try:
             if not os.path.exists(RECORDINGS_DIR):
                 return
             
             now = time.time()
+            expired = []
             for filename in os.listdir(RECORDINGS_DIR):
                 filepath = os.path.join(RECORDINGS_DIR, filename)
                 if os.path.isfile(filepath):
-                    file_age = now - os.path.getctime(filepath)
-                    if file_age > RETENTION_DAYS * 86400:  # Convert days to seconds
-                        os.remove(filepath)
+                    if file_age(filepath, now) > RETENTION_DAYS * 86400:  # Convert days to seconds
+                        expired.append(filename)
+            if expired:
+                self.expired_files_found.emit(expired)
         except Exception as e:
             print(f"Cleanup error: {e}")
+
+    @pyqtSlot(list)
+    def remove_expired_files(self, filenames):
+        """Delete expired files, recordings first so their thumbnails, index and timeline entries go too"""
+        for filename in sorted(filenames, key=lambda name: not is_recording_file(name)):
+            try:
+                if is_recording_file(filename):
+                    self.remove_recording(filename)
+                else:
+                    # Proxies and indexes of expired recordings are already gone by now
+                    filepath = os.path.join(RECORDINGS_DIR, filename)
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+            except OSError as e:
+                print(f"Cleanup error for {filename}: {e}")
     
     def load_config(self):
         """Load configuration from file"""
@@ -2044,7 +5802,18 @@ class MonitoringApp(QMainWindow):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
-
+            except ValueError as e:
+                # Keep the unreadable file for inspection instead of overwriting it with defaults
+                print(f"Config file is corrupt, moving it aside: {e}")
+                try:
+                    os.replace(self.config_file, self.config_file + '.corrupt')
+                except OSError:
+                    pass
+                return
+            except OSError as e:
+                print(f"Error loading config: {e}")
+                return
+            try:
                 self.exposure = config.get('exposure', 0)
                 self.time_position = config.get('time_position', 'top-right')
                 self.timestamp_scale = float(config.get('timestamp_scale', 1.0))
@@ -2052,23 +5821,79 @@ class MonitoringApp(QMainWindow):
                 self.camera_index = int(config.get('camera_index', 0))
                 self.default_announcement_color = config.get('default_announcement_color', self.colors['text_primary'])
                 self.shortcuts_initialized = bool(config.get('shortcuts_initialized', False))
-
-                raw_anns = config.get('announcements', [])
-                self.announcements = []
-                for ann in raw_anns if isinstance(raw_anns, list) else []:
-                    if not isinstance(ann, dict):
-                        continue
-                    self.announcements.append({
-                        'text': str(ann.get('text', '')).strip(),
-                        'timestamp': str(ann.get('timestamp', '')).strip(),
-                        'color': ann.get('color', self.default_announcement_color)
-                    })
+                raw_protected = config.get('protected_recordings', [])
+                self.protected_recordings = [str(f) for f in raw_protected] if isinstance(raw_protected, list) else []
+                if config.get('recording_mode') in ('continuous', 'motion'):
+                    self.recording_mode = config['recording_mode']
+                self.motion_sensitivity = min(10, max(1, int(config.get('motion_sensitivity', DEFAULT_MOTION_SENSITIVITY))))
+                self.motion_stop_delay = max(1, int(config.get('motion_stop_delay', DEFAULT_MOTION_STOP_DELAY)))
+                self.pre_record_seconds = min(30, max(0, int(config.get('pre_record_seconds', DEFAULT_PRE_RECORD_SECONDS))))
+                self.pre_record_memory_mb = max(1, int(config.get('pre_record_memory_mb', DEFAULT_PRE_RECORD_MEMORY_MB)))
+                self.skip_static_frames = bool(config.get('skip_static_frames', False))
+                self.recording_profile = str(config.get('recording_profile', 'auto'))
+                self.record_proxy = bool(config.get('record_proxy', False))
+                self.archive_after_hours = max(0, int(config.get('archive_after_hours', DEFAULT_ARCHIVE_AFTER_HOURS)))
+                self.announcement_archive_days = min(ANNOUNCEMENT_ARCHIVE_MAX_DAYS, max(0, int(
+                    config.get('announcement_archive_days', DEFAULT_ANNOUNCEMENT_ARCHIVE_DAYS))))
+                self.timetable_enabled = bool(config.get('timetable_enabled', False))
+                if isinstance(config.get('timetable'), list):
+                    self.timetable = Timetable.from_config(config['timetable'])
+                raw_size = config.get('frame_size', DEFAULT_FRAME_SIZE)
+                if isinstance(raw_size, list) and len(raw_size) == 2:
+                    self.frame_size = (int(raw_size[0]), int(raw_size[1]))
+                raw_benchmark = config.get('encoder_benchmark', {})
+                if isinstance(raw_benchmark, dict) and isinstance(raw_benchmark.get('results'), dict):
+                    self.encoder_benchmark = raw_benchmark['results']
+                    self.encoder_benchmark_key = raw_benchmark.get('key')
+                    self.auto_profile = raw_benchmark.get('choice')
+
+                # Announcements used to live in the config; move them into the store once
+                raw_anns = config.get('announcements')
+                if isinstance(raw_anns, list):
+                    migrated = []
+                    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    for ann in raw_anns:
+                        if not isinstance(ann, dict):
+                            continue
+                        text = str(ann.get('text', '')).strip()
+                        if not text:
+                            continue
+                        migrated.append({
+                            'text': text,
+                            'timestamp': str(ann.get('timestamp', '')).strip() or now,
+                            'color': ann.get('color', self.default_announcement_color)
+                        })
+                    self.announcement_store.add_many(migrated)
+                    # Rewrite now so a crash cannot import them a second time
+                    self.flush_config()
             except Exception as e:
                 print(f"Error loading config: {e}")
 
+    def load_announcements(self):
+        """Archive stale announcements if enabled and load the active ones for the panel"""
+        days = self.announcement_archive_days
+        if days > 0:
+            cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+            archived = self.announcement_store.archive_before(cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+            if archived:
+                print(f"Archived {archived} announcements older than {days} days")
+        self.announcements = self.announcement_store.active()
+
     def save_config(self):
-        """Save configuration to file"""
-        config = {
+        """Mark the configuration dirty; changes are written together shortly afterwards"""
+        if not self.config_save_timer.isActive():
+            self.config_save_timer.start()
+
+    def _write_config(self):
+        self.config_store.write_async(self._config_snapshot())
+
+    def flush_config(self):
+        """Write the configuration now and wait for it; used on exit"""
+        self.config_save_timer.stop()
+        self.config_store.write(self._config_snapshot())
+
+    def _config_snapshot(self):
+        return {
             'exposure': self.exposure,
             'time_position': self.time_position,
             'timestamp_scale': self.timestamp_scale,
@@ -2076,23 +5901,49 @@ class MonitoringApp(QMainWindow):
             'camera_index': self.camera_index,
             'default_announcement_color': self.default_announcement_color,
             'shortcuts_initialized': self.shortcuts_initialized,
-            'announcements': self.announcements
+            'protected_recordings': self.protected_recordings,
+            'recording_mode': self.recording_mode,
+            'motion_sensitivity': self.motion_sensitivity,
+            'motion_stop_delay': self.motion_stop_delay,
+            'pre_record_seconds': self.pre_record_seconds,
+            'pre_record_memory_mb': self.pre_record_memory_mb,
+            'skip_static_frames': self.skip_static_frames,
+            'recording_profile': self.recording_profile,
+            'record_proxy': self.record_proxy,
+            'archive_after_hours': self.archive_after_hours,
+            'announcement_archive_days': self.announcement_archive_days,
+            'timetable_enabled': self.timetable_enabled,
+            'timetable': self.timetable.to_config(),
+            'frame_size': list(self.frame_size),
+            'encoder_benchmark': {
+                'key': self.encoder_benchmark_key,
+                'results': self.encoder_benchmark,
+                'choice': self.auto_profile
+            }
         }
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving config: {e}")
     
-    def update_exposure(self, value):
-        """Update exposure"""
+    def update_exposure(self, value, persist=True):
+        """Update exposure; the capture thread applies it before its next read"""
         self.exposure = value
-        if self.cap is not None:
-            try:
-                self.cap.set(cv2.CAP_PROP_EXPOSURE, self.exposure)
-            except:
-                pass
-        self.save_config()
+        if self.video_thread:
+            self.video_thread.camera_control.request(cv2.CAP_PROP_EXPOSURE, self.exposure)
+        if persist:
+            self.save_config()
+
+    @pyqtSlot(int, float)
+    def on_camera_property_changed(self, prop, actual):
+        """Value the camera reports after a property change"""
+        if prop != cv2.CAP_PROP_EXPOSURE:
+            return
+        self.exposure_actual = actual
+        if actual != self.exposure:
+            print(f"Camera exposure requested {self.exposure}, camera reports {actual:g}")
+        if self.exposure_value_label is not None:
+            self.exposure_value_label.setText(self._exposure_text())
+
+    def _exposure_text(self):
+        actual = "-" if self.exposure_actual is None else f"{self.exposure_actual:g}"
+        return f"设定值: {self.exposure}    摄像头实际值: {actual}"
     
     def update_time_position(self, text):
         """Update time position"""
@@ -2104,7 +5955,7 @@ class MonitoringApp(QMainWindow):
         }
         self.time_position = position_map.get(text, "top-right")
         if self.video_thread:
-            self.video_thread.time_position = self.time_position
+            self.video_thread.update_settings(time_position=self.time_position)
         self.save_config()
     
     def start_camera(self):
@@ -2125,11 +5976,6 @@ class MonitoringApp(QMainWindow):
                 self.cap = None
                 return
             
-            try:
-                self.cap.set(cv2.CAP_PROP_EXPOSURE, self.exposure)
-            except:
-                pass
-            
             self.running = True
             if self.start_camera_action:
                 self.start_camera_action.setEnabled(False)
@@ -2142,19 +5988,28 @@ class MonitoringApp(QMainWindow):
             if self.video_widget:
                 self.video_widget.set_placeholder("")
             
-            # Start video thread
+            # Start video thread; its quality controller starts over at full quality
+            self.quality_level = 0
+            self.reduced_resolution = False
             self.video_thread = VideoThread()
             self.video_thread.cap = self.cap
-            self.video_thread.exposure = self.exposure
-            self.video_thread.time_position = self.time_position
-            self.video_thread.timestamp_scale = self.timestamp_scale
-            self.video_thread.record_indicator_scale = self.record_indicator_scale
+            self.video_thread.camera_control.request(cv2.CAP_PROP_EXPOSURE, self.exposure)
+            self.video_thread.settings = CaptureSettings(
+                time_position=self.time_position,
+                timestamp_scale=self.timestamp_scale,
+                record_indicator_scale=self.record_indicator_scale,
+                pre_event_buffer=self.pre_event_buffer
+            )
+            self.video_thread.activity_monitor = self.activity_monitor
+            self.video_thread.encoder = self.frame_encoder
             self.video_thread.frame_ready.connect(self.update_video_frame)
+            self.video_thread.quality_changed.connect(self.on_quality_changed)
+            self.video_thread.camera_property_changed.connect(self.on_camera_property_changed)
             self.video_thread.start()
     
     def stop_camera(self):
         """Stop camera"""
-        if self.recording:
+        if self.recording or self.motion_armed:
             self.toggle_recording()
         
         self.running = False
@@ -2162,6 +6017,8 @@ class MonitoringApp(QMainWindow):
         if self.video_thread:
             self.video_thread.stop()
             self.video_thread = None
+        if self.pre_event_buffer is not None:
+            self.pre_event_buffer.clear()
         
         if self.cap is not None:
             self.cap.release()
@@ -2195,53 +6052,332 @@ class MonitoringApp(QMainWindow):
                     parent=self
                 )
                 return
-        if not self.recording:
-            if not os.path.exists(RECORDINGS_DIR):
-                os.makedirs(RECORDINGS_DIR, exist_ok=True)
-            
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{RECORDINGS_DIR}/video_{timestamp}.avi"
-            self.current_video_path = filename
-            
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            fps = 20.0
-            frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
-            self.video_writer = cv2.VideoWriter(filename, fourcc, fps, (frame_width, frame_height))
-            
-            self.recording = True
-            if self.video_thread:
-                self.video_thread.recording = True
-                self.video_thread.video_writer = self.video_writer
-                self.video_thread.show_timestamp = True
-            if self.start_recording_action:
-                self.start_recording_action.setText("停止录制")
-            if self.tray_record_action:
-                self.tray_record_action.setText("停止录制")
-            self.status_label.setText("状态: 正在录制")
-            self.status_label.setStyleSheet(f"color: {self.colors['danger']}; font-size: 12px;")
-            if self.floating_widget:
-                self.floating_widget.set_recording_state(True)
+        if self.recording or self.motion_armed:
+            self.stop_recording()
+        elif self.recording_mode == "motion":
+            self.arm_motion_recording()
         else:
+            self.start_recording()
+
+    def start_recording(self):
+        """Open a segment and start writing frames to it"""
+        recorder = self._open_segment()
+        if recorder is None:
+            InfoBar.error(
+                title="错误",
+                content="磁盘空间不足，无法开始录制",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=5000,
+                parent=self
+            )
+            return False
+        self.video_writer = recorder
+        self.current_video_path = recorder.path
+
+        self.recording = True
+        self._set_archive_paused(True)
+        if self.video_thread:
+            self.video_thread.start_writer(recorder)
+        self._start_recording_timers()
+        self._set_record_action_text("停止录制")
+        self._update_recording_status()
+        if self.floating_widget:
+            self.floating_widget.set_recording_state(True)
+        return True
+
+    def stop_recording(self, notify=True, disarm=True):
+        """Close the current segment; with disarm the motion trigger is switched off too"""
+        if disarm and self.motion_armed:
+            self.motion_armed = False
+            self.activity_monitor.set_trigger(None)
+            if self.video_thread:
+                self.video_thread.update_settings(motion_detection=False)
+
+        if self.recording:
             self.recording = False
+            self._set_archive_paused(False)
+            self._stop_recording_timers()
+            recorder = self.video_writer
             if self.video_thread:
-                self.video_thread.recording = False
-            if self.video_writer is not None:
-                self.video_writer.release()
-                self.video_writer = None
-            
+                self.video_thread.swap_writer(None)
+            self.video_writer = None
+
             # Encrypt the recorded video file
-            if self.current_video_path and os.path.exists(self.current_video_path):
-                self.encryption_manager.encrypt_file(self.current_video_path)
+            self._finalize_segment(recorder, notify=notify)
             self.current_video_path = None
-            
-            if self.start_recording_action:
-                self.start_recording_action.setText("开始录制")
-            if self.tray_record_action:
-                self.tray_record_action.setText("开始录制")
-            self.status_label.setText("状态: 摄像头运行中")
-            self.status_label.setStyleSheet(f"color: {self.colors['success']}; font-size: 12px;")
+
+        if self.motion_armed:
+            self._update_recording_status()
+            return
+        self._set_record_action_text("开始录制")
+        self.status_label.setText("状态: 摄像头运行中")
+        self.status_label.setStyleSheet(f"color: {self.colors['success']}; font-size: 12px;")
+        if self.floating_widget:
+            self.floating_widget.set_recording_state(False)
+
+    def arm_motion_recording(self):
+        """Wait for motion instead of recording continuously"""
+        self.motion_armed = True
+        self.activity_monitor.set_trigger(MotionTrigger(self.motion_sensitivity, self.motion_stop_delay))
+        if self.video_thread:
+            self.video_thread.update_settings(motion_detection=True)
+        self._set_record_action_text("停止录制")
+        self._update_recording_status()
+        if self.floating_widget:
+            self.floating_widget.set_recording_state(True)
+
+    @pyqtSlot(bool)
+    def on_motion_changed(self, active):
+        """Open a segment when motion starts and close it after the quiet period"""
+        if not self.motion_armed or self.cap is None:
+            return
+        if active and not self.recording:
+            if not self.start_recording():
+                self.stop_recording(notify=False)
+        elif not active and self.recording:
+            self.stop_recording(notify=False, disarm=False)
+
+    def _set_record_action_text(self, text):
+        if self.start_recording_action:
+            self.start_recording_action.setText(text)
+        if self.tray_record_action:
+            self.tray_record_action.setText(text)
+
+    def _update_recording_status(self):
+        if not self.recording:
+            # Armed but idle: the motion trigger decides when the next segment opens
+            self.status_label.setText("状态: 等待画面变化")
+            self.status_label.setStyleSheet(f"color: {self.colors['primary']}; font-size: 12px;")
+            return
+        text = "状态: 正在录制 (低码率)" if self.low_bitrate_mode else "状态: 正在录制"
+        color = self.colors['warning'] if self.low_bitrate_mode else self.colors['danger']
+        self.status_label.setText(text)
+        self.status_label.setStyleSheet(f"color: {color}; font-size: 12px;")
+
+    def _start_recording_timers(self):
+        if self.segment_timer is None:
+            self.segment_timer = QTimer(self)
+            self.segment_timer.timeout.connect(self.rollover_segment)
+        self.segment_timer.start(SEGMENT_SECONDS * 1000)
+
+        if self.disk_monitor_timer is None:
+            self.disk_monitor_timer = QTimer(self)
+            self.disk_monitor_timer.timeout.connect(self.check_disk_space)
+        self.disk_monitor_timer.start(DISK_CHECK_INTERVAL_MS)
+
+    def _stop_recording_timers(self):
+        if self.segment_timer:
+            self.segment_timer.stop()
+        if self.disk_monitor_timer:
+            self.disk_monitor_timer.stop()
+
+    def _bitrate_factor(self):
+        # Halving the resolution roughly quarters the encoded size
+        return 0.25 if self.low_bitrate_mode else 1.0
+
+    def _free_disk_bytes(self):
+        target = RECORDINGS_DIR if os.path.exists(RECORDINGS_DIR) else "."
+        try:
+            return shutil.disk_usage(target).free
+        except OSError:
+            return 0
+
+    def _segment_bytes_needed(self, seconds=SEGMENT_SECONDS):
+        """Bytes that must be free to record `seconds` more at the expected bitrate"""
+        expected = self.bytes_per_second * self._bitrate_factor() * seconds * 1.2
+        return int(expected) + MIN_FREE_SPACE_MB * 1024 * 1024
+
+    def ensure_free_space(self, bytes_needed):
+        """Return True if bytes_needed are free, evicting old segments if necessary"""
+        free = self._free_disk_bytes()
+        if free >= bytes_needed:
+            return True
+        self.evict_oldest_recordings(bytes_needed - free)
+        return self._free_disk_bytes() >= bytes_needed
+
+    def evict_oldest_recordings(self, bytes_to_free):
+        """Delete the oldest unprotected encrypted segments until bytes_to_free are released"""
+        if not os.path.exists(RECORDINGS_DIR):
+            return 0
+
+        protected = set(self.protected_recordings)
+        candidates = []
+        for filename in os.listdir(RECORDINGS_DIR):
+            if not is_recording_file(filename) or filename in protected:
+                continue
+            filepath = os.path.join(RECORDINGS_DIR, filename)
+            try:
+                candidates.append((os.path.getmtime(filepath), filename))
+            except OSError:
+                continue
+        candidates.sort()
+
+        freed = 0
+        for _, filename in candidates:
+            if freed >= bytes_to_free:
+                break
+            try:
+                size = os.path.getsize(os.path.join(RECORDINGS_DIR, filename))
+                proxy_path = os.path.join(RECORDINGS_DIR, proxy_filename(filename))
+                if os.path.exists(proxy_path):
+                    size += os.path.getsize(proxy_path)
+                self.remove_recording(filename)
+                freed += size
+                print(f"Evicted {filename} to free disk space")
+            except OSError as e:
+                print(f"Eviction error: {e}")
+        return freed
+
+    def export_recording(self, filename, output_path):
+        """Decrypt a recording for use outside the app; returns True on success"""
+        if not self.encryption_manager.decrypt_file(os.path.join(RECORDINGS_DIR, filename), output_path):
+            return False
+        index = SegmentIndex.load(SegmentIndex.path_for(recording_key(filename)))
+        if index is not None and index.meta.get('frames_skipped') and index.frames:
+            # Skipped static frames become null frames so other players keep real-time speed
+            try:
+                pad_avi_timing(output_path, index.frames)
+            except (OSError, struct.error) as e:
+                print(f"Failed to restore frame timing for {filename}: {e}")
+        return True
+
+    def request_proxy_thumbnail(self, filename):
+        """Create a missing thumbnail from the recording's proxy, never from the full file"""
+        key = recording_key(filename)
+        if key in self.pending_thumbnails:
+            return
+        if not os.path.exists(os.path.join(RECORDINGS_DIR, proxy_filename(filename))):
+            return
+        self.pending_thumbnails.add(key)
+        if self.submit_background_task(self._thumbnail_from_proxy, filename) is None:
+            self.pending_thumbnails.discard(key)
+
+    def _thumbnail_from_proxy(self, filename):
+        key = recording_key(filename)
+        try:
+            temp_path = scratch_file(".avi")
+            try:
+                if self.encryption_manager.decrypt_file(os.path.join(RECORDINGS_DIR, proxy_filename(filename)), temp_path):
+                    cap = cv2.VideoCapture(temp_path)
+                    ret, frame = cap.read()
+                    cap.release()
+                    if ret:
+                        self.thumbnail_cache.put(key, frame)
+            finally:
+                os.remove(temp_path)
+        finally:
+            # Failed attempts are retried the next time the thumbnail is wanted
+            self.pending_thumbnails.discard(key)
+
+    def get_timeline_index(self):
+        """Timeline over all segments, built on first use and kept current afterwards"""
+        if self.timeline_index is None:
+            self.timeline_index = TimelineIndex.build()
+        return self.timeline_index
+
+    def remove_recording(self, filename):
+        """Delete an encrypted recording together with the files derived from it"""
+        os.remove(os.path.join(RECORDINGS_DIR, filename))
+        try:
+            os.remove(os.path.join(RECORDINGS_DIR, proxy_filename(filename)))
+        except OSError:
+            pass
+        key = recording_key(filename)
+        self.thumbnail_cache.remove(key)
+        if self.timeline_index is not None:
+            self.timeline_index.remove(key)
+        try:
+            os.remove(SegmentIndex.path_for(key))
+        except OSError:
+            pass
+        if filename in self.protected_recordings:
+            self.protected_recordings.remove(filename)
+            self.save_config()
+
+    def _open_segment(self):
+        """Create the writer for a new segment once enough disk space is available"""
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+
+        # Prefer full quality; drop to the low bitrate mode only when space is short
+        for low_bitrate in (False, True):
+            self.low_bitrate_mode = low_bitrate
+            if self.ensure_free_space(self._segment_bytes_needed()):
+                break
+        else:
+            return None
+
+        profile = self.active_profile()
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{RECORDINGS_DIR}/video_{timestamp}{profile.extension}"
+        suffix = 1
+        while os.path.exists(filename) or os.path.exists(filename + '.encrypted'):
+            filename = f"{RECORDINGS_DIR}/video_{timestamp}_{suffix}{profile.extension}"
+            suffix += 1
+
+        fourcc = cv2.VideoWriter_fourcc(*profile.fourcc)
+        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if frame_width > 0 and frame_height > 0:
+            self.frame_size = (frame_width, frame_height)
+        if self.low_bitrate_mode or self.reduced_resolution:
+            frame_width = max(2, frame_width // 4 * 2)
+            frame_height = max(2, frame_height // 4 * 2)
+
+        recorder = SegmentRecorder(filename, fourcc, RECORDING_FPS, (frame_width, frame_height), profile)
+        if not recorder.is_opened() and profile.name != FALLBACK_PROFILE:
+            print(f"Encoder {profile.name} failed to open, falling back to {FALLBACK_PROFILE}")
+            recorder.release()
+            fallback = get_recording_profile(FALLBACK_PROFILE)
+            recorder = SegmentRecorder(filename, cv2.VideoWriter_fourcc(*fallback.fourcc), RECORDING_FPS,
+                                       (frame_width, frame_height), fallback)
+        if self.skip_static_frames:
+            recorder.static_threshold = STATIC_SCENE_THRESHOLD
+        if self.record_proxy and recorder.is_opened():
+            recorder.enable_proxy()
+        return recorder
+
+    def _finalize_segment(self, recorder, notify=False):
+        """Hand a segment that is no longer written to the background pool for closing"""
+        if recorder is None:
+            return
+        self.closing_segments.add(recorder)
+        if self.submit_background_task(self._close_segment, recorder, notify) is None:
+            self._close_segment(recorder, notify)
+
+    def _close_segment(self, recorder, notify):
+        """Drain, close and encrypt a finished segment; runs on the background pool"""
+        index = None
+        try:
+            # Frames still queued for this segment must land before the writer closes
+            self.frame_encoder.flush()
+            recorder.release()
+            if os.path.exists(recorder.path):
+                if recorder.poster is not None:
+                    self.thumbnail_cache.put(recording_key(recorder.path), recorder.poster)
+                self.activity_monitor.wait_idle()
+                index = recorder.finish_index()
+                try:
+                    index.save()
+                except OSError as e:
+                    print(f"Failed to save segment index: {e}")
+                paths = [recorder.path]
+                if recorder.proxy_path and os.path.exists(recorder.proxy_path):
+                    paths.append(recorder.proxy_path)
+                for path in paths:
+                    self.encryption_manager.encrypt_file(path)
+        finally:
+            self.closing_segments.discard(recorder)
+            self.segment_finalized.emit(index, notify)
+
+    @pyqtSlot(object, bool)
+    def on_segment_finalized(self, index, notify):
+        """Publish a closed segment to the timeline and confirm the save if asked to"""
+        if index is not None and self.timeline_index is not None:
+            self.timeline_index.add(index.started_at, index.ended_at, index.meta['filename'], index.key,
+                                    index.meta['activity_minutes'])
+        if notify:
             InfoBar.success(
                 title="录制完成",
                 content="视频已加密保存",
@@ -2251,10 +6387,246 @@ class MonitoringApp(QMainWindow):
                 duration=3000,
                 parent=self
             )
-            if self.floating_widget:
-                self.floating_widget.set_recording_state(False)
 
-    
+    def submit_background_task(self, fn, *args):
+        """Run fn on the idle-priority background pool; returns None once shut down"""
+        self.background_tasks = [t for t in self.background_tasks if not t.done()]
+        try:
+            task = self.background_pool.submit(fn, *args)
+        except RuntimeError:
+            return None
+        self.background_tasks.append(task)
+        return task
+
+    def archive_candidates(self, now=None):
+        """Recordings old enough for the archive tier, oldest first"""
+        if self.archive_after_hours <= 0 or not os.path.exists(RECORDINGS_DIR):
+            return []
+        now = now or time.time()
+        active = recording_key(self.current_video_path) if self.current_video_path else None
+        candidates = []
+        for filename in os.listdir(RECORDINGS_DIR):
+            if not is_recording_file(filename) or filename in self.protected_recordings:
+                continue
+            filepath = os.path.join(RECORDINGS_DIR, filename)
+            key = recording_key(filename)
+            if key == active or filepath in self.archive_failed:
+                continue
+            try:
+                age = file_age(filepath, now)
+            except OSError:
+                continue
+            if age < self.archive_after_hours * 3600:
+                continue
+            index = SegmentIndex.load(SegmentIndex.path_for(key), header_only=True)
+            if index is not None and index.meta.get('archived'):
+                continue
+            candidates.append((age, filepath))
+        return [filepath for _, filepath in sorted(candidates, reverse=True)]
+
+    def _set_archive_paused(self, paused):
+        if self.archive_paused is None:
+            return
+        if paused:
+            self.archive_paused.set()
+        else:
+            self.archive_paused.clear()
+
+    def schedule_archive_transcode(self):
+        """Hand the oldest due recording to the idle-priority archive process, one at a time"""
+        if self.archive_job is not None or self.recording:
+            return
+        candidates = self.archive_candidates()
+        if not candidates:
+            return
+        if self.archive_pool is None:
+            context = multiprocessing.get_context('spawn')
+            self.archive_paused = context.Event()
+            self.archive_cancelled = context.Event()
+            self.archive_pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=init_archive_worker,
+                initargs=(self.archive_paused, self.archive_cancelled)
+            )
+
+        # Archives should never come out bigger, so intra-only profiles fall back
+        profile = self.active_profile()
+        fallback = get_recording_profile(FALLBACK_PROFILE)
+        if profile.bitrate_kbps > fallback.bitrate_kbps:
+            profile = fallback
+
+        path = candidates[0]
+        try:
+            job = self.archive_pool.submit(transcode_for_archive, path, self.encryption_manager.key, profile.name)
+        except RuntimeError:
+            return
+        self.archive_job = path
+
+        def done(future):
+            result = None
+            if not future.cancelled():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Archive worker failed: {e}")
+            self.archive_done.emit(path, result)
+
+        job.add_done_callback(done)
+
+    @pyqtSlot(str, object)
+    def on_archive_done(self, path, result):
+        self.archive_job = None
+        if result is None:
+            # Try again next session rather than looping on the same file
+            self.archive_failed.add(path)
+        else:
+            old_bytes, new_bytes = result
+            print(f"Archived {os.path.basename(path)}: {old_bytes // 1024} KB -> {new_bytes // 1024} KB")
+        if self.archive_pool is not None and not self.archive_cancelled.is_set():
+            self.schedule_archive_transcode()
+
+    def find_orphaned_recordings(self):
+        """Plaintext segments left behind by a crash (never passed to encrypt_file)"""
+        if not os.path.exists(RECORDINGS_DIR):
+            return []
+
+        active = self.open_recording_paths()
+        orphans = []
+        for filename in os.listdir(RECORDINGS_DIR):
+            if not (filename.startswith('video_') and filename.endswith('.avi')):
+                continue
+            filepath = os.path.join(RECORDINGS_DIR, filename)
+            if os.path.abspath(filepath) not in active and os.path.isfile(filepath):
+                orphans.append(filepath)
+        return sorted(orphans)
+
+    def open_recording_paths(self):
+        """Absolute paths of plaintext files still being written or waiting to be encrypted"""
+        recorders = list(self.closing_segments)
+        if self.video_writer is not None:
+            recorders.append(self.video_writer)
+        paths = set()
+        for recorder in recorders:
+            paths.update(os.path.abspath(p) for p in (recorder.path, recorder.proxy_path) if p)
+        if self.current_video_path:
+            paths.add(os.path.abspath(self.current_video_path))
+        return paths
+
+    def recover_orphaned_recordings(self):
+        """Repair and encrypt orphaned recordings in the background"""
+        # Decrypted copies from before this session belong to playback or transcoding that never finished
+        self.submit_background_task(self._sweep_scratch, self.session_started)
+        for filepath in self.find_orphaned_recordings():
+            self.submit_background_task(self._recover_recording, filepath)
+
+    def _sweep_scratch(self, before):
+        removed = sweep_scratch_dir(before)
+        if removed:
+            print(f"Removed {removed} leftover decrypted working copies")
+
+    def _recover_recording(self, filepath):
+        try:
+            if repair_avi_index(filepath):
+                print(f"Repaired truncated recording: {filepath}")
+        except Exception as e:
+            print(f"AVI repair error for {filepath}: {e}")
+        key = recording_key(filepath)
+        if not self.thumbnail_cache.has(key):
+            # No poster survived the crash; the file is still plaintext, so grab one frame now
+            cap = cv2.VideoCapture(filepath)
+            ret, frame = cap.read()
+            cap.release()
+            if ret:
+                self.thumbnail_cache.put(key, frame)
+        # A partial .encrypted from an interrupted run is simply overwritten
+        if self.encryption_manager.encrypt_file(filepath):
+            print(f"Recovered orphaned recording: {filepath}")
+
+    @pyqtSlot(int, str)
+    def on_quality_changed(self, level, reason):
+        """Apply and log a quality step decided by the capture thread"""
+        previous = self.quality_level
+        self.quality_level = level
+        label = QualityController.LEVELS[level]
+        entry = {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'level': level,
+            'label': label,
+            'reason': reason,
+        }
+        self.quality_log.append(entry)
+        print(f"Quality level {previous} -> {level} ({label}): {reason}")
+
+        recorder = self.video_writer
+        if recorder is not None:
+            recorder.index.meta.setdefault('quality_changes', []).append(
+                [round(recorder.elapsed(), 1), level, reason])
+
+        # Resolution can only change with a new segment
+        reduced = level >= len(QualityController.LEVELS) - 1
+        if reduced != self.reduced_resolution:
+            self.reduced_resolution = reduced
+            if self.recording:
+                self.rollover_segment()
+
+    def rollover_segment(self):
+        """Close the current segment and continue recording into a new file"""
+        if not self.recording or self.cap is None:
+            return
+
+        recorder = self._open_segment()
+        if recorder is None:
+            self._stop_recording_disk_full()
+            return
+
+        if self.video_thread:
+            old_recorder = self.video_thread.swap_writer(recorder)
+        else:
+            old_recorder = self.video_writer
+        self.video_writer = recorder
+        self.current_video_path = recorder.path
+        if self.segment_timer:
+            self.segment_timer.start(SEGMENT_SECONDS * 1000)
+        self._update_recording_status()
+        self._finalize_segment(old_recorder)
+
+    def check_disk_space(self):
+        """Periodic guard while recording: evict or degrade before the disk fills up"""
+        recorder = self.video_writer
+        if not self.recording or recorder is None:
+            return
+
+        elapsed = recorder.elapsed()
+        if elapsed >= 30:
+            measured = recorder.bytes_on_disk() / elapsed
+            if measured > 0:
+                self.bytes_per_second = measured / self._bitrate_factor()
+
+        # Room for the rest of this segment plus a minute of slack
+        remaining = max(0, SEGMENT_SECONDS - elapsed) + 60
+        if self.ensure_free_space(self._segment_bytes_needed(remaining)):
+            return
+
+        if not self.low_bitrate_mode:
+            print("Disk space low, switching to low bitrate recording")
+            self.rollover_segment()
+        elif self._free_disk_bytes() < MIN_FREE_SPACE_MB * 1024 * 1024:
+            self._stop_recording_disk_full()
+
+    def _stop_recording_disk_full(self):
+        if self.recording or self.motion_armed:
+            self.stop_recording()
+        InfoBar.error(
+            title="错误",
+            content="磁盘空间不足，录制已停止",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=5000,
+            parent=self
+        )
+
     @pyqtSlot(QImage)
     def update_video_frame(self, qt_image):
         """Update video frame"""
@@ -2290,7 +6662,20 @@ class MonitoringApp(QMainWindow):
     def on_exit(self):
         """Handle program exit"""
         self.stop_camera()
-        self.save_config()
+        self.speech_worker.shutdown()
+        self.speech_worker.wait(2000)
+        if self.archive_pool is not None:
+            # The worker notices between frames and leaves the original untouched
+            self.archive_cancelled.set()
+            self.archive_paused.clear()
+            self.archive_pool.shutdown(wait=True, cancel_futures=True)
+        # Segment finalizing still drains the encoder and the activity monitor
+        self.background_pool.shutdown(wait=True)
+        self.frame_encoder.stop()
+        self.frame_encoder.join()
+        self.activity_monitor.stop()
+        self.flush_config()
+        self.announcement_store.close()
         if self.tray_icon:
             self.tray_icon.hide()
         if self.floating_widget:
@@ -2313,6 +6698,8 @@ class MonitoringApp(QMainWindow):
 
 def main():
     """Main entry point"""
+    timings = StartupTimings(STARTUP_STARTED)
+    timings.mark("import")
     app = QApplication.instance() or QApplication(sys.argv)
     
     app.setApplicationName("智能监控系统")
@@ -2320,7 +6707,7 @@ def main():
     
     setTheme(Theme.LIGHT)
     
-    window = MonitoringApp()
+    window = MonitoringApp(startup_timings=timings)
     
     # Create floating recorder widget
     floating_recorder = FloatingRecorderWidget(window)
@@ -2328,9 +6715,13 @@ def main():
     floating_recorder.show()
     
     window.showFullScreen()
+    timings.mark("show")
+    # Runs after the first pass of the event loop, once the window has been painted
+    QTimer.singleShot(0, window.on_first_paint)
     
     return app.exec_()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
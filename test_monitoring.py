@@ -1,10 +1,16 @@
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import time
 import unittest
 from unittest.mock import Mock, patch
 
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication, QMessageBox
 
+import monitoring_app
 from monitoring_app import MonitoringApp, VideoThread
 
 
@@ -15,8 +21,9 @@ class TestMonitoringApp(unittest.TestCase):
         cls.qt_app = QApplication.instance() or QApplication(sys.argv)
 
     def setUp(self):
-        if os.path.exists('config.json'):
-            os.remove('config.json')
+        for leftover in ('config.json', 'announcements.db'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
         self.app_instance = MonitoringApp()
 
     def tearDown(self):
@@ -28,8 +35,9 @@ class TestMonitoringApp(unittest.TestCase):
             self.app_instance.deleteLater()
         except Exception:
             pass
-        if os.path.exists('config.json'):
-            os.remove('config.json')
+        for leftover in ('config.json', 'announcements.db'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
 
     def test_initial_state(self):
         self.assertFalse(self.app_instance.recording)
@@ -48,11 +56,12 @@ class TestMonitoringApp(unittest.TestCase):
         self.app_instance.record_indicator_scale = 0.8
         self.app_instance.camera_index = 2
         self.app_instance.default_announcement_color = '#ff0000'
-        self.app_instance.announcements = [
-            {'text': 'Test announcement', 'timestamp': '2024-01-01 10:00:00', 'color': '#00ff00'}
-        ]
+        timestamp = monitoring_app.datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.app_instance.announcements.append(
+            self.app_instance.announcement_store.add('Test announcement', timestamp, '#00ff00'))
 
         self.app_instance.save_config()
+        self.app_instance.flush_config()
         self.assertTrue(os.path.exists('config.json'))
 
         new_instance = MonitoringApp()
@@ -97,6 +106,36 @@ class TestMonitoringApp(unittest.TestCase):
         texts = [w.text() for w in card.findChildren(QLabel)]
         self.assertTrue(any('Test 1' in t for t in texts))
 
+    def test_announcement_display_updates_incrementally(self):
+        app = self.app_instance
+        app.announcements = [
+            {'id': i, 'text': f'Item {i}', 'timestamp': f'2024-01-01 10:{i:02d}:00', 'color': '#123456'}
+            for i in range(monitoring_app.ANNOUNCEMENT_WINDOW + 5)
+        ]
+        app.update_announcement_display()
+        cards = dict(app.announcement_cards)
+        self.assertEqual(len(cards), monitoring_app.ANNOUNCEMENT_WINDOW)
+
+        with patch.object(monitoring_app.AnnouncementCard, 'set_announcement') as set_announcement:
+            del app.announcements[3]
+            app.announcements[5]['color'] = '#ff0000'
+            app.update_announcement_display()
+        layout = app.announcement_container_layout
+        self.assertEqual(layout.itemAt(3).widget(), cards[4])
+        self.assertNotIn(3, app.announcement_cards)
+        # Survivors are reused; only the card that scrolled into the window is new
+        self.assertEqual([k for k in app.announcement_cards if app.announcement_cards[k] is not cards.get(k)],
+                         [monitoring_app.ANNOUNCEMENT_WINDOW])
+
+        app.update_announcement_display()
+        self.assertEqual(cards[6].shown[2], '#ff0000')
+        self.assertEqual(cards[7].shown[2], '#123456')
+
+        app.announcements = []
+        app.update_announcement_display()
+        self.assertEqual(app.announcement_cards, {})
+        self.assertIn('暂无公告', layout.itemAt(0).widget().text())
+
     @patch('cv2.VideoCapture')
     def test_start_camera_failure(self, mock_cv2):
         mock_cap = Mock()
@@ -129,6 +168,81 @@ class TestMonitoringApp(unittest.TestCase):
             # cleanup within patched context
             self.app_instance.stop_camera()
 
+    @patch('cv2.VideoCapture')
+    def test_camera_restart_restores_full_quality(self, mock_cv2):
+        mock_cap = Mock()
+        mock_cap.isOpened.return_value = True
+        mock_cv2.return_value = mock_cap
+        app = self.app_instance
+
+        with patch.object(VideoThread, 'start', return_value=None), patch.object(VideoThread, 'stop', return_value=None):
+            app.start_camera()
+            app.on_quality_changed(len(monitoring_app.QualityController.LEVELS) - 1, "test")
+            self.assertTrue(app.reduced_resolution)
+
+            app.stop_camera()
+            app.start_camera()
+            self.assertEqual(app.quality_level, app.video_thread.quality.level)
+            self.assertFalse(app.reduced_resolution)
+            app.stop_camera()
+
+    def test_config_writes_are_coalesced_and_atomic(self):
+        app = self.app_instance
+        with patch.object(app.config_store, 'write_async') as write_async:
+            for value in range(5):
+                app.timestamp_scale = 1.0 + value / 10
+                app.save_config()
+            write_async.assert_not_called()
+            self.assertTrue(app.config_save_timer.isActive())
+            app.config_save_timer.timeout.emit()
+            app.config_save_timer.stop()
+            write_async.assert_called_once()
+            self.assertAlmostEqual(write_async.call_args.args[0]['timestamp_scale'], 1.4)
+
+        with patch('monitoring_app.os.replace', side_effect=OSError("disk gone")):
+            app.flush_config()
+        self.assertFalse(os.path.exists('config.json'))
+        app.flush_config()
+        with open('config.json', encoding='utf-8') as f:
+            self.assertAlmostEqual(monitoring_app.json.load(f)['timestamp_scale'], 1.4)
+        self.assertFalse(os.path.exists('config.json.tmp'))
+
+        with open('config.json', 'w', encoding='utf-8') as f:
+            f.write('{"exposure": 3, "announce')
+        try:
+            app.load_config()
+            self.assertEqual(app.exposure, 0)
+            self.assertFalse(os.path.exists('config.json'))
+            self.assertTrue(os.path.exists('config.json.corrupt'))
+        finally:
+            os.remove('config.json.corrupt')
+
+    def test_exposure_changes_are_coalesced_on_capture_thread(self):
+        cv2 = monitoring_app.cv2
+        thread = VideoThread()
+        thread.cap = Mock()
+        thread.cap.get.return_value = -6.0
+        received = []
+        thread.camera_property_changed.connect(lambda prop, value: received.append((prop, value)))
+        self.app_instance.video_thread = thread
+        try:
+            with patch.object(self.app_instance, 'save_config') as save_config:
+                for value in range(-1, -9, -1):
+                    self.app_instance.update_exposure(value, persist=False)
+                save_config.assert_not_called()
+            thread.cap.set.assert_not_called()
+
+            thread._apply_camera_commands()
+            thread.cap.set.assert_called_once_with(cv2.CAP_PROP_EXPOSURE, -8)
+            self.assertEqual(received, [(cv2.CAP_PROP_EXPOSURE, -6.0)])
+            self.assertEqual(thread.exposure, -6.0)
+
+            self.app_instance.on_camera_property_changed(cv2.CAP_PROP_EXPOSURE, -6.0)
+            self.assertEqual(self.app_instance.exposure_actual, -6.0)
+            self.assertEqual(self.app_instance.exposure, -8)
+        finally:
+            self.app_instance.video_thread = None
+
     def test_clear_announcements(self):
         self.app_instance.announcements = [
             {'text': 'Test 1', 'timestamp': '2024-01-01 10:00:00', 'color': '#000000'}
@@ -139,6 +253,223 @@ class TestMonitoringApp(unittest.TestCase):
 
         self.assertEqual(self.app_instance.announcements, [])
 
+    def test_announcement_store_search_and_archive(self):
+        store = self.app_instance.announcement_store
+        date = monitoring_app.datetime.date
+        store.add_many([
+            {'text': f'第{i}节 100% 出勤', 'timestamp': f'2024-03-{1 + i:02d} 08:00:00', 'color': None}
+            for i in range(30)
+        ])
+        store.add('放假通知', '2024-04-01 09:00:00', '#ff0000')
+
+        self.assertEqual(store.count(text='100%'), 30)
+        self.assertEqual(store.count(text='_'), 0)
+        page = store.search(text='出勤', offset=10, limit=10)
+        self.assertEqual([a['timestamp'][:10] for a in page[:2]], ['2024-03-20', '2024-03-19'])
+        self.assertEqual(store.count(date_from=date(2024, 3, 10), date_to=date(2024, 3, 12)), 3)
+
+        self.assertEqual(store.archive_before('2024-03-31 00:00:00'), 30)
+        self.assertEqual([a['text'] for a in store.active()], ['放假通知'])
+        self.assertEqual(store.count(archived=True), 30)
+        self.assertEqual(store.count(archived=None), 31)
+
+    def test_import_announcements_in_one_batch(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'import.csv')
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                f.write('内容,时间,颜色\n明天考试,2099-01-02 08:00,#ff0000\n,2099-01-02,\n'
+                        '带家长会回执,2099-01-03,\n坏颜色,2099-01-03,notacolor\n')
+            items, errors = monitoring_app.read_announcements_file(path)
+            self.assertEqual([i['text'] for i in items], ['明天考试', '带家长会回执'])
+            self.assertEqual(items[0]['timestamp'], '2099-01-02 08:00:00')
+            self.assertEqual(len(errors), 2)
+            self.assertTrue(errors[0].startswith('第 3 行'))
+
+            store = self.app_instance.announcement_store
+            with patch.object(monitoring_app.QFileDialog, 'getOpenFileName', return_value=(path, '')), \
+                    patch.object(QMessageBox, 'question', return_value=QMessageBox.Yes), \
+                    patch.object(store, 'add_many', wraps=store.add_many) as add_many, \
+                    patch.object(self.app_instance, 'update_announcement_display') as refresh:
+                self.app_instance.import_announcements()
+            add_many.assert_called_once()
+            refresh.assert_called_once()
+            self.assertEqual([a['text'] for a in self.app_instance.announcements], ['明天考试', '带家长会回执'])
+
+            store.set_archived([self.app_instance.announcements[0]['id']])
+            exported = os.path.join(tmp, 'export.json')
+            with patch.object(monitoring_app.QFileDialog, 'getSaveFileName', return_value=(exported, '')):
+                self.app_instance.export_announcements()
+            items, errors = monitoring_app.read_announcements_file(exported)
+            self.assertEqual(errors, [])
+            self.assertEqual([(i['text'], i['archived']) for i in items],
+                             [('明天考试', True), ('带家长会回执', False)])
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def test_scheduled_announcement_is_read_and_repeats(self):
+        datetime = monitoring_app.datetime
+        friday = datetime.datetime(2024, 3, 8, 8, 0)
+        self.assertEqual(monitoring_app.next_occurrence(friday, 'weekdays', friday),
+                         datetime.datetime(2024, 3, 11, 8, 0))
+        self.assertEqual(monitoring_app.next_occurrence(friday, 'daily', datetime.datetime(2024, 5, 1, 9, 0)),
+                         datetime.datetime(2024, 5, 2, 8, 0))
+        self.assertIsNone(monitoring_app.next_occurrence(friday, 'none', friday))
+
+        ann = self.app_instance.announcement_store.add('上课铃', '2024-03-08 07:00:00', None)
+        self.app_instance.announcements = [ann]
+        due = datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(hours=1)
+        self.app_instance.set_announcement_schedule(ann, due, 'daily')
+        self.assertEqual(self.app_instance.announcement_scheduler.next_due(), (due, ann['id']))
+        self.assertIn('每天', self.app_instance.announcement_cards[ann['id']].time_label.text())
+
+        with patch.object(self.app_instance.speech_worker, 'say') as say:
+            self.app_instance.on_announcement_due(ann['id'])
+        say.assert_called_once_with('上课铃')
+        stored = self.app_instance.announcement_store.scheduled()
+        self.assertEqual(stored[0]['due'], (due + datetime.timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'))
+        self.assertEqual(self.app_instance.announcement_store.archive_before('2099-01-01 00:00:00'), 0)
+
+    def test_timetable_drives_camera_and_recording(self):
+        app = self.app_instance
+        app.timetable = Mock()
+        app.timetable.next_transition.side_effect = \
+            lambda now: now + monitoring_app.datetime.timedelta(minutes=5)
+
+        def open_camera():
+            app.cap = Mock()
+
+        def close_segment(notify):
+            app.recording = False
+
+        with patch.object(app, 'start_camera', side_effect=open_camera) as start_camera, \
+                patch.object(app, 'start_recording', return_value=True) as start_recording, \
+                patch.object(app, 'stop_recording', side_effect=close_segment) as stop_recording, \
+                patch.object(app, 'stop_camera') as stop_camera:
+            app.timetable.state_at.return_value = 'warm'
+            app.set_timetable_enabled(True)
+            start_camera.assert_called_once()
+            start_recording.assert_not_called()
+            self.assertTrue(app.timetable_timer.isActive())
+            self.assertGreater(app.timetable_timer.interval(), 4 * 60 * 1000)
+
+            app.timetable.state_at.return_value = 'record'
+            app.apply_timetable()
+            start_recording.assert_called_once()
+            app.recording = True
+
+            app.timetable.state_at.return_value = 'idle'
+            app.apply_timetable()
+            stop_recording.assert_called_once_with(notify=False)
+            stop_camera.assert_called_once()
+            app.cap = None
+        app.timetable = monitoring_app.Timetable()
+
+    def test_startup_defers_heavy_imports_and_housekeeping(self):
+        probe = ("import sys, monitoring_app; "
+                 "print(sorted(m for m in ('cv2', 'cryptography', 'PIL', 'pyttsx3') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(monitoring_app.__file__)))
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]')
+
+        self.app_instance.on_exit()
+        with patch.object(MonitoringApp, 'cleanup_old_videos') as cleanup:
+            self.app_instance = MonitoringApp()
+            cleanup.assert_not_called()
+            self.assertIn('ui', self.app_instance.startup_timings.phases)
+            self.app_instance.start_housekeeping()
+            self.app_instance.background_pool.shutdown(wait=True)
+            cleanup.assert_called_once()
+
+    def test_manual_reading_interrupts_scheduled_reading(self):
+        app = self.app_instance
+        app.announcements = [{'id': 1, 'text': '明天放假', 'timestamp': '2024-03-08 08:00:00', 'color': '#000000'}]
+        with patch.object(app, 'verify_password_with_dialog', return_value=True), \
+                patch.object(app.speech_worker, 'available', True), \
+                patch.object(app.speech_worker, 'say') as say:
+            app.tts_read_announcement()
+            app.on_announcement_due(1)
+        self.assertEqual(say.call_args_list[0].args, ('明天放假', monitoring_app.SPEECH_PRIORITY_URGENT))
+        self.assertEqual(say.call_args_list[1].args, ('明天放假',))
+        app.announcements = []
+
+    def test_announcements_migrate_out_of_config(self):
+        self.app_instance.on_exit()
+        timestamp = monitoring_app.datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open('config.json', 'w', encoding='utf-8') as f:
+            monitoring_app.json.dump({'exposure': 2, 'announcements': [
+                {'text': '旧公告', 'timestamp': timestamp, 'color': '#000000'},
+                {'text': '去年的公告', 'timestamp': '2020-01-01 08:00:00'},
+                {'text': '没有时间的公告'},
+                {'text': '  '}, 'junk']}, f)
+
+        self.app_instance = MonitoringApp()
+        self.assertEqual(sorted(a['text'] for a in self.app_instance.announcements), ['去年的公告', '旧公告', '没有时间的公告'])
+        self.assertTrue(all(a['timestamp'] for a in self.app_instance.announcements))
+        with open('config.json', encoding='utf-8') as f:
+            self.assertNotIn('announcements', monitoring_app.json.load(f))
+        self.app_instance.on_exit()
+        self.app_instance = MonitoringApp()
+        self.assertEqual(len(self.app_instance.announcements), 3)
+
+        # Archiving by age only happens once it has been switched on
+        with patch.object(monitoring_app.QInputDialog, 'getInt', return_value=(30, True)):
+            self.app_instance.change_announcement_archive_days()
+        self.assertEqual(sorted(a['text'] for a in self.app_instance.announcements), ['旧公告', '没有时间的公告'])
+
+
+class TestAnnouncementScheduler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.qt_app = QApplication.instance() or QApplication(sys.argv)
+
+    def test_single_timer_fires_due_items_in_order(self):
+        datetime = monitoring_app.datetime
+        now = [datetime.datetime(2024, 3, 8, 7, 59)]
+        scheduler = monitoring_app.AnnouncementScheduler(clock=lambda: now[0])
+        fired = []
+        scheduler.announcement_due.connect(fired.append)
+
+        scheduler.schedule(1, datetime.datetime(2024, 3, 8, 8, 5))
+        scheduler.schedule(2, datetime.datetime(2024, 3, 8, 8, 0))
+        scheduler.schedule(3, datetime.datetime(2024, 3, 8, 8, 1))
+        scheduler.schedule(2, datetime.datetime(2024, 3, 8, 8, 2))
+        scheduler.unschedule(3)
+        self.assertTrue(scheduler.timer.isActive())
+        self.assertEqual(scheduler.timer.interval(), 3 * 60 * 1000)
+
+        now[0] = datetime.datetime(2024, 3, 8, 8, 10)
+        scheduler._fire()
+        self.assertEqual(fired, [2, 1])
+        self.assertIsNone(scheduler.next_due())
+        self.assertFalse(scheduler.timer.isActive())
+
+
+class TestTimetable(unittest.TestCase):
+    def test_periods_exceptions_and_transitions(self):
+        datetime = monitoring_app.datetime.datetime
+        timetable, errors = monitoring_app.Timetable.parse(
+            "周一 08:00-08:45 08:45-09:30 10:00-10:45\n"
+            "2024-03-11~2024-03-12 停课\n"
+            "2024-03-16 14:00-14:45\n"
+            "周八 08:00-08:45\n"
+            "2024-03-18 09:00-08:00\n"
+        )
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith('第 4 行'))
+        self.assertEqual(monitoring_app.Timetable.from_config(timetable.to_config()).to_text(), timetable.to_text())
+
+        self.assertEqual(timetable.state_at(datetime(2024, 3, 4, 7, 58)), 'idle')
+        self.assertEqual(timetable.state_at(datetime(2024, 3, 4, 7, 59, 30)), 'warm')
+        self.assertEqual(timetable.state_at(datetime(2024, 3, 4, 8, 50)), 'record')
+        self.assertEqual(timetable.state_at(datetime(2024, 3, 4, 9, 45)), 'idle')
+        self.assertEqual(timetable.next_transition(datetime(2024, 3, 4, 8, 10)), datetime(2024, 3, 4, 9, 30))
+        # The holiday skips Monday the 11th; the make-up Saturday comes first
+        self.assertEqual(timetable.next_transition(datetime(2024, 3, 4, 11, 0)), datetime(2024, 3, 16, 13, 59))
+        self.assertEqual(timetable.next_transition(datetime(2024, 3, 16, 15, 0)), datetime(2024, 3, 18, 7, 59))
+        self.assertIsNone(monitoring_app.Timetable().next_transition(datetime(2024, 3, 4)))
+
 
 class TestVideoThread(unittest.TestCase):
     def test_video_thread_defaults(self):
@@ -152,6 +483,857 @@ class TestVideoThread(unittest.TestCase):
         self.assertEqual(thread.timestamp_scale, 1.0)
         self.assertEqual(thread.record_indicator_scale, 1.0)
 
+    def test_settings_snapshot_is_swapped_whole(self):
+        thread = VideoThread()
+        before = thread.settings
+        with self.assertRaises(AttributeError):
+            before.timestamp_scale = 2.0
+        with self.assertRaises(AttributeError):
+            thread.recording = True
+
+        thread.update_settings(timestamp_scale=2, time_position='bottom-left')
+        self.assertEqual(before.timestamp_scale, 1.0)
+        self.assertEqual(thread.settings.font_thickness, 4)
+        self.assertEqual(thread.time_position, 'bottom-left')
+
+        recorder = Mock()
+        self.assertIsNone(thread.swap_writer(recorder))
+        self.assertTrue(thread.recording)
+        self.assertIs(thread.video_writer, recorder)
+        self.assertEqual(thread.settings.timestamp_scale, 2.0)
+        self.assertIs(thread.swap_writer(None), recorder)
+        self.assertFalse(thread.recording)
+
+
+class FakeSpeechEngine:
+    """Speaks one 'word' every few milliseconds and honours stop() from word callbacks"""
+
+    def __init__(self, words=20):
+        self.words = words
+        self.callbacks = {}
+        self.pending = []
+        self.spoken = []
+        self.stopped = False
+
+    def connect(self, name, callback):
+        self.callbacks[name] = callback
+
+    def getProperty(self, name):
+        return 'voice-zh'
+
+    def say(self, text):
+        self.pending.append((text, None))
+
+    def save_to_file(self, text, filename):
+        self.pending.append((text, filename))
+
+    def stop(self):
+        self.stopped = True
+
+    def runAndWait(self):
+        text, filename = self.pending.pop(0)
+        self.stopped = False
+        self.callbacks['started-utterance'](name=None)
+        for _ in range(self.words):
+            if self.stopped:
+                break
+            self.callbacks['started-word'](name=None, location=0, length=1)
+            time.sleep(0.005)
+        if filename is None:
+            self.spoken.append((text, not self.stopped))
+        elif not self.stopped:
+            with open(filename, 'wb') as f:
+                f.write(b'RIFF' + text.encode('utf-8'))
+
+
+class TestSpeechWorker(unittest.TestCase):
+    def wait_until(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertTrue(condition())
+
+    def test_queue_interrupt_and_stop(self):
+        engine = FakeSpeechEngine()
+        worker = monitoring_app.SpeechWorker(engine_factory=lambda: engine)
+        worker.start()
+        try:
+            worker.say('第一条')
+            worker.say('第二条')
+            self.wait_until(lambda: worker.speaking)
+            worker.say('紧急通知', monitoring_app.SPEECH_PRIORITY_URGENT)
+            self.wait_until(lambda: len(engine.spoken) == 4)
+            self.assertEqual(engine.spoken, [
+                ('第一条', False), ('紧急通知', True), ('第一条', True), ('第二条', True)
+            ])
+
+            engine.words = 10000
+            worker.say('很长的公告')
+            worker.say('不会被读到')
+            self.wait_until(lambda: worker.speaking)
+            worker.skip()
+            self.wait_until(lambda: len(engine.spoken) == 5)
+            self.assertEqual(engine.spoken[4], ('很长的公告', False))
+            self.wait_until(lambda: worker.speaking)
+            worker.stop()
+            self.wait_until(lambda: not worker.speaking)
+            self.assertEqual(engine.spoken[5], ('不会被读到', False))
+            self.assertEqual(worker.pending(), 0)
+        finally:
+            worker.shutdown()
+            self.assertTrue(worker.wait(2000))
+
+    def test_engine_errors_are_reported(self):
+        engine = FakeSpeechEngine()
+        engine.say = Mock(side_effect=RuntimeError('设备不可用'))
+        worker = monitoring_app.SpeechWorker(engine_factory=lambda: engine)
+        failures, finished = [], []
+        worker.speaking_failed.connect(lambda text, error: failures.append((text, error)), Qt.DirectConnection)
+        worker.speaking_finished.connect(lambda text, completed: finished.append(completed), Qt.DirectConnection)
+        worker.start()
+        try:
+            worker.say('上课')
+            self.wait_until(lambda: finished)
+            self.assertEqual(failures, [('上课', '设备不可用')])
+            self.assertEqual(finished, [False])
+        finally:
+            worker.shutdown()
+            self.assertTrue(worker.wait(2000))
+
+    def test_cached_audio_is_played_instead_of_synthesized(self):
+        tmp = tempfile.mkdtemp()
+        engine = FakeSpeechEngine()
+        cache = monitoring_app.SpeechCache(directory=tmp)
+        worker = monitoring_app.SpeechWorker(engine_factory=lambda: engine, cache=cache)
+        worker.start()
+        try:
+            worker.prepare('下课请关窗')
+            key = monitoring_app.SpeechCache.key('下课请关窗', 'voice-zh', monitoring_app.TTS_RATE)
+            self.wait_until(lambda: cache.lookup(key) is not None)
+            with patch.object(worker, '_play_file', return_value=True) as play:
+                worker.say('下课请关窗')
+                worker.say('没有缓存')
+                self.wait_until(lambda: len(engine.spoken) == 1)
+            play.assert_called_once_with(cache.path(key))
+            self.assertEqual(engine.spoken, [('没有缓存', True)])
+        finally:
+            worker.shutdown()
+            worker.wait(2000)
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def test_speech_cache_evicts_least_recently_used(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            cache = monitoring_app.SpeechCache(directory=tmp, max_bytes=25)
+            for age, key in enumerate(['a', 'b', 'c']):
+                with open(cache.partial_path(key), 'wb') as f:
+                    f.write(b'x' * 10)
+                self.assertTrue(cache.commit(key))
+                os.utime(cache.path(key), (1000 + age, 1000 + age))
+                if key == 'b':
+                    cache.lookup('a')
+            self.assertIsNotNone(cache.lookup('a'))
+            self.assertIsNone(cache.lookup('b'))
+            self.assertIsNotNone(cache.lookup('c'))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def write_test_avi(path, frames=40, size=(320, 240)):
+    import numpy as np
+    cv2 = monitoring_app.cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'XVID'), 20.0, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), (i * 5) % 255, np.uint8)
+        cv2.putText(frame, str(i), (40, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def count_avi_frames(path):
+    cap = monitoring_app.cv2.VideoCapture(path)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+class RecordingsDirTestCase(unittest.TestCase):
+    """Runs a MonitoringApp against a throwaway recordings directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.qt_app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dir_patch = patch('monitoring_app.RECORDINGS_DIR', self.tmp_dir)
+        self.dir_patch.start()
+        self.thumb_patch = patch('monitoring_app.THUMBNAIL_DIR', os.path.join(self.tmp_dir, 'thumbs'))
+        self.thumb_patch.start()
+        self.app_instance = MonitoringApp()
+
+    def tearDown(self):
+        try:
+            self.app_instance.on_exit()
+        except Exception:
+            pass
+        self.app_instance.deleteLater()
+        self.dir_patch.stop()
+        self.thumb_patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        for leftover in ('config.json', 'announcements.db'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    def _make_segment(self, name, age_seconds, size=1024):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        mtime = time.time() - age_seconds
+        os.utime(path, (mtime, mtime))
+        return path
+
+
+class TestDiskSpaceGuard(RecordingsDirTestCase):
+    def test_evict_oldest_skips_protected(self):
+        oldest = self._make_segment('video_a.avi.encrypted', 300)
+        older = self._make_segment('video_b.avi.encrypted', 200)
+        newest = self._make_segment('video_c.avi.encrypted', 100)
+        self.app_instance.protected_recordings = ['video_a.avi.encrypted']
+
+        freed = self.app_instance.evict_oldest_recordings(1)
+
+        self.assertEqual(freed, 1024)
+        self.assertTrue(os.path.exists(oldest))
+        self.assertFalse(os.path.exists(older))
+        self.assertTrue(os.path.exists(newest))
+
+    def test_toggle_recording_refuses_without_space(self):
+        self.app_instance.cap = Mock()
+        self.app_instance.cap.get.return_value = 640
+        with patch.object(MonitoringApp, '_free_disk_bytes', return_value=0):
+            self.app_instance.toggle_recording()
+        self.assertFalse(self.app_instance.recording)
+        self.assertIsNone(self.app_instance.video_writer)
+        self.app_instance.cap = None
+
+    def test_open_segment_falls_back_to_low_bitrate(self):
+        self.app_instance.cap = Mock()
+        self.app_instance.cap.get.side_effect = lambda prop: 640 if prop == monitoring_app.cv2.CAP_PROP_FRAME_WIDTH else 480
+        full = self.app_instance._segment_bytes_needed()
+        with patch.object(MonitoringApp, '_free_disk_bytes', return_value=full - 1):
+            recorder = self.app_instance._open_segment()
+        try:
+            self.assertIsNotNone(recorder)
+            self.assertTrue(self.app_instance.low_bitrate_mode)
+            self.assertEqual(recorder.frame_size, (320, 240))
+        finally:
+            recorder.release()
+            self.app_instance.cap = None
+
+
+    def test_retention_cleanup_goes_through_remove_recording(self):
+        app = self.app_instance
+        old_age = (monitoring_app.RETENTION_DAYS + 1) * 86400
+        expired = self._make_segment('video_old.avi.encrypted', old_age)
+        self._make_segment('video_old.proxy.avi.encrypted', old_age)
+        self._make_segment('video_old.idx', old_age)
+        self._make_segment('stray.tmp', old_age)
+        kept = self._make_segment('video_new.avi.encrypted', 100)
+        app.protected_recordings = ['video_old.avi.encrypted']
+        app.timeline_index = Mock()
+
+        app.cleanup_old_videos()
+
+        self.assertEqual(os.listdir(self.tmp_dir), [os.path.basename(kept)])
+        self.assertFalse(os.path.exists(expired))
+        app.timeline_index.remove.assert_called_once_with('video_old')
+        self.assertEqual(app.protected_recordings, [])
+        app.timeline_index = None
+
+
+class TestCrashRecovery(RecordingsDirTestCase):
+    def test_repair_truncated_avi(self):
+        path = os.path.join(self.tmp_dir, 'video_crash.avi')
+        write_test_avi(path)
+        self.assertFalse(monitoring_app.repair_avi_index(path))
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) * 2 // 3])
+
+        self.assertTrue(monitoring_app.repair_avi_index(path))
+        frames = count_avi_frames(path)
+        self.assertGreater(frames, 0)
+        cap = monitoring_app.cv2.VideoCapture(path)
+        self.assertEqual(int(cap.get(monitoring_app.cv2.CAP_PROP_FRAME_COUNT)), frames)
+        cap.release()
+
+    def test_orphaned_recordings_are_encrypted(self):
+        orphan = os.path.join(self.tmp_dir, 'video_orphan.avi')
+        write_test_avi(orphan, frames=10)
+        active = os.path.join(self.tmp_dir, 'video_active.avi')
+        write_test_avi(active, frames=10)
+        self.app_instance.current_video_path = active
+
+        self.assertEqual(self.app_instance.find_orphaned_recordings(), [orphan])
+        self.app_instance.recover_orphaned_recordings()
+        for task in list(self.app_instance.background_tasks):
+            task.result(timeout=30)
+        self.app_instance.current_video_path = None
+
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(orphan + '.encrypted'))
+        self.assertTrue(os.path.exists(active))
+        self.assertTrue(self.app_instance.thumbnail_cache.has('video_orphan'))
+
+
+    def test_recovery_skips_files_of_the_live_recording(self):
+        app = self.app_instance
+        app.record_proxy = True
+        app.cap = Mock()
+        app.cap.get.side_effect = lambda prop: 640 if prop == monitoring_app.cv2.CAP_PROP_FRAME_WIDTH else 480
+        orphan = os.path.join(self.tmp_dir, 'video_orphan.avi')
+        write_test_avi(orphan, frames=10)
+        try:
+            self.assertTrue(app.start_recording())
+            recorder = app.video_writer
+            self.assertTrue(os.path.exists(recorder.proxy_path))
+            self.assertEqual(app.find_orphaned_recordings(), [orphan])
+            app.recover_orphaned_recordings()
+            for task in list(app.background_tasks):
+                task.result(timeout=30)
+            self.assertTrue(os.path.exists(recorder.path))
+            self.assertTrue(os.path.exists(recorder.proxy_path))
+            self.assertTrue(os.path.exists(orphan + '.encrypted'))
+
+            # A segment waiting for the background pool is not an orphan either
+            with patch.object(MonitoringApp, 'submit_background_task', return_value=None), \
+                    patch.object(MonitoringApp, '_close_segment'):
+                app.stop_recording(notify=False)
+            self.assertEqual(app.find_orphaned_recordings(), [])
+            app.closing_segments.clear()
+            recorder.release()
+        finally:
+            app.cap = None
+
+    def test_leftover_working_copies_are_swept(self):
+        scratch = monitoring_app.scratch_dir()
+        self.assertEqual(os.path.dirname(scratch), self.tmp_dir)
+        stale_file = monitoring_app.scratch_file('.avi')
+        stale_dir = os.path.join(scratch, 'archive_old')
+        os.makedirs(stale_dir)
+        past = self.app_instance.session_started - 60
+        for path in (stale_file, stale_dir):
+            os.utime(path, (past, past))
+        current = monitoring_app.scratch_file('.avi')
+
+        self.app_instance.recover_orphaned_recordings()
+        for task in list(self.app_instance.background_tasks):
+            task.result(timeout=30)
+
+        self.assertEqual(os.listdir(scratch), [os.path.basename(current)])
+
+
+class TestThumbnailCache(RecordingsDirTestCase):
+    def _frame(self, value=128):
+        import numpy as np
+        return np.full((480, 640, 3), value, np.uint8)
+
+    def test_thumbnails_are_encrypted_and_scaled(self):
+        cache = self.app_instance.thumbnail_cache
+        self.assertTrue(cache.put('video_x', self._frame()))
+
+        with open(os.path.join(self.tmp_dir, 'thumbs', 'video_x.thumb'), 'rb') as f:
+            self.assertFalse(f.read().startswith(b'\xff\xd8'))
+
+        cache._pixmaps.clear()
+        pixmap = cache.get_pixmap('video_x')
+        self.assertIsNotNone(pixmap)
+        self.assertEqual((pixmap.width(), pixmap.height()), (240, 180))
+
+    def test_cache_is_size_bounded(self):
+        cache = monitoring_app.ThumbnailCache(
+            self.app_instance.encryption_manager,
+            directory=os.path.join(self.tmp_dir, 'bounded'),
+            max_bytes=6000
+        )
+        for i in range(10):
+            cache.put(f'video_{i}', self._frame(i * 20))
+            path = cache._path(f'video_{i}')
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+        total = sum(os.path.getsize(os.path.join(cache.directory, n)) for n in os.listdir(cache.directory))
+        self.assertLessEqual(total, 6000)
+        self.assertTrue(cache.has('video_9'))
+        self.assertFalse(cache.has('video_0'))
+
+
+class TestReusableDialogs(RecordingsDirTestCase):
+    def test_video_list_is_reused_and_refreshed_incrementally(self):
+        self._make_segment('video_a.avi.encrypted', 300)
+        older = self._make_segment('video_b.avi.encrypted', 200)
+        app = self.app_instance
+        # Warming up only builds the shell; the directory is scanned when the list is shown
+        app.warm_up_dialogs(['video_list'])
+        self.assertEqual(app.dialogs['video_list'].row_files, [])
+        with patch.object(monitoring_app.VideoListDialog, 'exec_') as exec_:
+            app.show_video_list()
+            dialog = app.dialogs['video_list']
+            table = dialog.video_table
+            self.assertEqual(dialog.row_files, ['video_b.avi.encrypted', 'video_a.avi.encrypted'])
+            untouched = table.cellWidget(1, 4)
+
+            os.remove(older)
+            self._make_segment('video_c.avi.encrypted', 100)
+            app.show_video_list()
+            self.assertEqual(exec_.call_count, 2)
+        self.assertIs(app.dialogs['video_list'], dialog)
+        self.assertEqual(dialog.row_files, ['video_c.avi.encrypted', 'video_a.avi.encrypted'])
+        self.assertEqual([table.item(row, 0).text() for row in range(table.rowCount())], dialog.row_files)
+        self.assertIs(table.cellWidget(1, 4), untouched)
+
+        picker = app.cached_dialog('export')
+        picker.set_files(['video_c.avi.encrypted', 'video_a.avi.encrypted'])
+        kept = picker.list_widget.item(1)
+        picker.set_files(['video_d.avi.encrypted', 'video_a.avi.encrypted'])
+        self.assertEqual([picker.list_widget.item(i).text() for i in range(picker.list_widget.count())],
+                         ['video_d.avi.encrypted', 'video_a.avi.encrypted'])
+        self.assertIs(picker.list_widget.item(1), kept)
+        self.assertIs(app.cached_dialog('export'), picker)
+
+
+    def test_standalone_video_list_deletes_files(self):
+        path = self._make_segment('video_solo.avi.encrypted', 100)
+        dialog = monitoring_app.VideoListDialog(None, self.app_instance.encryption_manager)
+        dialog.load_videos()
+        with patch.object(monitoring_app, 'PASSWORD_HASH', monitoring_app.hashlib.sha256(b'').hexdigest()), \
+                patch.object(monitoring_app.QDialog, 'exec_', return_value=monitoring_app.QDialog.Accepted):
+            dialog.delete_video('video_solo.avi.encrypted')
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(dialog.row_files, [])
+        dialog.deleteLater()
+
+
+    def test_standalone_video_list_exports_files(self):
+        plain = os.path.join(self.tmp_dir, 'video_solo.avi')
+        write_test_avi(plain, frames=5)
+        self.assertTrue(self.app_instance.encryption_manager.encrypt_file(plain))
+        home = os.path.join(self.tmp_dir, 'home')
+        os.makedirs(os.path.join(home, 'Desktop'))
+        dialog = monitoring_app.VideoListDialog(None, self.app_instance.encryption_manager)
+        with patch.object(monitoring_app.os.path, 'expanduser', return_value=home):
+            dialog.export_video('video_solo.avi.encrypted')
+        self.assertEqual(count_avi_frames(os.path.join(home, 'Desktop', 'video_solo.avi')), 5)
+        dialog.deleteLater()
+
+
+class TestActivityIndex(RecordingsDirTestCase):
+    def test_index_round_trip_and_active_periods(self):
+        index = monitoring_app.SegmentIndex('video_idx', started_at=1700000000.0)
+        index.activity.extend([0, 0, 50, 60, 0, 0, 40, 0, 0, 0, 0, 0, 90, 0])
+        index.save()
+
+        loaded = monitoring_app.SegmentIndex.load(monitoring_app.SegmentIndex.path_for('video_idx'))
+        self.assertEqual(loaded.key, 'video_idx')
+        self.assertEqual(loaded.meta['started_at'], 1700000000.0)
+        self.assertEqual(list(loaded.activity), list(index.activity))
+        self.assertEqual(loaded.active_periods(), [(2, 7), (12, 13)])
+
+        header = monitoring_app.SegmentIndex.load(monitoring_app.SegmentIndex.path_for('video_idx'), header_only=True)
+        self.assertEqual(len(header.activity), 0)
+
+    def test_monitor_scores_motion(self):
+        import numpy as np
+        recorder = Mock()
+        recorder.index = monitoring_app.SegmentIndex('video_motion')
+        recorder.mono_start = 100.0
+        monitor = self.app_instance.activity_monitor
+        still = np.zeros((36, 64, 3), np.uint8)
+        moved = still.copy()
+        moved[:, :32] = 255
+
+        for frame, sampled_at in ((still, 100.0), (still, 101.0), (moved, 102.0)):
+            monitor.submit(frame, recorder, sampled_at=sampled_at)
+            monitor.wait_idle()
+
+        self.assertEqual(recorder.index.activity[0], 0)
+        self.assertGreaterEqual(recorder.index.activity[1], monitoring_app.ACTIVITY_THRESHOLD)
+
+        # A lost sample leaves its second empty instead of shifting the rest
+        monitor.submit(still, recorder, sampled_at=104.0)
+        monitor.wait_idle()
+        self.assertEqual(len(recorder.index.activity), 3)
+        self.assertGreaterEqual(recorder.index.activity[2], monitoring_app.ACTIVITY_THRESHOLD)
+
+        # A new segment starts without a reference frame
+        other = Mock()
+        other.index = monitoring_app.SegmentIndex('video_next')
+        other.mono_start = 105.0
+        monitor.submit(moved, other, sampled_at=105.0)
+        monitor.wait_idle()
+        self.assertEqual(len(other.index.activity), 0)
+
+
+class TestMotionRecording(RecordingsDirTestCase):
+    def test_trigger_hysteresis(self):
+        trigger = monitoring_app.MotionTrigger(sensitivity=5, stop_delay=10, start_samples=2)
+        self.assertIsNone(trigger.update(100, 0.0))
+        self.assertTrue(trigger.update(100, 0.2))
+        # Short pauses keep the segment open
+        self.assertIsNone(trigger.update(0, 5.0))
+        self.assertIsNone(trigger.update(100, 6.0))
+        self.assertIsNone(trigger.update(0, 15.9))
+        self.assertFalse(trigger.update(0, 16.0))
+        self.assertIsNone(trigger.update(0, 30.0))
+
+    def test_armed_mode_opens_and_closes_segments(self):
+        app = self.app_instance
+        app.cap = Mock()
+        app.cap.get.side_effect = lambda prop: 640 if prop == monitoring_app.cv2.CAP_PROP_FRAME_WIDTH else 480
+        app.recording_mode = 'motion'
+        try:
+            app.toggle_recording()
+            self.assertTrue(app.motion_armed)
+            self.assertFalse(app.recording)
+            self.assertIsNotNone(app.activity_monitor.trigger)
+
+            app.on_motion_changed(True)
+            self.assertTrue(app.recording)
+            app.on_motion_changed(False)
+            self.assertFalse(app.recording)
+            self.assertTrue(app.motion_armed)
+
+            app.toggle_recording()
+            self.assertFalse(app.motion_armed)
+            self.assertIsNone(app.activity_monitor.trigger)
+        finally:
+            app.background_pool.shutdown(wait=True)
+            app.cap = None
+
+
+class TestPreEventBuffer(RecordingsDirTestCase):
+    def _frame(self, value):
+        import numpy as np
+        return np.full((120, 160, 3), value, np.uint8)
+
+    def test_buffer_respects_window_and_budget(self):
+        buffer = monitoring_app.PreEventBuffer(seconds=2)
+        now = time.monotonic()
+        for i in range(10):
+            buffer.append(buffer.encode(self._frame(i * 20)), now - 5 + i * 0.5)
+        self.assertEqual([round(now - t, 1) for t, _ in buffer.frames], [2.5, 2.0, 1.5, 1.0, 0.5])
+
+        jpeg = buffer.encode(self._frame(0))
+        small = monitoring_app.PreEventBuffer(seconds=60, max_bytes=jpeg.nbytes * 3)
+        for _ in range(5):
+            small.append(jpeg)
+        self.assertEqual(len(small), 3)
+        self.assertLessEqual(small.total_bytes, small.max_bytes)
+
+    def test_preroll_backdates_segment(self):
+        buffer = monitoring_app.PreEventBuffer(seconds=10)
+        now = time.monotonic()
+        for i in range(6):
+            buffer.append(buffer.encode(self._frame(100)), now - 3 + i * 0.5)
+
+        path = os.path.join(self.tmp_dir, 'video_preroll.avi')
+        recorder = monitoring_app.SegmentRecorder(path, monitoring_app.cv2.VideoWriter_fourcc(*'XVID'), 20.0, (160, 120))
+        wall_start = recorder.started_at
+        recorder.write_preroll(buffer.drain())
+        recorder.write(self._frame(100))
+        recorder.release()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(recorder.frames_written, 7)
+        self.assertAlmostEqual(wall_start - recorder.started_at, 3, delta=0.1)
+        self.assertEqual(list(recorder.index.frames[:2]), [0, 500])
+        self.assertEqual(len(recorder.index.activity), 3)
+
+
+    def test_start_writer_leaves_preroll_to_encoder(self):
+        buffer = monitoring_app.PreEventBuffer(seconds=10)
+        now = time.monotonic()
+        for i in range(4):
+            buffer.append(buffer.encode(self._frame(100)), now - 2 + i * 0.5)
+        thread = VideoThread()
+        thread.settings = monitoring_app.CaptureSettings(pre_event_buffer=buffer)
+        thread.encoder = monitoring_app.FrameEncoder()
+
+        path = os.path.join(self.tmp_dir, 'video_handoff.avi')
+        recorder = monitoring_app.SegmentRecorder(path, monitoring_app.cv2.VideoWriter_fourcc(*'XVID'), 20.0, (160, 120))
+        wall_start = recorder.started_at
+        thread.start_writer(recorder)
+        self.assertEqual(recorder.frames_written, 0)
+        self.assertAlmostEqual(wall_start - recorder.started_at, 2, delta=0.1)
+
+        thread.encoder.start()
+        thread.encoder.submit(recorder, self._frame(100), time.monotonic())
+        thread.encoder.flush()
+        thread.encoder.stop()
+        recorder.release()
+        self.assertEqual(recorder.frames_written, 5)
+        self.assertEqual(list(recorder.index.frames[:2]), [0, 500])
+
+
+class TestStaticScene(RecordingsDirTestCase):
+    def test_static_frames_are_skipped_until_max_gap(self):
+        import numpy as np
+        path = os.path.join(self.tmp_dir, 'video_static.avi')
+        recorder = monitoring_app.SegmentRecorder(path, monitoring_app.cv2.VideoWriter_fourcc(*'XVID'), 20.0, (160, 120))
+        recorder.static_threshold = monitoring_app.STATIC_SCENE_THRESHOLD
+        still = np.full((120, 160, 3), 80, np.uint8)
+        moved = still.copy()
+        moved[20:80, 20:80] = 255
+
+        decisions = [recorder.is_static(frame, t) for frame, t in
+                     [(still, 0.0), (still, 0.05), (still, 0.5), (moved, 0.55), (moved, 0.6), (moved, 1.6)]]
+        recorder.release()
+
+        self.assertEqual(decisions, [False, True, True, False, True, False])
+        self.assertEqual(recorder.frames_skipped, 3)
+
+    def test_export_padding_restores_timing(self):
+        path = os.path.join(self.tmp_dir, 'video_sparse.avi')
+        write_test_avi(path, frames=10)
+        offsets = [0, 50, 100, 1000, 1050, 1100, 1150, 2000, 2050, 3000]
+
+        self.assertTrue(monitoring_app.pad_avi_timing(path, offsets))
+
+        cap = monitoring_app.cv2.VideoCapture(path)
+        self.assertEqual(int(cap.get(monitoring_app.cv2.CAP_PROP_FRAME_COUNT)), 61)
+        timestamps = []
+        while cap.read()[0]:
+            timestamps.append(round(cap.get(monitoring_app.cv2.CAP_PROP_POS_MSEC)))
+        cap.release()
+        self.assertEqual(timestamps, offsets)
+        self.assertFalse(monitoring_app.pad_avi_timing(path, list(range(0, 500, 50))))
+
+
+class TestRecordingProfiles(RecordingsDirTestCase):
+    def test_benchmark_rejects_unavailable_encoders(self):
+        self.assertIsNotNone(monitoring_app.benchmark_encoder(monitoring_app.get_recording_profile('xvid'), (320, 240)))
+        missing = monitoring_app.RecordingProfile('missing', 'missing', 'ZZZZ')
+        self.assertIsNone(monitoring_app.benchmark_encoder(missing, (320, 240)))
+
+    def test_auto_profile_uses_first_profile_that_keeps_up(self):
+        app = self.app_instance
+        app.on_encoder_benchmark_done({'h264': None, 'vp9': None, 'xvid': 0.004})
+        self.assertEqual(app.active_profile().name, 'xvid')
+        self.assertEqual(app.bytes_per_second, 4000 * 1000 / 8)
+
+        # A cached result is reused as long as the machine and size are unchanged
+        with patch.object(MonitoringApp, 'submit_background_task') as submit:
+            app.schedule_encoder_benchmark()
+            submit.assert_not_called()
+
+        app.recording_profile = 'mjpg'
+        app.cap = Mock()
+        app.cap.get.side_effect = lambda prop: 320 if prop == monitoring_app.cv2.CAP_PROP_FRAME_WIDTH else 240
+        try:
+            recorder = app._open_segment()
+            self.assertTrue(recorder.is_opened())
+            self.assertEqual(recorder.index.meta['profile'], 'mjpg')
+            recorder.release()
+        finally:
+            app.cap = None
+
+        # Recording at a new size invalidates the cached result
+        with patch.object(MonitoringApp, 'submit_background_task') as submit:
+            app.schedule_encoder_benchmark()
+            submit.assert_called_once()
+
+
+class TestReviewProxy(RecordingsDirTestCase):
+    def test_proxy_is_recorded_and_removed_with_recording(self):
+        import numpy as np
+        self.assertEqual(monitoring_app.proxy_filename('video_1.avi.encrypted'), 'video_1.proxy.avi.encrypted')
+        self.assertFalse(monitoring_app.is_recording_file('video_1.proxy.avi.encrypted'))
+
+        path = os.path.join(self.tmp_dir, 'video_proxy.avi')
+        recorder = monitoring_app.SegmentRecorder(path, monitoring_app.cv2.VideoWriter_fourcc(*'XVID'), 20.0, (640, 480))
+        recorder.enable_proxy()
+        start = recorder.mono_start
+        for i in range(20):
+            recorder.write(np.full((480, 640, 3), i * 10, np.uint8), start + i * 0.05)
+        recorder.release()
+
+        self.assertEqual(recorder.proxy_size, (360, 270))
+        self.assertEqual(list(recorder.index.proxy_frames), [0, 200, 400, 600, 800])
+        self.assertEqual(count_avi_frames(recorder.proxy_path), 5)
+
+        for plain in (path, recorder.proxy_path):
+            self.assertTrue(self.app_instance.encryption_manager.encrypt_file(plain))
+
+        # A failed attempt does not block later ones
+        with patch.object(self.app_instance.encryption_manager, 'decrypt_file', return_value=False):
+            self.app_instance.request_proxy_thumbnail('video_proxy.avi.encrypted')
+            for task in list(self.app_instance.background_tasks):
+                task.result(timeout=30)
+        self.assertEqual(self.app_instance.pending_thumbnails, set())
+        self.app_instance.request_proxy_thumbnail('video_proxy.avi.encrypted')
+        for task in list(self.app_instance.background_tasks):
+            task.result(timeout=30)
+        self.assertTrue(self.app_instance.thumbnail_cache.has('video_proxy'))
+        self.app_instance.remove_recording('video_proxy.avi.encrypted')
+        self.assertEqual([f for f in os.listdir(self.tmp_dir) if f.endswith('.encrypted')], [])
+
+
+class TestAdaptiveQuality(unittest.TestCase):
+    def _window(self, controller, now, busy, depth=0.0, dropped=0):
+        controller.observe(busy, depth)
+        return controller.evaluate(now, dropped)
+
+    def test_steps_down_under_sustained_load_and_back_up(self):
+        controller = monitoring_app.QualityController(period=0.05, window=2.0)
+        controller.evaluate(0.0)
+        # One overloaded window is not enough
+        self.assertIsNone(self._window(controller, 2.0, 0.045))
+        self.assertEqual(self._window(controller, 4.0, 0.045)[0], 1)
+        self.assertIsNone(self._window(controller, 6.0, 0.01, depth=0.6))
+        self.assertEqual(self._window(controller, 8.0, 0.01, dropped=3)[0], 2)
+
+        changes = [self._window(controller, 10.0 + 2 * i, 0.005, dropped=3) for i in range(5)]
+        self.assertEqual(changes[:4], [None] * 4)
+        self.assertEqual(changes[4][0], 1)
+
+    def test_encoder_flush_and_drops(self):
+        encoder = monitoring_app.FrameEncoder(max_frames=2)
+        recorder = Mock()
+        self.assertTrue(encoder.submit(recorder, 'a', 1.0))
+        self.assertTrue(encoder.submit(recorder, 'b', 2.0))
+        self.assertFalse(encoder.submit(recorder, 'c', 3.0))
+        self.assertEqual(encoder.dropped, 1)
+        self.assertEqual(encoder.depth(), 1.0)
+
+        encoder.start()
+        encoder.flush()
+        self.assertEqual([c.args for c in recorder.write.call_args_list], [('a', 1.0), ('b', 2.0)])
+        encoder.stop()
+        encoder.join(timeout=5)
+        self.assertFalse(encoder.is_alive())
+
+
+class TestArchiveTranscode(RecordingsDirTestCase):
+    def test_old_recording_is_transcoded_in_place(self):
+        path = os.path.join(self.tmp_dir, 'video_old.avi')
+        write_test_avi(path, frames=40, size=(640, 480))
+        index = monitoring_app.SegmentIndex('video_old', started_at=1000.0)
+        index.frames.extend(range(0, 2000, 50))
+        index.save()
+        encrypted = self.app_instance.encryption_manager.encrypt_file(path)
+        old_time = time.time() - 2 * 86400
+        os.utime(encrypted, (old_time, old_time))
+        self._make_segment('video_new.avi.encrypted', 3600)
+
+        self.app_instance.archive_after_hours = 24
+        self.assertEqual(self.app_instance.archive_candidates(), [encrypted])
+
+        result = monitoring_app.transcode_for_archive(
+            encrypted, self.app_instance.encryption_manager.key, 'xvid', max_size=(320, 240))
+        self.assertIsNotNone(result)
+        self.assertLess(result[1], result[0])
+        self.assertAlmostEqual(os.path.getmtime(encrypted), old_time, delta=1)
+        self.assertEqual(self.app_instance.archive_candidates(), [])
+        self.assertEqual(monitoring_app.SegmentIndex.load(monitoring_app.SegmentIndex.path_for('video_old')).meta['archived']['size'], [320, 240])
+
+        plain = self.app_instance.encryption_manager.decrypt_file(encrypted, os.path.join(self.tmp_dir, 'check.avi'))
+        cap = monitoring_app.cv2.VideoCapture(plain)
+        self.assertEqual(int(cap.get(monitoring_app.cv2.CAP_PROP_FRAME_WIDTH)), 320)
+        cap.release()
+        self.assertEqual(count_avi_frames(plain), 40)
+        self.assertEqual(sorted(f for f in os.listdir(self.tmp_dir) if f.endswith('.tmp')), [])
+
+
+class TestTimelineIndex(RecordingsDirTestCase):
+    def _write_segment(self, key, started_at, duration):
+        index = monitoring_app.SegmentIndex(key, started_at=started_at)
+        index.frames.extend(range(0, int(duration * 1000) + 1, 50))
+        index.meta.update(ended_at=started_at + duration, duration=duration, filename=f"{key}.avi.encrypted")
+        index.save()
+        open(os.path.join(self.tmp_dir, f"{key}.avi.encrypted"), 'wb').close()
+        return index
+
+    def test_lookup_finds_file_and_offset(self):
+        self._write_segment('video_a', 1000.0, 600)
+        self._write_segment('video_b', 1600.0, 600)
+        # Clock moved backwards: this segment overlaps video_b
+        self._write_segment('video_c', 1900.0, 60)
+        self._write_segment('video_orphan_index', 5000.0, 60)
+        os.remove(os.path.join(self.tmp_dir, 'video_orphan_index.avi.encrypted'))
+
+        timeline = monitoring_app.TimelineIndex.build()
+
+        self.assertEqual(len(timeline), 3)
+        self.assertEqual(timeline.lookup(1300.5), [('video_a.avi.encrypted', 'video_a', 300.5)])
+        self.assertEqual([hit[1] for hit in timeline.lookup(1950.0)], ['video_c', 'video_b'])
+        self.assertEqual(timeline.lookup(999.0), [])
+        self.assertEqual(timeline.lookup(5010.0), [])
+
+        timeline.remove('video_c')
+        self.assertEqual([hit[1] for hit in timeline.lookup(1950.0)], ['video_b'])
+
+    def test_frame_offsets_survive_clock_change(self):
+        path = os.path.join(self.tmp_dir, 'video_clock.avi')
+        recorder = monitoring_app.SegmentRecorder(path, monitoring_app.cv2.VideoWriter_fourcc(*'XVID'), 20.0, (64, 48))
+        import numpy as np
+        frame = np.zeros((48, 64, 3), np.uint8)
+        recorder.write(frame)
+        original_start = recorder.started_at
+
+        with patch('monitoring_app.time.time', return_value=original_start + 3600):
+            recorder.rebase_clock()
+        recorder.write(frame)
+        recorder.release()
+        index = recorder.finish_index()
+
+        self.assertAlmostEqual(index.started_at, original_start + 3600, delta=1)
+        self.assertEqual(len(index.frames), 2)
+        self.assertLessEqual(index.frames[0], index.frames[1])
+        self.assertTrue(index.meta['clock_adjusted'])
+        self.assertEqual(index.frame_at(index.frames[1] / 1000), 1)
+
+
+class TestTimelineWidget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.qt_app = QApplication.instance() or QApplication(sys.argv)
+
+    def test_month_of_segments_paints_bounded_items(self):
+        from PyQt5.QtGui import QPixmap
+        timeline = monitoring_app.TimelineIndex()
+        start = 1790000000.0
+        for i in range(30 * 144):
+            seg_start = start + i * 600
+            timeline.add(seg_start, seg_start + 590, f'video_{i}.avi.encrypted', f'video_{i}', [i % 256] * 10)
+
+        widget = monitoring_app.TimelineWidget()
+        widget.resize(1000, 96)
+        widget.set_timeline(timeline)
+        widget.render(QPixmap(1000, 96))
+
+        self.assertGreater(widget.last_paint_items, 0)
+        self.assertLessEqual(widget.last_paint_items, widget.width())
+
+    def test_click_emits_time_under_cursor(self):
+        from PyQt5.QtCore import QPoint
+        from PyQt5.QtTest import QTest
+        widget = monitoring_app.TimelineWidget()
+        widget.resize(1000, 96)
+        widget.set_view(1000.0, 2000.0)
+        clicked = []
+        widget.time_clicked.connect(clicked.append)
+
+        QTest.mouseClick(widget, Qt.LeftButton, pos=QPoint(250, 40))
+
+        self.assertEqual(len(clicked), 1)
+        self.assertAlmostEqual(clicked[0], 1250.0, delta=1.0)
+
 
 if __name__ == '__main__':
     unittest.main()